@@ -33,6 +33,12 @@ class ServerConfig(BaseSettings):
         ..., env="DEPENDENCY_RECONNAISSANCE_AGENT_PROMPT_PATH"
     )
     agentops_api_key: str | None = Field(None, env="AGENTOPS_API_KEY")
+    clone_strategy: Literal["full", "shallow", "blobless", "sparse"] = Field(
+        "shallow", env="CLONE_STRATEGY"
+    )
+    workspace_root: str = Field("./workspaces", env="WORKSPACE_ROOT")
+    workspace_max_bytes: int = Field(20 * 1024**3, env="WORKSPACE_MAX_BYTES")
+    workspace_worktree_ttl_s: int = Field(6 * 3600, env="WORKSPACE_WORKTREE_TTL_S")
 
     @property
     def github_app_private_key(self) -> str:
@@ -1,3 +1,6 @@
+import threading
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from structlog import get_logger
@@ -12,12 +15,37 @@ from routers.agent import router as agent_router
 from routers.repo import router as repo_router
 from routers.plans import router as plans_router
 from routers.events import router as events_router
+from routers.ingestion import router as ingestion_router
 
 logger = get_logger()
 
 supabase: Client = create_client(config.supabase_url, config.supabase_service_role_key)
 
-app = FastAPI(root_path="/")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Imported here so the server starts without the Vertex AI configuration.
+    try:
+        from rag.clients import warm_up
+        from rag.config import config as agent_config
+    except Exception as e:
+        logger.warning("Skipping Vertex AI client warm-up", error=str(e))
+    else:
+        if agent_config.warm_up_clients:
+            # In the background so startup does not wait on credential discovery.
+            threading.Thread(
+                target=warm_up,
+                args=(
+                    agent_config.google_config.project_id,
+                    agent_config.google_config.location,
+                ),
+                name="client-warm-up",
+                daemon=True,
+            ).start()
+    yield
+
+
+app = FastAPI(root_path="/", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -34,5 +62,6 @@ app.include_router(agent_router, prefix="/agent")
 app.include_router(repo_router, prefix="/repo")
 app.include_router(plans_router, prefix="/plans")
 app.include_router(events_router, prefix="/events")
+app.include_router(ingestion_router, prefix="/ingestion")
 
 Base.metadata.create_all(bind=engine)
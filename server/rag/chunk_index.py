@@ -0,0 +1,442 @@
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional
+
+from logger import structlog
+
+logger = structlog.get_logger()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    uri TEXT NOT NULL,
+    gcs_folder_prefix TEXT NOT NULL,
+    commit_hash TEXT,
+    path TEXT NOT NULL,
+    start_line INTEGER,
+    end_line INTEGER,
+    symbol TEXT,
+    byte_start INTEGER NOT NULL,
+    byte_end INTEGER NOT NULL,
+    PRIMARY KEY (uri, byte_start)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS chunks_by_path ON chunks (gcs_folder_prefix, path);
+CREATE TABLE IF NOT EXISTS corpora (
+    corpus_name TEXT PRIMARY KEY,
+    gcs_folder_prefix TEXT NOT NULL,
+    commit_hash TEXT
+);
+CREATE TABLE IF NOT EXISTS lexical_chunks (
+    id INTEGER PRIMARY KEY,
+    uri TEXT NOT NULL,
+    byte_start INTEGER NOT NULL,
+    gcs_folder_prefix TEXT NOT NULL,
+    path TEXT NOT NULL,
+    UNIQUE (uri, byte_start)
+);
+CREATE INDEX IF NOT EXISTS lexical_chunks_by_path
+    ON lexical_chunks (gcs_folder_prefix, path);
+CREATE VIRTUAL TABLE IF NOT EXISTS chunk_terms
+    USING fts5(terms, tokenize="unicode61 tokenchars '_$'");
+CREATE VIRTUAL TABLE IF NOT EXISTS chunk_trigrams
+    USING fts5(text, tokenize="trigram");
+CREATE TABLE IF NOT EXISTS staged_chunks (
+    staging_id TEXT NOT NULL,
+    uri TEXT NOT NULL,
+    path TEXT NOT NULL,
+    start_line INTEGER,
+    end_line INTEGER,
+    symbol TEXT,
+    byte_start INTEGER NOT NULL,
+    byte_end INTEGER NOT NULL,
+    text TEXT,
+    terms TEXT,
+    staged_at REAL NOT NULL,
+    PRIMARY KEY (staging_id, uri, byte_start)
+) WITHOUT ROWID;
+"""
+# Stays well below SQLite's limit on bound parameters per statement.
+LOOKUP_BATCH_SIZE = 500
+# Records staged by ingestions that never promoted them (e.g. crashed) are
+# dropped when the index is opened after this long.
+STAGED_TTL_S = 24 * 3600
+
+# First definition in a chunk: Python, JS/TS, Go, Java/Kotlin/C#, Rust, ...
+SYMBOL_RE = re.compile(
+    r"^\s*(?:export\s+)?(?:(?:public|private|protected|static|final|abstract|async|default)\s+)*"
+    r"(?:def|class|function|func|fun|fn|interface|struct|enum|trait|type|object)\s+"
+    r"(?:\([^)]*\)\s*)?([A-Za-z_$][\w$]*)",
+    re.MULTILINE,
+)
+
+
+IDENTIFIER_RE = re.compile(r"[A-Za-z_$][\w$]*")
+# Words of a camelCase, PascalCase or snake_case identifier.
+IDENTIFIER_PART_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+
+def symbol_of(chunk_text: str) -> Optional[str]:
+    """Name of the first function, class or type defined in a chunk, if any."""
+    m = SYMBOL_RE.search(chunk_text)
+    return m.group(1) if m else None
+
+
+def terms_of(text: str) -> list[str]:
+    """
+    Lower-cased identifiers of `text`, each followed by its words when it has
+    several, so `trackEvent` is found by `trackEvent`, `track` and `event`.
+    """
+    terms = []
+    for identifier in IDENTIFIER_RE.findall(text):
+        terms.append(identifier.lower())
+        parts = IDENTIFIER_PART_RE.findall(identifier)
+        if len(parts) > 1:
+            terms += (part.lower() for part in parts)
+    return terms
+
+
+def query_terms_of(query: str) -> list[str]:
+    """
+    Words a chunk must contain to match `query`: each identifier split into
+    its words, so `track_event` also matches chunks using `trackEvent`.
+    """
+    terms = []
+    for identifier in IDENTIFIER_RE.findall(query):
+        parts = IDENTIFIER_PART_RE.findall(identifier)
+        terms += (
+            [part.lower() for part in parts] if len(parts) > 1 else [identifier.lower()]
+        )
+    return list(dict.fromkeys(terms))
+
+
+def _fts_phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+class ChunkRecord(NamedTuple):
+    """
+    Where a chunk came from. `byte_start`/`byte_end` locate the chunk in the
+    object at `uri`: the whole object for one-chunk objects, one record of a
+    JSONL shard otherwise. Chunks with `text` are also indexed for lexical
+    search.
+    """
+
+    uri: str
+    path: str
+    start_line: Optional[int]
+    end_line: Optional[int]
+    symbol: Optional[str]
+    byte_start: int
+    byte_end: int
+    text: Optional[str] = None
+
+
+class ChunkIndex:
+    """
+    Local SQLite table of chunk metadata, written by ingestion so retrieval
+    can hydrate search results with one batched lookup by source URI instead
+    of parsing each result. Rows of a repo are keyed by its GCS folder prefix.
+    Also records the commit last ingested into each corpus, which versions
+    cached retrieval results.
+
+    The text of each chunk is indexed with FTS5 twice, for `lexical_search`:
+    by identifier terms (ranked with BM25) and by trigrams (substrings).
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.execute(
+                "DELETE FROM staged_chunks WHERE staged_at < ?",
+                (time.time() - STAGED_TTL_S,),
+            )
+
+    def stage(self, staging_id: str, records: Iterable[ChunkRecord]) -> None:
+        """
+        Adds records to a staging area, so an ingestion can write them as it
+        chunks files and `promote` them once the corpus import succeeded.
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO staged_chunks"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        staging_id,
+                        record.uri,
+                        record.path,
+                        record.start_line,
+                        record.end_line,
+                        record.symbol,
+                        record.byte_start,
+                        record.byte_end,
+                        record.text,
+                        None
+                        if record.text is None
+                        else " ".join(terms_of(record.text)),
+                        now,
+                    )
+                    for record in records
+                ),
+            )
+
+    def promote(
+        self,
+        staging_id: str,
+        gcs_folder_prefix: str,
+        commit_hash: Optional[str],
+        paths: Optional[Iterable[str]] = None,
+    ) -> None:
+        """
+        Replaces the rows of a repo with the records staged under `staging_id`:
+        all of them, or only those of `paths` (e.g. the files an incremental
+        ingestion re-chunked). Every row of the repo is stamped with
+        `commit_hash`.
+        """
+        with self._lock, self._conn:
+            if paths is None:
+                self._conn.execute(
+                    "DELETE FROM chunks WHERE gcs_folder_prefix = ?",
+                    (gcs_folder_prefix,),
+                )
+                self._delete_lexical("gcs_folder_prefix = ?", [(gcs_folder_prefix,)])
+            else:
+                paths = list(paths)
+                self._conn.executemany(
+                    "DELETE FROM chunks WHERE gcs_folder_prefix = ? AND path = ?",
+                    ((gcs_folder_prefix, path) for path in paths),
+                )
+                self._delete_lexical(
+                    "gcs_folder_prefix = ? AND path = ?",
+                    [(gcs_folder_prefix, path) for path in paths],
+                )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chunks SELECT uri, ?, ?, path, start_line,"
+                " end_line, symbol, byte_start, byte_end FROM staged_chunks"
+                " WHERE staging_id = ?",
+                (gcs_folder_prefix, commit_hash, staging_id),
+            )
+            self._conn.execute(
+                "UPDATE chunks SET commit_hash = ? WHERE gcs_folder_prefix = ?",
+                (commit_hash, gcs_folder_prefix),
+            )
+
+            staged_text = (
+                "FROM staged_chunks s WHERE s.staging_id = ? AND s.text IS NOT NULL"
+            )
+            self._delete_lexical(
+                f"(uri, byte_start) IN (SELECT s.uri, s.byte_start {staged_text})",
+                [(staging_id,)],
+            )
+            self._conn.execute(
+                "INSERT INTO lexical_chunks (uri, byte_start, gcs_folder_prefix, path)"
+                f" SELECT s.uri, s.byte_start, ?, s.path {staged_text}",
+                (gcs_folder_prefix, staging_id),
+            )
+            for table, column in (("chunk_terms", "terms"), ("chunk_trigrams", "text")):
+                self._conn.execute(
+                    f"INSERT INTO {table} (rowid, {column}) SELECT l.id, s.{column}"
+                    " FROM staged_chunks s JOIN lexical_chunks l"
+                    " ON l.uri = s.uri AND l.byte_start = s.byte_start"
+                    " WHERE s.staging_id = ? AND s.text IS NOT NULL",
+                    (staging_id,),
+                )
+            self._conn.execute(
+                "DELETE FROM staged_chunks WHERE staging_id = ?", (staging_id,)
+            )
+
+    def discard(self, staging_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM staged_chunks WHERE staging_id = ?", (staging_id,)
+            )
+
+    def replace(
+        self,
+        gcs_folder_prefix: str,
+        commit_hash: Optional[str],
+        records: Iterable[ChunkRecord],
+        paths: Optional[Iterable[str]] = None,
+    ) -> None:
+        """`stage` and `promote` in one go."""
+        staging_id = uuid.uuid4().hex
+        self.stage(staging_id, records)
+        self.promote(staging_id, gcs_folder_prefix, commit_hash, paths=paths)
+
+    def _delete_lexical(self, where: str, params: list[tuple]) -> None:
+        ids = f"SELECT id FROM lexical_chunks WHERE {where}"
+        for table in ("chunk_terms", "chunk_trigrams"):
+            self._conn.executemany(
+                f"DELETE FROM {table} WHERE rowid IN ({ids})", params
+            )
+        self._conn.executemany(f"DELETE FROM lexical_chunks WHERE {where}", params)
+
+    def delete_prefix(self, gcs_folder_prefix: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM chunks WHERE gcs_folder_prefix = ?", (gcs_folder_prefix,)
+            )
+            self._delete_lexical("gcs_folder_prefix = ?", [(gcs_folder_prefix,)])
+            self._conn.execute(
+                "DELETE FROM corpora WHERE gcs_folder_prefix = ?", (gcs_folder_prefix,)
+            )
+
+    def set_corpus_version(
+        self, corpus_name: str, gcs_folder_prefix: str, commit_hash: Optional[str]
+    ) -> None:
+        """Records the commit whose chunks were last imported into a corpus."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO corpora VALUES (?, ?, ?)",
+                (corpus_name, gcs_folder_prefix, commit_hash),
+            )
+
+    def corpus_version(self, corpus_name: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT commit_hash FROM corpora WHERE corpus_name = ?",
+                (corpus_name,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def corpus_prefix(self, corpus_name: str) -> Optional[str]:
+        """GCS folder prefix of the repo last ingested into a corpus."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT gcs_folder_prefix FROM corpora WHERE corpus_name = ?",
+                (corpus_name,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def lexical_search(
+        self, gcs_folder_prefix: str, query: str, top_k: int = 5
+    ) -> list[dict]:
+        """
+        Chunks of a repo matching `query` lexically, best first: those that
+        contain it verbatim (case-insensitively, trigram index), then those
+        containing all the words of its identifiers, ranked with BM25. Results have the
+        fields of hydrated search results, plus `match` ("substring" or
+        "bm25") and a `score` where higher is better.
+        """
+        query = query.strip()
+        searches = []
+        if len(query) >= 3:
+            searches.append(("substring", "chunk_trigrams", "text", _fts_phrase(query)))
+        terms = query_terms_of(query)
+        if terms:
+            searches.append(
+                ("bm25", "chunk_terms", "terms", " AND ".join(map(_fts_phrase, terms)))
+            )
+
+        results: dict[tuple, dict] = {}
+        with self._lock:
+            for match, table, column, expression in searches:
+                if len(results) >= top_k:
+                    break
+                rows = self._conn.execute(
+                    "SELECT l.uri, l.byte_start, c.path, c.start_line, c.end_line,"
+                    " c.symbol, c.commit_hash, t.text, f.rank"
+                    f" FROM {table} f"
+                    " JOIN lexical_chunks l ON l.id = f.rowid"
+                    " JOIN chunk_trigrams t ON t.rowid = l.id"
+                    " JOIN chunks c ON c.uri = l.uri AND c.byte_start = l.byte_start"
+                    f" WHERE f.{column} MATCH ? AND l.gcs_folder_prefix = ?"
+                    " ORDER BY f.rank LIMIT ?",
+                    (expression, gcs_folder_prefix, top_k),
+                ).fetchall()
+                for (
+                    uri,
+                    byte_start,
+                    path,
+                    start_line,
+                    end_line,
+                    symbol,
+                    commit_hash,
+                    text,
+                    rank,
+                ) in rows:
+                    if len(results) >= top_k:
+                        break
+                    results.setdefault(
+                        (uri, byte_start),
+                        {
+                            "source_uri": uri,
+                            "display_name": uri.rsplit("/", 1)[-1],
+                            "text": text,
+                            "distance": None,
+                            # FTS5 ranks with bm25(), lower for better matches.
+                            "score": -rank,
+                            "match": match,
+                            "file_path": path,
+                            "start_line": start_line,
+                            "end_line": end_line,
+                            "symbol": symbol,
+                            "commit_hash": commit_hash,
+                            "gcs_folder_prefix": gcs_folder_prefix,
+                        },
+                    )
+        return list(results.values())
+
+    def lookup(self, uris: Iterable[str]) -> dict[str, dict]:
+        """
+        Metadata of the chunk objects at `uris`, in the shape of search result
+        fields. URIs of shards hold several chunks and are left out, as are
+        URIs not in the index.
+        """
+        uris = list(dict.fromkeys(uris))
+        rows = []
+        with self._lock:
+            for i in range(0, len(uris), LOOKUP_BATCH_SIZE):
+                batch = uris[i : i + LOOKUP_BATCH_SIZE]
+                rows += self._conn.execute(
+                    "SELECT uri, gcs_folder_prefix, commit_hash, path, start_line,"
+                    " end_line, symbol, COUNT(*) FROM chunks"
+                    f" WHERE uri IN ({', '.join('?' * len(batch))}) GROUP BY uri",
+                    batch,
+                ).fetchall()
+        return {
+            uri: {
+                "file_path": path,
+                "start_line": start_line,
+                "end_line": end_line,
+                "symbol": symbol,
+                "commit_hash": commit_hash,
+                "gcs_folder_prefix": prefix,
+            }
+            for uri, prefix, commit_hash, path, start_line, end_line, symbol, count in rows
+            if count == 1
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_indexes: dict[Path, ChunkIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_chunk_index(path: Path | str, create: bool = True) -> Optional[ChunkIndex]:
+    """
+    The process-wide ChunkIndex at `path`, opened on first use. Returns None
+    when `path` is empty, or does not exist and `create` is False.
+    """
+    if not path:
+        return None
+    path = Path(path).resolve()
+    with _indexes_lock:
+        if path not in _indexes:
+            if not create and not path.exists():
+                return None
+            path.parent.mkdir(parents=True, exist_ok=True)
+            _indexes[path] = ChunkIndex(path)
+            logger.info("Opened chunk index", path=str(path))
+        return _indexes[path]
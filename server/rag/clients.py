@@ -0,0 +1,70 @@
+import threading
+from typing import Optional
+
+import vertexai
+from google.cloud import storage
+from google.genai import Client
+
+from logger import structlog
+
+logger = structlog.get_logger()
+
+_lock = threading.Lock()
+_vertexai_target: Optional[tuple[str, str]] = None
+_genai_clients: dict[tuple[str, str], Client] = {}
+_storage_clients: dict[str, storage.Client] = {}
+
+
+def init_vertexai(project_id: str, location: str) -> None:
+    """
+    Points the Vertex AI SDK at (project, location). `vertexai.init` resets
+    the SDK's process-wide configuration and the API clients it caches, so
+    it only runs when the target changes rather than on every call.
+    """
+    global _vertexai_target
+    with _lock:
+        if _vertexai_target == (project_id, location):
+            return
+        vertexai.init(project=project_id, location=location)
+        _vertexai_target = (project_id, location)
+    logger.info("Initialized Vertex AI", project_id=project_id, location=location)
+
+
+def genai_client(project_id: str, location: str) -> Client:
+    """The process-wide Gen AI client for (project, location), created on first use."""
+    key = (project_id, location)
+    with _lock:
+        if key not in _genai_clients:
+            _genai_clients[key] = Client(
+                vertexai=True, project=project_id, location=location
+            )
+            logger.info(
+                "Created Gen AI client", project_id=project_id, location=location
+            )
+        return _genai_clients[key]
+
+
+def storage_client(project_id: str) -> storage.Client:
+    """The process-wide Cloud Storage client of a project, created on first use."""
+    with _lock:
+        if project_id not in _storage_clients:
+            _storage_clients[project_id] = storage.Client(project=project_id)
+        return _storage_clients[project_id]
+
+
+def warm_up(project_id: str, location: str) -> None:
+    """
+    Creates the clients of (project, location) ahead of the first request,
+    so credential discovery and SDK setup are not paid by it. Failures are
+    logged: the clients are created again on first use.
+    """
+    try:
+        init_vertexai(project_id, location)
+        genai_client(project_id, location)
+    except Exception as e:
+        logger.warning(
+            "Could not warm up Vertex AI clients",
+            project_id=project_id,
+            location=location,
+            error=str(e),
+        )
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -14,6 +16,34 @@ class GoogleConfig(BaseSettings):
 class AgentConfig(BaseSettings):
     distance_threshold: float = Field(default=0.6)
     top_k: int = Field(default=10)
+    chunk_index_path: str = Field(
+        default="./chunk_index.sqlite",
+        description="Chunk metadata index written by ingestion ('' to disable)",
+    )
+    retrieval_cache_size: int = Field(
+        default=256, description="Cached retrieval results (0 to disable)"
+    )
+    retrieval_cache_ttl_s: float = Field(
+        default=600.0, description="Seconds a cached retrieval result is served"
+    )
+    corpus_catalog_ttl_s: float = Field(
+        default=300.0,
+        description="Seconds before the corpus catalog is re-listed in the background",
+    )
+    corpus_catalog_miss_refresh_s: float = Field(
+        default=5.0,
+        description="Minimum seconds between re-listing corpora for unknown names",
+    )
+    search_backend: Literal["vertex", "lexical", "auto"] = Field(
+        default="auto",
+        description="Vertex AI RAG, the local lexical index, or lexical first for code-like queries",
+    )
+    multi_query_max_concurrency: int = Field(
+        default=4, description="Retrieval queries of a multi-query search in flight"
+    )
+    warm_up_clients: bool = Field(
+        default=True, description="Create the Vertex AI clients at server startup"
+    )
 
     google_config: GoogleConfig = Field(default_factory=GoogleConfig)
 
@@ -0,0 +1,331 @@
+import base64
+import functools
+import gzip
+import hashlib
+import inspect
+import os
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, Optional
+
+from google.api_core.exceptions import NotFound
+from google.cloud import storage
+from google.cloud.aiplatform_v1.types.io import GcsSource
+from google.cloud.aiplatform_v1.types.vertex_rag_data_service import (
+    ImportRagFilesResponse,
+)
+from vertexai.preview import rag as vertex_rag
+from vertexai.preview.rag.rag_data import RagCorpus
+
+from logger import structlog
+from rag.clients import init_vertexai, storage_client
+from rag.ingestion.config import config
+from rag.ingestion.limits import RateLimiter, rag_api_rate
+
+logger = structlog.get_logger()
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+class _RateLimitedRag:
+    """Forwards `rag.<call>` to `client`, waiting on `limiter` before each call."""
+
+    def __init__(self, client, limiter: RateLimiter):
+        self._client = client
+        self._limiter = limiter
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._client, name)
+        if not inspect.isfunction(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def call(*args, **kwargs):
+            self._limiter.acquire()
+            return attr(*args, **kwargs)
+
+        return call
+
+
+class VertexBackend:
+    """
+    Chunk objects in Cloud Storage, corpora in Vertex AI RAG. RAG API calls
+    share the process-wide `rag_api_rate` limit.
+    """
+
+    name = "vertex"
+    rag = _RateLimitedRag(vertex_rag, rag_api_rate)
+
+    def init(self, project_id: str, location: str) -> None:
+        init_vertexai(project_id, location)
+
+    def get_bucket(self, project_id: str, bucket_name: str) -> storage.Bucket:
+        return storage_client(project_id).get_bucket(bucket_name)
+
+
+class _Latency:
+    def __init__(self, latency_s: float, jitter_s: float):
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+
+    def wait(self) -> None:
+        delay = self.latency_s + random.uniform(0, self.jitter_s)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class LocalBlob:
+    """The subset of `storage.Blob` used by ingestion, backed by one file."""
+
+    def __init__(self, bucket: "LocalBucket", name: str):
+        self.bucket = bucket
+        self.name = name
+        self.content_encoding: Optional[str] = None
+
+    @property
+    def path(self) -> Path:
+        return self.bucket.root / self.name
+
+    @property
+    def md5_hash(self) -> Optional[str]:
+        try:
+            data = self.path.read_bytes()
+        except FileNotFoundError:
+            return None
+        digest = hashlib.md5(data, usedforsecurity=False).digest()
+        return base64.b64encode(digest).decode("ascii")
+
+    def upload_from_string(self, data: str | bytes, content_type: str = "") -> None:
+        self.bucket.latency.wait()
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so concurrent readers never see a partial object.
+        tmp_path = self.path.with_name(f".{self.path.name}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, self.path)
+
+    def download_as_bytes(self) -> bytes:
+        self.bucket.latency.wait()
+        try:
+            data = self.path.read_bytes()
+        except FileNotFoundError:
+            raise NotFound(f"gs://{self.bucket.name}/{self.name}") from None
+        # Like GCS decompressive transcoding.
+        return gzip.decompress(data) if data[:2] == GZIP_MAGIC else data
+
+    def download_as_text(self) -> str:
+        return self.download_as_bytes().decode("utf-8")
+
+    def delete(self) -> None:
+        self.bucket.latency.wait()
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            raise NotFound(f"gs://{self.bucket.name}/{self.name}") from None
+
+
+class LocalBucket:
+    """
+    The subset of `storage.Bucket` used by ingestion, backed by a directory.
+    Gzip-encoded objects are stored compressed and recognized by their magic
+    bytes, which never start a UTF-8 text object.
+    """
+
+    def __init__(self, root: Path, name: str, latency: _Latency):
+        self.root = root
+        self.name = name
+        self.latency = latency
+
+    def blob(self, name: str) -> LocalBlob:
+        return LocalBlob(self, name)
+
+    def list_blobs(self, prefix: str = "") -> Iterator[LocalBlob]:
+        self.latency.wait()
+        if not self.root.exists():
+            return
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in sorted(filenames):
+                if filename.startswith("."):
+                    continue
+                name = Path(dirpath, filename).relative_to(self.root).as_posix()
+                if not name.startswith(prefix):
+                    continue
+                blob = self.blob(name)
+                with open(blob.path, "rb") as f:
+                    if f.read(2) == GZIP_MAGIC:
+                        blob.content_encoding = "gzip"
+                yield blob
+
+
+@dataclass
+class LocalRagFile:
+    name: str
+    display_name: str
+    gcs_source: GcsSource
+    create_time: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class LocalRag:
+    """
+    In-memory stand-in for the `vertexai.preview.rag` calls made by ingestion.
+    Imports resolve `gs://` URIs against the backend's local buckets and create
+    one RagFile per object, as Vertex does; nothing is embedded.
+    """
+
+    def __init__(self, backend: "LocalBackend"):
+        self._backend = backend
+        self._corpora: dict[str, RagCorpus] = {}
+        self._files: dict[str, list[LocalRagFile]] = {}
+        self._lock = threading.Lock()
+
+    def create_corpus(
+        self, display_name: str, description: str = "", **kwargs
+    ) -> RagCorpus:
+        self._backend.latency.wait()
+        name = f"projects/local/locations/local/ragCorpora/{uuid.uuid4().hex[:12]}"
+        corpus = RagCorpus(
+            name=name, display_name=display_name, description=description
+        )
+        with self._lock:
+            self._corpora[name] = corpus
+            self._files[name] = []
+        return corpus
+
+    def get_corpus(self, name: str) -> RagCorpus:
+        self._backend.latency.wait()
+        with self._lock:
+            if name not in self._corpora:
+                raise NotFound(name)
+            return self._corpora[name]
+
+    def list_corpora(self) -> list[RagCorpus]:
+        self._backend.latency.wait()
+        with self._lock:
+            return list(self._corpora.values())
+
+    def delete_corpus(self, name: str) -> None:
+        self._backend.latency.wait()
+        with self._lock:
+            if self._corpora.pop(name, None) is None:
+                raise NotFound(name)
+            del self._files[name]
+
+    def import_files(
+        self, corpus_name: str, paths: list[str], **kwargs
+    ) -> ImportRagFilesResponse:
+        self._backend.latency.wait()
+        imported, failed = [], 0
+        for uri in paths:
+            bucket_name, _, prefix = uri.removeprefix("gs://").partition("/")
+            bucket = self._backend.get_bucket("local", bucket_name)
+            if prefix.endswith("/"):
+                names = [blob.name for blob in bucket.list_blobs(prefix=prefix)]
+            else:
+                names = [prefix] if bucket.blob(prefix).path.is_file() else []
+            if not names:
+                failed += 1
+            imported.extend(f"gs://{bucket_name}/{name}" for name in names)
+
+        with self._lock:
+            if corpus_name not in self._corpora:
+                raise NotFound(corpus_name)
+            for uri in imported:
+                self._files[corpus_name].append(
+                    LocalRagFile(
+                        name=f"{corpus_name}/ragFiles/{uuid.uuid4().hex[:12]}",
+                        display_name=uri.rsplit("/", 1)[-1],
+                        gcs_source=GcsSource(uris=[uri]),
+                    )
+                )
+        return ImportRagFilesResponse(
+            imported_rag_files_count=len(imported), failed_rag_files_count=failed
+        )
+
+    def list_files(self, corpus_name: str) -> list[LocalRagFile]:
+        self._backend.latency.wait()
+        with self._lock:
+            if corpus_name not in self._files:
+                raise NotFound(corpus_name)
+            return list(self._files[corpus_name])
+
+    def delete_file(self, name: str) -> None:
+        self._backend.latency.wait()
+        corpus_name = name.split("/ragFiles/")[0]
+        with self._lock:
+            files = self._files.get(corpus_name, [])
+            remaining = [rag_file for rag_file in files if rag_file.name != name]
+            if len(remaining) == len(files):
+                raise NotFound(name)
+            self._files[corpus_name] = remaining
+
+
+class LocalBackend:
+    """
+    Chunk objects in a local directory (`<root>/<bucket>/<object>`) and an
+    in-memory RAG stand-in, so ingestion can run and be benchmarked without
+    cloud credentials. Every storage and RAG call sleeps for `latency_s` plus
+    up to `jitter_s` to mimic network round trips.
+    """
+
+    name = "local"
+
+    def __init__(self, root: Path | str, latency_s: float = 0.0, jitter_s: float = 0.0):
+        self.root = Path(root)
+        self.latency = _Latency(latency_s, jitter_s)
+        self.rag = LocalRag(self)
+
+    def init(self, project_id: str, location: str) -> None:
+        pass
+
+    def get_bucket(self, project_id: str, bucket_name: str) -> LocalBucket:
+        return LocalBucket(self.root / bucket_name, bucket_name, self.latency)
+
+
+IngestionBackend = VertexBackend | LocalBackend
+
+_backend: Optional[IngestionBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> IngestionBackend:
+    """The backend selected by `config.storage_backend`, created on first use."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if config.storage_backend == "local":
+                _backend = LocalBackend(
+                    config.local_storage_root,
+                    latency_s=config.local_storage_latency_s,
+                    jitter_s=config.local_storage_jitter_s,
+                )
+            else:
+                _backend = VertexBackend()
+            logger.info("Using ingestion backend", backend=_backend.name)
+        return _backend
+
+
+def set_backend(backend: Optional[IngestionBackend]) -> Optional[IngestionBackend]:
+    """
+    Replaces the backend used by ingestion (None restores the configured one
+    on next use). Returns the previous backend.
+    """
+    global _backend
+    with _backend_lock:
+        previous, _backend = _backend, backend
+    return previous
+
+
+class _ActiveRag:
+    """Forwards `rag.<call>` to the RAG client of the active backend."""
+
+    def __getattr__(self, name: str):
+        return getattr(get_backend().rag, name)
+
+
+rag = _ActiveRag()
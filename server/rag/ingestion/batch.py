@@ -0,0 +1,222 @@
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Literal, Optional, get_args
+
+from pydantic import BaseModel
+
+from logger import structlog
+from rag.ingestion.config import config
+from rag.ingestion.rag_corpus import ingest_repository_to_rag_corpus
+
+logger = structlog.get_logger()
+
+RepoState = Literal["pending", "running", "succeeded", "failed"]
+
+
+class RepoSpec(BaseModel):
+    github_url: str
+    branch: Optional[str] = None
+
+    @property
+    def label(self) -> str:
+        return f"{self.github_url}@{self.branch}" if self.branch else self.github_url
+
+
+class RepoProgress(BaseModel):
+    repo: str
+    state: RepoState = "pending"
+    corpus_name: Optional[str] = None
+    imported_files_count: int = 0
+    failed_files_count: int = 0
+    elapsed_s: Optional[float] = None
+    error: Optional[str] = None
+
+
+def parse_repo_spec(spec: str) -> RepoSpec:
+    """
+    `owner/name`, `https://github.com/owner/name` or either with `@branch`
+    appended -> RepoSpec.
+    """
+    spec = spec.strip().removesuffix("/")
+    repo, _, branch = spec.partition("@")
+    if not repo.startswith("https://"):
+        repo = f"https://github.com/{repo.removeprefix('github.com/')}"
+    if not repo.startswith("https://github.com/") or repo.count("/") != 4:
+        raise ValueError(f"Not a GitHub repository: {spec!r}")
+    return RepoSpec(github_url=repo.removesuffix(".git"), branch=branch or None)
+
+
+class BatchProgress:
+    """Per-repo state of a batch ingestion; safe to read while it runs."""
+
+    def __init__(self, specs: Iterable[RepoSpec]):
+        self._repos = {spec.label: RepoProgress(repo=spec.label) for spec in specs}
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def update(self, label: str, **fields) -> None:
+        with self._lock:
+            repo = self._repos[label]
+            for name, value in fields.items():
+                setattr(repo, name, value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            repos = [repo.model_dump() for repo in self._repos.values()]
+        counts = {state: 0 for state in get_args(RepoState)}
+        for repo in repos:
+            counts[repo["state"]] += 1
+        done = counts["succeeded"] + counts["failed"]
+        elapsed_s = time.monotonic() - self._started
+        return {
+            "total": len(repos),
+            **counts,
+            "done": done,
+            "elapsed_s": round(elapsed_s, 1),
+            # Assumes the remaining repos take as long as the finished ones.
+            "eta_s": round(elapsed_s / done * (len(repos) - done), 1) if done else None,
+            "imported_files_count": sum(r["imported_files_count"] for r in repos),
+            "repos": repos,
+        }
+
+
+def ingest_repositories(
+    specs: list[RepoSpec],
+    incremental: bool = False,
+    max_parallel: int = config.batch_max_parallel_repos,
+    progress: Optional[BatchProgress] = None,
+) -> dict:
+    """
+    Ingests several repositories, `max_parallel` at a time, each into its own
+    registered corpus. Clones, chunking pools and RAG API calls are throttled
+    by the process-wide limits in `rag.ingestion.limits`, so `max_parallel`
+    mostly overlaps the I/O-bound stages of different repos. One repo failing
+    does not stop the others. Returns the final `BatchProgress` snapshot.
+    """
+    progress = progress or BatchProgress(specs)
+    logger.info(
+        "Starting batch ingestion",
+        repos=len(specs),
+        max_parallel=max_parallel,
+        incremental=incremental,
+    )
+
+    def ingest(spec: RepoSpec) -> None:
+        started = time.monotonic()
+        progress.update(spec.label, state="running")
+        try:
+            corpus, import_response = ingest_repository_to_rag_corpus(
+                spec.github_url, incremental=incremental, branch=spec.branch
+            )
+        except Exception as e:
+            corpus, import_response = None, None
+            progress.update(spec.label, error=str(e))
+        if corpus is None:
+            progress.update(
+                spec.label,
+                state="failed",
+                elapsed_s=round(time.monotonic() - started, 1),
+            )
+        else:
+            progress.update(
+                spec.label,
+                state="succeeded",
+                corpus_name=corpus.name,
+                imported_files_count=import_response.imported_rag_files_count,
+                failed_files_count=import_response.failed_rag_files_count,
+                elapsed_s=round(time.monotonic() - started, 1),
+            )
+        snapshot = progress.snapshot()
+        logger.info(
+            "Batch ingestion progress",
+            repo=spec.label,
+            done=snapshot["done"],
+            total=snapshot["total"],
+            failed=snapshot["failed"],
+            eta_s=snapshot["eta_s"],
+        )
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, max_parallel), thread_name_prefix="batch-ingestion"
+    ) as executor:
+        # Consumed so errors raised by `ingest` itself surface here.
+        list(executor.map(ingest, specs))
+
+    summary = progress.snapshot()
+    logger.info(
+        "Batch ingestion finished",
+        total=summary["total"],
+        succeeded=summary["succeeded"],
+        failed=summary["failed"],
+        elapsed_s=summary["elapsed_s"],
+    )
+    return summary
+
+
+def _read_specs(repos: list[str], files: list[Path]) -> list[RepoSpec]:
+    lines = list(repos)
+    for path in files:
+        lines += path.read_text().splitlines()
+    specs, seen = [], set()
+    for line in lines:
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        spec = parse_repo_spec(line)
+        if spec.label not in seen:
+            seen.add(spec.label)
+            specs.append(spec)
+    return specs
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    argparser = argparse.ArgumentParser(
+        description="Ingest several GitHub repositories, each into its own corpus."
+    )
+    argparser.add_argument(
+        "repos",
+        nargs="*",
+        help="owner/name or GitHub URL, optionally with @branch appended.",
+    )
+    argparser.add_argument(
+        "--file",
+        type=Path,
+        action="append",
+        default=[],
+        help="File listing one repository per line (# starts a comment).",
+    )
+    argparser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only re-ingest files changed since each repository's last ingestion.",
+    )
+    argparser.add_argument(
+        "--parallel",
+        type=int,
+        default=config.batch_max_parallel_repos,
+        help="Repositories processed at once.",
+    )
+    args = argparser.parse_args(argv)
+
+    try:
+        specs = _read_specs(args.repos, args.file)
+    except ValueError as e:
+        argparser.error(str(e))
+    if not specs:
+        argparser.error("no repositories given")
+
+    summary = ingest_repositories(
+        specs, incremental=args.incremental, max_parallel=args.parallel
+    )
+    sys.stdout.write(json.dumps(summary, indent=2) + "\n")
+    if summary["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+import argparse
+import json
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import git
+
+from logger import structlog
+from rag.ingestion.backends import LocalBackend
+from rag.ingestion.chunking import TREE_SITTER_AVAILABLE, chunk_files
+from rag.ingestion.config import config
+from rag.ingestion.discovery import RepoWalker
+from rag.ingestion.pipeline import PipelineMetrics
+from rag.ingestion.rag_corpus import sync_repo_to_gcs
+
+logger = structlog.get_logger()
+
+CHUNKING_STRATEGIES = ("lines", "tree-sitter")
+BENCHMARK_BUCKET = "benchmark"
+
+_WORDS = (
+    "user event track order cart item payment session page view click "
+    "product checkout search result account profile config cache queue"
+).split()
+
+
+def _name(rng: random.Random, parts: int = 2) -> str:
+    return "_".join(rng.choice(_WORDS) for _ in range(parts))
+
+
+def _camel(rng: random.Random, parts: int = 2) -> str:
+    return "".join(word.title() for word in _name(rng, parts).split("_"))
+
+
+def _python_file(rng: random.Random, functions: int) -> str:
+    lines = ["import logging", "", "logger = logging.getLogger(__name__)", ""]
+    for _ in range(functions):
+        if rng.random() < 0.3:
+            lines += [f"class {_camel(rng)}:", f'    """{_name(rng, 4)}."""', ""]
+            for _ in range(rng.randint(1, 4)):
+                lines += [
+                    f"    def {_name(rng)}(self, {_name(rng, 1)}):",
+                    f"        value = self.{_name(rng, 1)}({_name(rng, 1)})",
+                    f"        logger.info('{_name(rng, 3)}', extra={{'v': value}})",
+                    "        return value",
+                    "",
+                ]
+        else:
+            body = rng.randint(2, 12)
+            lines.append(f"def {_name(rng)}({_name(rng, 1)}, {_name(rng, 1)}=None):")
+            lines += [f"    {_name(rng, 1)} = {rng.randint(0, 999)}"] * body
+            lines += ["    return None", "", ""]
+    return "\n".join(lines) + "\n"
+
+
+def _javascript_file(rng: random.Random, functions: int) -> str:
+    lines = ["import analytics from './analytics';", ""]
+    for _ in range(functions):
+        lines.append(f"export function {_camel(rng)}({_name(rng, 1)}) {{")
+        for _ in range(rng.randint(2, 12)):
+            lines.append(
+                f"  analytics.track('{_name(rng, 2)}', {{ id: {rng.randint(0, 999)} }});"
+            )
+        lines += ["}", ""]
+    return "\n".join(lines) + "\n"
+
+
+def _go_file(rng: random.Random, functions: int) -> str:
+    lines = ["package main", "", 'import "fmt"', ""]
+    for _ in range(functions):
+        lines.append(f"func {_camel(rng)}(id int) error {{")
+        for _ in range(rng.randint(2, 12)):
+            lines.append(f'\tfmt.Println("{_name(rng, 2)}", id+{rng.randint(0, 99)})')
+        lines += ["\treturn nil", "}", ""]
+    return "\n".join(lines) + "\n"
+
+
+def _java_file(rng: random.Random, functions: int) -> str:
+    lines = [f"public class {_camel(rng)} {{"]
+    for _ in range(functions):
+        lines.append(f"    public void {_camel(rng)}(int id) {{")
+        for _ in range(rng.randint(2, 12)):
+            lines.append(f'        tracker.track("{_name(rng, 2)}", id);')
+        lines += ["    }", ""]
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def _markdown_file(rng: random.Random, functions: int) -> str:
+    sections = []
+    for _ in range(functions):
+        words = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(20, 80)))
+        sections.append(f"## {_name(rng, 3)}\n\n{words}\n")
+    return "\n".join(sections)
+
+
+GENERATORS = {
+    ".py": _python_file,
+    ".js": _javascript_file,
+    ".go": _go_file,
+    ".java": _java_file,
+    ".md": _markdown_file,
+}
+
+
+def generate_synthetic_repo(
+    path: Path,
+    files: int,
+    language_mix: dict[str, float],
+    functions_per_file: int = 10,
+    seed: int = 0,
+) -> Path:
+    """
+    Writes a deterministic repo of `files` source files under `path`, with
+    extensions drawn from `language_mix` (extension -> weight) and spread over
+    nested directories, and commits it.
+    """
+    rng = random.Random(seed)
+    extensions = sorted(language_mix)
+    weights = [language_mix[extension] for extension in extensions]
+    for i in range(files):
+        extension = rng.choices(extensions, weights)[0]
+        directory = path / f"pkg{i % 16}" / f"mod{i % 5}"
+        directory.mkdir(parents=True, exist_ok=True)
+        functions = max(1, int(rng.gauss(functions_per_file, functions_per_file / 3)))
+        (directory / f"{_name(rng)}_{i}{extension}").write_text(
+            GENERATORS[extension](rng, functions)
+        )
+    repo = git.Repo.init(path)
+    with repo.config_writer() as writer:
+        writer.set_value("user", "name", "benchmark")
+        writer.set_value("user", "email", "benchmark@example.com")
+    repo.git.add("-A")
+    repo.index.commit("synthetic benchmark repo")
+    return path
+
+
+def _distribution(values: list[int]) -> dict[str, float]:
+    if not values:
+        return {"min": 0, "p50": 0, "p95": 0, "max": 0, "mean": 0.0}
+    ordered = sorted(values)
+    return {
+        "min": ordered[0],
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, len(ordered) * 95 // 100)],
+        "max": ordered[-1],
+        "mean": round(statistics.fmean(ordered), 1),
+    }
+
+
+def benchmark_discovery(repo_path: Path, rounds: int = 3) -> dict:
+    timings, files = [], 0
+    for _ in range(rounds):
+        started = time.perf_counter()
+        files = sum(1 for _ in RepoWalker(repo_path).iter_files())
+        timings.append(time.perf_counter() - started)
+    return {"files": files, "seconds": round(min(timings), 4)}
+
+
+def benchmark_chunking(
+    repo_path: Path, strategy: str, workers: int, chunk_size: int = 20
+) -> dict:
+    files = list(RepoWalker(repo_path).iter_files())
+    chunk_bytes, chunk_lines, skipped = [], [], 0
+    started = time.perf_counter()
+    for _, chunks in chunk_files(
+        repo_path,
+        files,
+        chunking_strategy=strategy,
+        chunk_size=chunk_size,
+        workers=workers,
+    ):
+        if chunks is None:
+            skipped += 1
+            continue
+        for start_line, end_line, text in chunks:
+            chunk_bytes.append(len(text.encode("utf-8")))
+            chunk_lines.append(end_line - start_line + 1)
+    seconds = time.perf_counter() - started
+    return {
+        "files": len(files),
+        "skipped_files": skipped,
+        "chunks": len(chunk_bytes),
+        "seconds": round(seconds, 4),
+        "files_per_s": round(len(files) / seconds, 1) if seconds else 0.0,
+        "chunk_bytes": _distribution(chunk_bytes),
+        "chunk_lines": _distribution(chunk_lines),
+    }
+
+
+def benchmark_upload(
+    repo_path: Path,
+    strategy: str,
+    store_root: Path,
+    latency_s: float,
+    upload_workers: int,
+) -> dict:
+    shutil.rmtree(store_root, ignore_errors=True)
+    bucket = LocalBackend(store_root, latency_s=latency_s).get_bucket(
+        "benchmark", BENCHMARK_BUCKET
+    )
+    metrics = PipelineMetrics()
+    started = time.perf_counter()
+    result = sync_repo_to_gcs(
+        bucket,
+        repo_path,
+        chunking_strategy=strategy,
+        metrics=metrics,
+        upload_workers=upload_workers,
+    )
+    seconds = time.perf_counter() - started
+    upload = metrics.stage("upload").summary()
+    return {
+        "objects": len(result.uploaded_blobs),
+        "failed_files": len(result.failed_paths),
+        "seconds": round(seconds, 4),
+        "objects_per_s": round(len(result.uploaded_blobs) / seconds, 1)
+        if seconds
+        else 0.0,
+        "bytes": upload["bytes"],
+        "mb_per_s": round(upload["bytes"] / seconds / 1e6, 3) if seconds else 0.0,
+        "stages": metrics.summary(),
+    }
+
+
+def run_benchmark(
+    repo_path: Path,
+    label: str,
+    strategies: tuple[str, ...] = CHUNKING_STRATEGIES,
+    chunk_workers: int = config.chunk_workers,
+    upload: bool = True,
+    upload_latency_s: float = 0.0,
+    upload_workers: int = config.upload_workers,
+    store_root: Optional[Path] = None,
+) -> dict:
+    """Benchmarks discovery, each chunking strategy and uploads of one repo."""
+    logger.info("Benchmarking repository", label=label, path=str(repo_path))
+    try:
+        commit = git.Repo(repo_path).head.commit.hexsha
+    except (git.InvalidGitRepositoryError, ValueError):
+        commit = None
+    result = {
+        "label": label,
+        "path": str(repo_path),
+        "commit": commit,
+        "discovery": benchmark_discovery(repo_path),
+        "chunking": {},
+        "upload": {},
+    }
+    for strategy in strategies:
+        if strategy == "tree-sitter" and not TREE_SITTER_AVAILABLE:
+            result["chunking"][strategy] = {"skipped": "tree-sitter not installed"}
+            continue
+        result["chunking"][strategy] = benchmark_chunking(
+            repo_path, strategy, chunk_workers
+        )
+        if upload:
+            with tempfile.TemporaryDirectory(dir=store_root) as tmp_dir:
+                result["upload"][strategy] = benchmark_upload(
+                    repo_path,
+                    strategy,
+                    Path(tmp_dir) / "store",
+                    upload_latency_s,
+                    upload_workers,
+                )
+    return result
+
+
+def _parse_language_mix(value: str) -> dict[str, float]:
+    """Parses `py=3,js=2,go=1` into {".py": 3.0, ".js": 2.0, ".go": 1.0}."""
+    mix = {}
+    for item in value.split(","):
+        extension, _, weight = item.partition("=")
+        extension = "." + extension.strip().lstrip(".")
+        if extension not in GENERATORS:
+            raise argparse.ArgumentTypeError(
+                f"Unsupported language {extension!r}, expected one of {sorted(GENERATORS)}"
+            )
+        mix[extension] = float(weight or 1)
+    return mix
+
+
+def _checkout_pinned(spec: str, work_dir: Path) -> tuple[str, Path, Optional[git.Repo]]:
+    """
+    `path[@commit]` -> (label, checkout path, repo owning the temporary
+    worktree created for `commit`, if any).
+    """
+    path, _, commit = spec.partition("@")
+    repo_path = Path(path).resolve()
+    if not commit:
+        return repo_path.name, repo_path, None
+    repo = git.Repo(repo_path)
+    worktree_path = work_dir / f"{repo_path.name}-{commit[:12]}"
+    repo.git.worktree("add", "--detach", str(worktree_path), commit)
+    return f"{repo_path.name}@{commit[:12]}", worktree_path, repo
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    argparser = argparse.ArgumentParser(
+        description="Benchmark repository ingestion (discovery, chunking, uploads) "
+        "against synthetic repos and pinned local checkouts, offline."
+    )
+    argparser.add_argument(
+        "--synthetic-files",
+        type=int,
+        nargs="*",
+        default=[500],
+        help="Generate one synthetic repo per given file count (none to skip).",
+    )
+    argparser.add_argument(
+        "--language-mix",
+        type=_parse_language_mix,
+        default="py=3,js=3,go=1,java=1,md=1",
+        help="Extension weights of synthetic repos, e.g. py=3,js=2,md=1.",
+    )
+    argparser.add_argument(
+        "--functions-per-file",
+        type=int,
+        default=10,
+        help="Average functions per synthetic file.",
+    )
+    argparser.add_argument("--seed", type=int, default=0)
+    argparser.add_argument(
+        "--repo",
+        action="append",
+        default=[],
+        help="Local checkout to benchmark as PATH or PATH@COMMIT (repeatable).",
+    )
+    argparser.add_argument(
+        "--strategy",
+        action="append",
+        choices=CHUNKING_STRATEGIES,
+        help="Chunking strategy to benchmark (default: all).",
+    )
+    argparser.add_argument("--chunk-workers", type=int, default=config.chunk_workers)
+    argparser.add_argument("--upload-workers", type=int, default=config.upload_workers)
+    argparser.add_argument(
+        "--upload-latency-ms",
+        type=float,
+        default=20.0,
+        help="Latency the local store adds to every object operation.",
+    )
+    argparser.add_argument(
+        "--no-upload", action="store_true", help="Skip the upload benchmark."
+    )
+    argparser.add_argument(
+        "--output", type=Path, help="Write the JSON report here instead of stdout."
+    )
+    args = argparser.parse_args(argv)
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "tree_sitter": TREE_SITTER_AVAILABLE,
+        "settings": {
+            "chunk_workers": args.chunk_workers,
+            "upload_workers": args.upload_workers,
+            "upload_latency_ms": args.upload_latency_ms,
+            "seed": args.seed,
+        },
+        "repos": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="ingest-benchmark-") as tmp_dir:
+        tmp_path = Path(tmp_dir)
+        targets, pinned = [], []
+        for files in args.synthetic_files:
+            repo_path = generate_synthetic_repo(
+                tmp_path / f"synthetic-{files}",
+                files,
+                args.language_mix,
+                functions_per_file=args.functions_per_file,
+                seed=args.seed,
+            )
+            targets.append((f"synthetic-{files}", repo_path))
+        try:
+            for spec in args.repo:
+                label, repo_path, owner = _checkout_pinned(spec, tmp_path)
+                targets.append((label, repo_path))
+                if owner is not None:
+                    pinned.append((owner, repo_path))
+
+            for label, repo_path in targets:
+                report["repos"].append(
+                    run_benchmark(
+                        repo_path,
+                        label,
+                        strategies=tuple(args.strategy or CHUNKING_STRATEGIES),
+                        chunk_workers=args.chunk_workers,
+                        upload=not args.no_upload,
+                        upload_latency_s=args.upload_latency_ms / 1000,
+                        upload_workers=args.upload_workers,
+                        store_root=tmp_path,
+                    )
+                )
+        finally:
+            for owner, worktree_path in pinned:
+                owner.git.worktree("remove", "--force", str(worktree_path))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n")
+        logger.info("Benchmark report written", path=str(args.output))
+    else:
+        sys.stdout.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
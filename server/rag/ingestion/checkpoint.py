@@ -0,0 +1,132 @@
+import json
+import time
+import uuid
+from typing import Iterable, Optional
+
+from google.api_core.exceptions import NotFound
+from google.cloud import storage
+
+from logger import structlog
+from rag.ingestion.manifest import ChunkManifest
+
+logger = structlog.get_logger()
+
+CHECKPOINT_VERSION = 1
+
+
+def checkpoint_blob_name(gcs_folder_prefix: str) -> str:
+    """Lives next to the manifest, outside the chunk folder that gets imported."""
+    return f"{gcs_folder_prefix.rstrip('/')}.checkpoint.json"
+
+
+class IngestionCheckpoint:
+    """
+    Durable progress of a full ingestion job into a GCS folder prefix.
+
+    While chunks are uploaded, the ones that finished are saved periodically
+    along with the corpus the job created, so a job that dies half way (pod
+    restart, GCS errors) is resumed by the next run for the same repo: uploaded
+    chunks are not uploaded again and the corpus is reused instead of being
+    created again and left orphaned. The checkpoint is deleted once the job's
+    manifest has been saved.
+    """
+
+    def __init__(
+        self,
+        gcs_folder_prefix: str,
+        job_id: Optional[str] = None,
+        commit_hash: Optional[str] = None,
+        corpus_name: Optional[str] = None,
+        chunks: Optional[dict[str, str]] = None,
+    ):
+        self.gcs_folder_prefix = gcs_folder_prefix
+        self.job_id = job_id or uuid.uuid4().hex
+        self.commit_hash = commit_hash
+        self.corpus_name = corpus_name
+        self.chunks: dict[str, str] = dict(chunks or {})
+        self._last_saved = time.monotonic()
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "version": CHECKPOINT_VERSION,
+                "job_id": self.job_id,
+                "gcs_folder_prefix": self.gcs_folder_prefix,
+                "commit_hash": self.commit_hash,
+                "corpus_name": self.corpus_name,
+                "chunks": self.chunks,
+            },
+            sort_keys=True,
+        )
+
+    @classmethod
+    def from_json(cls, gcs_folder_prefix: str, payload: str) -> "IngestionCheckpoint":
+        data = json.loads(payload)
+        if data.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version: {data.get('version')!r}")
+        return cls(
+            gcs_folder_prefix,
+            job_id=data.get("job_id"),
+            commit_hash=data.get("commit_hash"),
+            corpus_name=data.get("corpus_name"),
+            chunks=data.get("chunks") or {},
+        )
+
+    @classmethod
+    def load(
+        cls, bucket: storage.Bucket, gcs_folder_prefix: str
+    ) -> Optional["IngestionCheckpoint"]:
+        """The checkpoint of an unfinished job for this prefix, if any."""
+        blob = bucket.blob(checkpoint_blob_name(gcs_folder_prefix))
+        try:
+            checkpoint = cls.from_json(gcs_folder_prefix, blob.download_as_text())
+        except NotFound:
+            return None
+        except ValueError as e:
+            logger.warn(
+                "Ignoring unreadable ingestion checkpoint",
+                gcs_folder_prefix=gcs_folder_prefix,
+                error=str(e),
+            )
+            return None
+        logger.info(
+            "Found checkpoint of an unfinished ingestion job",
+            job_id=checkpoint.job_id,
+            gcs_folder_prefix=gcs_folder_prefix,
+            chunks=len(checkpoint.chunks),
+            corpus_name=checkpoint.corpus_name,
+        )
+        return checkpoint
+
+    def save(self, bucket: storage.Bucket) -> None:
+        bucket.blob(checkpoint_blob_name(self.gcs_folder_prefix)).upload_from_string(
+            self.to_json(), content_type="application/json"
+        )
+        self._last_saved = time.monotonic()
+        logger.debug(
+            "Saved ingestion checkpoint", job_id=self.job_id, chunks=len(self.chunks)
+        )
+
+    def is_due(self, interval_s: float) -> bool:
+        return time.monotonic() - self._last_saved >= interval_s
+
+    def record_uploads(
+        self, manifest: ChunkManifest, blob_names: Iterable[str]
+    ) -> None:
+        """Marks chunks of `manifest` as uploaded to GCS."""
+        for blob_name in blob_names:
+            chunk_hash = manifest.get(blob_name)
+            if chunk_hash is not None:
+                self.chunks[blob_name] = chunk_hash
+
+    def resume(self, manifest: ChunkManifest) -> None:
+        """Treats the chunks this job already uploaded as part of `manifest`."""
+        for blob_name, chunk_hash in self.chunks.items():
+            manifest.add(blob_name, chunk_hash)
+
+    def delete(self, bucket: storage.Bucket) -> None:
+        try:
+            bucket.blob(checkpoint_blob_name(self.gcs_folder_prefix)).delete()
+        except NotFound:
+            pass
+        logger.info("Ingestion job finished", job_id=self.job_id)
@@ -0,0 +1,437 @@
+import itertools
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from logger import structlog
+from rag.ingestion.classify import SKIPPED_KINDS, classify_file, truncate_chunks
+from rag.ingestion.config import config
+from rag.ingestion.limits import chunking_slots
+from rag.ingestion.pipeline import StageMetrics
+
+logger = structlog.get_logger()
+
+try:
+    from rag.ingestion.parsers import dialect_for, parser_registry
+
+    TREE_SITTER_AVAILABLE = True
+except ImportError:
+    TREE_SITTER_AVAILABLE = False
+
+# (start_line, end_line, chunk_text), lines are 1-indexed and inclusive.
+Chunk = tuple[int, int, str]
+
+LANGUAGE_BY_EXTENSION = {
+    ".py": "python",
+    ".js": "javascript",
+    ".jsx": "javascript",
+    ".ts": "typescript",
+    ".tsx": "typescript",
+    ".java": "java",
+    ".kt": "kotlin",
+    ".go": "go",
+}
+
+# Worker processes are started with forkserver where available: the upload
+# stage runs threads in this process, and forking a threaded process is unsafe.
+# The fork server preloads this module, and with it the whole rag package
+# (rag/__init__ imports the agent), once: workers are forked from it and
+# inherit those imports instead of each importing them again.
+if "forkserver" in multiprocessing.get_all_start_methods():
+    _POOL_CONTEXT = multiprocessing.get_context("forkserver")
+    _POOL_CONTEXT.set_forkserver_preload([__name__])
+else:
+    _POOL_CONTEXT = multiprocessing.get_context("spawn")
+
+
+def chunk_file_by_lines(file_path: Path, chunk_size: int = 20):
+    """
+    Splits a file into chunks of N lines. Returns a list of (start_line, end_line, chunk_text).
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    chunks = []
+    for i in range(0, len(lines), chunk_size):
+        chunk_lines = lines[i : i + chunk_size]
+        start_line = i + 1
+        end_line = i + len(chunk_lines)
+        chunks.append((start_line, end_line, "".join(chunk_lines)))
+    return chunks
+
+
+def chunk_file_by_tree_sitter(
+    file_path: Path,
+    language: str = "python",
+    max_bytes: int = config.tree_sitter_max_chunk_bytes,
+    min_bytes: int = config.tree_sitter_min_chunk_bytes,
+):
+    """
+    Chunks a file using tree-sitter to create semantically meaningful chunks.
+    Returns a list of (start_line, end_line, chunk_text).
+    Supported languages: python, typescript, java, kotlin, go
+
+    Nodes larger than `max_bytes` (e.g. big classes) are split into their
+    members, and adjacent nodes smaller than `min_bytes` (e.g. imports) are
+    merged, see `_HierarchicalChunker`.
+    """
+
+    if not TREE_SITTER_AVAILABLE:
+        logger.warn(
+            "tree-sitter not available; falling back to line-based chunking.",
+            file=str(file_path),
+        )
+        return chunk_file_by_lines(file_path)
+
+    supported_langs = {"python", "typescript", "java", "kotlin", "go", "javascript"}
+    if language not in supported_langs:
+        logger.warn(
+            f"Language {language} not supported for tree-sitter chunking; falling back to line-based chunking.",
+            file=str(file_path),
+        )
+        return chunk_file_by_lines(file_path)
+
+    try:
+        # Read file content
+        with open(file_path, "r", encoding="utf-8") as f:
+            content = f.read()
+            lines = content.splitlines()
+
+        # Parse the file with the cached parser for this language/dialect
+        tree = parser_registry.parse(
+            dialect_for(language, file_path), bytes(content, "utf-8")
+        )
+
+        chunks = _HierarchicalChunker(lines, max_bytes, min_bytes).chunk(tree.root_node)
+
+        if not chunks:
+            logger.debug(
+                "No suitable tree-sitter chunks found; falling back to line-based chunking.",
+                file=str(file_path),
+            )
+            return chunk_file_by_lines(file_path)
+
+        return chunks
+
+    except Exception as e:
+        logger.error(
+            "Error during tree-sitter chunking; falling back to line-based chunking.",
+            file=str(file_path),
+            error=str(e),
+        )
+        return chunk_file_by_lines(file_path)
+
+
+# Node types holding the members of a class, function, etc. when a grammar has
+# no `body` field for them.
+BODY_NODE_TYPES = {
+    "block",
+    "class_body",
+    "interface_body",
+    "enum_body",
+    "function_body",
+    "statement_block",
+    "declaration_list",
+    "field_declaration_list",
+}
+
+
+class _HierarchicalChunker:
+    """
+    Size-aware chunking of a tree-sitter syntax tree.
+
+    Top-level nodes become chunks. A node larger than `max_bytes` is split
+    into the members of its body (class members, function statements, ...)
+    recursively, and the enclosing declaration lines, e.g. `class Foo:`, are
+    prepended to those chunks as context. A node without a body is split by
+    lines. Adjacent siblings are merged while one of them is smaller than
+    `min_bytes` and the result stays within `max_bytes`, so runs of imports
+    or constants end up in a single chunk.
+
+    Chunk line ranges cover only the chunk's own lines, not the prepended
+    header lines.
+    """
+
+    def __init__(self, lines: list[str], max_bytes: int, min_bytes: int):
+        self.lines = lines
+        self.max_bytes = max(1, max_bytes)
+        self.min_bytes = min_bytes
+        self.offsets = [0]
+        for line in lines:
+            self.offsets.append(self.offsets[-1] + len(line.encode("utf-8")) + 1)
+        self.chunks: list[Chunk] = []
+
+    def chunk(self, root_node) -> list[Chunk]:
+        self._chunk_siblings(root_node.named_children, [])
+        return self.chunks
+
+    def _size(self, start_row: int, end_row: int) -> int:
+        return self.offsets[end_row + 1] - self.offsets[start_row]
+
+    def _emit(self, start_row: int, end_row: int, header: list[str]) -> None:
+        text = "\n".join(header + self.lines[start_row : end_row + 1])
+        self.chunks.append((start_row + 1, end_row + 1, text))
+
+    def _chunk_siblings(self, nodes, header: list[str]) -> None:
+        pending = None  # (start_row, end_row) of siblings merged so far
+        for node in nodes:
+            start_row = node.start_point[0]
+            end_row = min(node.end_point[0], len(self.lines) - 1)
+            if end_row < start_row:
+                continue
+            if pending is not None and start_row <= pending[1]:
+                # Shares a line with the previous sibling
+                pending = (pending[0], max(pending[1], end_row))
+                continue
+
+            size = self._size(start_row, end_row)
+            if size > self.max_bytes:
+                if pending is not None:
+                    self._emit(*pending, header)
+                    pending = None
+                self._split(node, start_row, end_row, header)
+                continue
+
+            if pending is not None:
+                pending_size = self._size(*pending)
+                if (
+                    min(pending_size, size) < self.min_bytes
+                    and self._size(pending[0], end_row) <= self.max_bytes
+                ):
+                    pending = (pending[0], end_row)
+                    continue
+                self._emit(*pending, header)
+            pending = (start_row, end_row)
+
+        if pending is not None:
+            self._emit(*pending, header)
+
+    def _split(self, node, start_row: int, end_row: int, header: list[str]) -> None:
+        body = self._body_of(node)
+        members = body.named_children if body is not None else []
+        if members and members[0].start_point[0] > start_row:
+            body_row = members[0].start_point[0]
+            self._chunk_siblings(members, header + self.lines[start_row:body_row])
+            return
+
+        # No body to recurse into: split by lines within the budget.
+        chunk_start = start_row
+        for row in range(start_row, end_row + 1):
+            if row > chunk_start and self._size(chunk_start, row) > self.max_bytes:
+                self._emit(chunk_start, row - 1, header)
+                chunk_start = row
+        self._emit(chunk_start, end_row, header)
+
+    @staticmethod
+    def _body_of(node):
+        body = node.child_by_field_name("body")
+        if body is not None:
+            return body
+        # Decorated definitions, export statements and the like wrap the node
+        # that actually has the body.
+        for field in ("definition", "declaration"):
+            inner = node.child_by_field_name(field)
+            if inner is not None:
+                return _HierarchicalChunker._body_of(inner)
+        for child in reversed(node.named_children):
+            if child.type in BODY_NODE_TYPES:
+                return child
+        return None
+
+
+def chunk_file(
+    file_path: Path,
+    chunking_strategy: str = "tree-sitter",  # 'lines' or 'tree-sitter'
+    chunk_size: int = 20,  # Only used for line-based chunking
+) -> list[Chunk]:
+    """Chunks a single file with the given strategy."""
+    ext = file_path.suffix.lower()
+
+    # For .md/.txt, treat as a single chunk
+    if ext in [".md", ".txt"]:
+        with open(file_path, "r", encoding="utf-8") as f:
+            chunk_text = f.read()
+        return [(1, chunk_text.count("\n") + 1, chunk_text)]
+
+    if chunking_strategy != "tree-sitter":
+        return chunk_file_by_lines(file_path, chunk_size=chunk_size)
+
+    if not TREE_SITTER_AVAILABLE:
+        logger.warn(
+            "tree-sitter not available, falling back to line-based chunking.",
+            file=str(file_path),
+        )
+        return chunk_file_by_lines(file_path, chunk_size=chunk_size)
+
+    language = LANGUAGE_BY_EXTENSION.get(ext)
+    if language is None:
+        logger.warn(
+            "Unsupported language for tree-sitter chunking, falling back to line-based.",
+            file=str(file_path),
+            extension=ext,
+        )
+        return chunk_file_by_lines(file_path, chunk_size=chunk_size)
+    return chunk_file_by_tree_sitter(file_path, language=language)
+
+
+def _chunk_batch(
+    local_repo_path: Path,
+    rel_paths: list[str],
+    chunking_strategy: str,
+    chunk_size: int,
+    max_bytes: int,
+) -> tuple[list[tuple[str, Optional[list[Chunk]]]], dict, list[tuple[float, int]]]:
+    """
+    Chunks a batch of files. Runs in a pool worker or inline.
+
+    Files are classified first (see `classify_file`): binary, generated and
+    minified files are skipped, and only the head of large data files is kept.
+
+    Returns the per-file results (None for skipped files), the
+    tree-sitter parse stats gathered while chunking the batch, so a worker's
+    stats can be merged into the parent process' registry, and the
+    (seconds, bytes) spent reading and chunking each file.
+    """
+    stats_before = parser_registry.stats() if TREE_SITTER_AVAILABLE else {}
+    results, timings = [], []
+    for rel_path in rel_paths:
+        started = time.perf_counter()
+        file_path = local_repo_path / rel_path
+        try:
+            size = file_path.stat().st_size
+            if max_bytes > 0 and size > max_bytes:
+                logger.debug("Skipping large file", file=str(file_path), size=size)
+                results.append((rel_path, None))
+                continue
+            classification = classify_file(file_path) if config.classify_files else None
+            if classification is not None and classification.kind in SKIPPED_KINDS:
+                logger.debug(
+                    f"Skipping {classification.kind} file",
+                    file=rel_path,
+                    reason=classification.reason,
+                )
+                results.append((rel_path, None))
+                continue
+            chunks = chunk_file(file_path, chunking_strategy, chunk_size)
+        except UnicodeDecodeError as e:
+            logger.warn("Skipping file that is not UTF-8", file=rel_path, error=str(e))
+            results.append((rel_path, None))
+            continue
+        except OSError as e:
+            # Deleted or unreadable since discovery.
+            logger.warn("Skipping unreadable file", file=rel_path, error=str(e))
+            results.append((rel_path, None))
+            continue
+        if classification is not None and classification.kind == "large_data":
+            chunks = truncate_chunks(chunks, config.large_data_truncate_bytes)
+            logger.debug(
+                "Truncated large data file",
+                file=rel_path,
+                reason=classification.reason,
+                chunks=len(chunks),
+            )
+        results.append((rel_path, chunks))
+        timings.append((time.perf_counter() - started, size))
+    stats = parser_registry.stats_since(stats_before) if TREE_SITTER_AVAILABLE else {}
+    return results, stats, timings
+
+
+def chunk_files(
+    local_repo_path: Path,
+    file_paths: Iterable[Path],
+    chunking_strategy: str = "tree-sitter",
+    chunk_size: int = 20,
+    max_bytes: int = 0,
+    workers: int = config.chunk_workers,
+    batch_size: int = config.chunk_batch_size,
+    max_in_flight: int = config.chunk_max_in_flight_batches,
+    metrics: Optional[StageMetrics] = None,
+) -> Iterator[tuple[str, Optional[list[Chunk]]]]:
+    """
+    Chunks files, fanning batches of files out across a process pool.
+
+    Yields `(rel_path, chunks)` per file, where chunks is a list of
+    `(start_line, end_line, chunk_text)`, or None when the file was skipped
+    for exceeding `max_bytes`. Results are yielded in the order of
+    `file_paths` regardless of which worker finishes first, so manifests and
+    upload order stay deterministic. `file_paths` is consumed lazily, and at
+    most `max_in_flight` batches (0 = two per worker) are in flight, which
+    keeps memory bounded when the consumer is slower than the pool.
+
+    `workers` of 0 uses one process per CPU. With a single worker, or when
+    everything fits in one batch, files are chunked in this process.
+    """
+    batch_size = max(1, batch_size)
+    rel_paths = (
+        str(file_path.relative_to(local_repo_path)) for file_path in file_paths
+    )
+
+    def next_batch() -> list[str]:
+        return list(itertools.islice(rel_paths, batch_size))
+
+    # Peek at two batches to decide whether a pool is worth starting.
+    first, second = next_batch(), next_batch()
+
+    def batches() -> Iterator[list[str]]:
+        yield from (batch for batch in (first, second) if batch)
+        while batch := next_batch():
+            yield batch
+
+    def collect(results, stats, timings) -> list[tuple[str, Optional[list[Chunk]]]]:
+        if stats:
+            parser_registry.merge_stats(stats)
+        if metrics is not None:
+            for elapsed, nbytes in timings:
+                metrics.record(elapsed, nbytes=nbytes)
+        return results
+
+    workers = workers if workers > 0 else (os.cpu_count() or 1)
+    if workers <= 1 or not second:
+        for batch in batches():
+            results, _, timings = _chunk_batch(
+                local_repo_path, batch, chunking_strategy, chunk_size, max_bytes
+            )
+            yield from collect(results, None, timings)
+        return
+
+    max_in_flight = max_in_flight if max_in_flight > 0 else 2 * workers
+    logger.info(
+        "Chunking files in worker processes",
+        workers=workers,
+        batch_size=batch_size,
+        max_in_flight=max_in_flight,
+    )
+    # One pool per chunking slot keeps concurrent ingestions from
+    # oversubscribing the CPUs.
+    with (
+        chunking_slots,
+        ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=_POOL_CONTEXT,
+        ) as executor,
+    ):
+        in_flight = deque()
+        try:
+            for batch in batches():
+                in_flight.append(
+                    executor.submit(
+                        _chunk_batch,
+                        local_repo_path,
+                        batch,
+                        chunking_strategy,
+                        chunk_size,
+                        max_bytes,
+                    )
+                )
+                if metrics is not None:
+                    metrics.record_depth(len(in_flight))
+                if len(in_flight) >= max_in_flight:
+                    yield from collect(*in_flight.popleft().result())
+            while in_flight:
+                yield from collect(*in_flight.popleft().result())
+        finally:
+            for future in in_flight:
+                future.cancel()
@@ -0,0 +1,126 @@
+import codecs
+import re
+from pathlib import Path
+from typing import Literal, NamedTuple
+
+from rag.ingestion.config import config
+
+# text:       chunked as usual
+# binary:     NUL bytes or not UTF-8; skipped
+# generated:  lockfiles, compiled protobufs, files marked as generated; skipped
+# minified:   bundles with very long lines; skipped
+# large_data: big JSON/YAML/XML data files; only the head is chunked
+FileKind = Literal["text", "binary", "generated", "minified", "large_data"]
+
+SKIPPED_KINDS = frozenset({"binary", "generated", "minified"})
+
+GENERATED_FILE_NAMES = frozenset(
+    {
+        "package-lock.json",
+        "npm-shrinkwrap.json",
+        "yarn.lock",
+        "pnpm-lock.yaml",
+        "composer.lock",
+        "Gemfile.lock",
+        "Pipfile.lock",
+        "poetry.lock",
+        "uv.lock",
+        "Cargo.lock",
+    }
+)
+GENERATED_SUFFIXES = (
+    ".min.js",
+    ".min.css",
+    ".bundle.js",
+    ".chunk.js",
+    ".pb.go",
+    "_pb2.py",
+    "_pb2_grpc.py",
+    ".pb.h",
+    ".pb.cc",
+    ".g.dart",
+    ".designer.cs",
+)
+# Markers tools put in the header of generated files.
+GENERATED_MARKER_RE = re.compile(
+    rb"@generated|do not edit|code generated by|auto-?generated|generated by the protocol buffer compiler",
+    re.IGNORECASE,
+)
+DATA_EXTENSIONS = frozenset({".json", ".yaml", ".yml", ".xml"})
+# Only the start of the sample is searched for markers.
+MARKER_WINDOW_BYTES = 1024
+
+
+class FileClassification(NamedTuple):
+    kind: FileKind
+    reason: str = ""
+
+
+def classify_sample(name: str, sample: bytes, size: int) -> FileClassification:
+    """
+    Classifies a file from its name, its size and a sample of its first bytes.
+    Cheap enough to run on every file before chunking it.
+    """
+    lower_name = name.lower()
+    if name in GENERATED_FILE_NAMES:
+        return FileClassification("generated", "lockfile")
+    if lower_name.endswith(GENERATED_SUFFIXES):
+        return FileClassification("generated", "generated file suffix")
+
+    if b"\0" in sample:
+        return FileClassification("binary", "NUL byte")
+    try:
+        # Incremental decoding tolerates a character cut off by the sample end.
+        codecs.getincrementaldecoder("utf-8")().decode(
+            sample, final=len(sample) >= size
+        )
+    except UnicodeDecodeError:
+        return FileClassification("binary", "not UTF-8")
+
+    if GENERATED_MARKER_RE.search(sample[:MARKER_WINDOW_BYTES]):
+        return FileClassification("generated", "generated marker")
+
+    lines = sample.split(b"\n")
+    if len(sample) < size:
+        # The last line is cut off by the sample.
+        lines = lines[:-1] or lines
+    longest = max(len(line) for line in lines)
+    mean = sum(len(line) for line in lines) / len(lines)
+    if longest > config.minified_max_line_length and (
+        mean > config.minified_mean_line_length or len(lines) <= 2
+    ):
+        return FileClassification(
+            "minified", f"longest line {longest}, mean {mean:.0f} bytes"
+        )
+
+    if (
+        Path(lower_name).suffix in DATA_EXTENSIONS
+        and size > config.large_data_file_bytes
+    ):
+        return FileClassification("large_data", f"{size} bytes")
+    return FileClassification("text")
+
+
+def classify_file(
+    file_path: Path, sample_bytes: int = config.classify_sample_bytes
+) -> FileClassification:
+    """Classifies a file by reading at most `sample_bytes` of it."""
+    size = file_path.stat().st_size
+    if size == 0:
+        return FileClassification("text")
+    with open(file_path, "rb") as f:
+        sample = f.read(sample_bytes)
+    return classify_sample(file_path.name, sample, size)
+
+
+def truncate_chunks(
+    chunks: list[tuple[int, int, str]], max_bytes: int
+) -> list[tuple[int, int, str]]:
+    """Keeps the leading chunks that fit in `max_bytes` (at least one)."""
+    kept, total = [], 0
+    for chunk in chunks:
+        total += len(chunk[2].encode("utf-8"))
+        if kept and total > max_bytes:
+            break
+        kept.append(chunk)
+    return kept
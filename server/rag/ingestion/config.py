@@ -1,7 +1,10 @@
+from typing import Literal
+
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from rag.config import GoogleConfig
+from utils.git_clone import CloneStrategy
 
 
 class RAGIngestConfig(BaseSettings):
@@ -67,6 +70,133 @@ class RAGIngestConfig(BaseSettings):
     local_repo_path: str = Field(
         "./cloned_repo", description="Local path to clone repo"
     )
+    clone_strategy: CloneStrategy = Field(
+        "shallow",
+        description="How repos are cloned: full, shallow (depth 1), blobless "
+        "(--filter=blob:none) or sparse (blobless, supported extensions only)",
+    )
+    upload_workers: int = Field(
+        8, description="Number of concurrent chunk upload workers"
+    )
+    upload_max_retries: int = Field(
+        3, description="Maximum retries per chunk upload before giving up"
+    )
+    upload_retry_backoff_s: float = Field(
+        0.5, description="Initial backoff in seconds between upload retries"
+    )
+    upload_gzip: bool = Field(
+        False, description="Upload chunks gzip-compressed with Content-Encoding: gzip"
+    )
+    chunk_workers: int = Field(
+        0,
+        description="Chunking worker processes (0 = one per CPU, 1 = chunk in-process)",
+    )
+    chunk_batch_size: int = Field(
+        64, description="Number of files handed to a chunking worker at a time"
+    )
+    chunk_max_in_flight_batches: int = Field(
+        0, description="Chunking batches in flight at once (0 = two per worker)"
+    )
+    discover_queue_size: int = Field(
+        1024, description="Discovered files buffered ahead of the chunking stage"
+    )
+    upload_queue_size: int = Field(
+        0,
+        description="Chunks buffered ahead of the upload workers (0 = four per worker)",
+    )
+    import_batch_size: int = Field(
+        25, description="GCS URIs passed to a single rag.import_files request"
+    )
+    checkpoint_interval_s: float = Field(
+        30.0,
+        description="Seconds between saving the progress checkpoint of a full ingestion job",
+    )
+    reuse_corpora: bool = Field(
+        True,
+        description="Upsert into the corpus registered for a repo instead of creating a new one",
+    )
+    corpus_registry_prefix: str = Field(
+        "corpus-registry", description="GCS prefix of the repo -> corpus registry"
+    )
+    max_concurrent_ingestions: int = Field(
+        2,
+        description="Background ingestions (clone, chunk, upload, import) run at once",
+    )
+    max_finished_operations: int = Field(
+        100, description="Finished background ingestions kept for status polling"
+    )
+    max_concurrent_clones: int = Field(
+        2, description="Clones and pulls run at once across all ingestions"
+    )
+    max_concurrent_chunking: int = Field(
+        1,
+        description="Chunking process pools (of chunk_workers each) run at once across all ingestions",
+    )
+    rag_api_qps: float = Field(
+        5.0, description="RAG API calls per second across all ingestions (0 = no limit)"
+    )
+    rag_api_burst: int = Field(
+        5, description="RAG API calls allowed in a burst above rag_api_qps"
+    )
+    batch_max_parallel_repos: int = Field(
+        4, description="Repositories of a batch ingestion processed at once"
+    )
+    chunk_index_path: str = Field(
+        "./chunk_index.sqlite",
+        description="Local SQLite index of chunk metadata for retrieval ('' to disable)",
+    )
+    lexical_index: bool = Field(
+        True,
+        description="Also index chunk text in the chunk index for local lexical search",
+    )
+    storage_backend: Literal["vertex", "local"] = Field(
+        "vertex",
+        description="Where chunks and corpora live: GCS + Vertex AI RAG, or a local directory",
+    )
+    local_storage_root: str = Field(
+        "./local_store", description="Root directory of the local storage backend"
+    )
+    local_storage_latency_s: float = Field(
+        0.0, description="Latency added to every call of the local storage backend"
+    )
+    local_storage_jitter_s: float = Field(
+        0.0, description="Random extra latency of up to this many seconds per call"
+    )
+    classify_files: bool = Field(
+        True,
+        description="Skip binary, generated and minified files and truncate large data files",
+    )
+    classify_sample_bytes: int = Field(
+        8192, description="Bytes read from the start of a file to classify it"
+    )
+    minified_max_line_length: int = Field(
+        1000, description="Files with lines longer than this may be minified"
+    )
+    minified_mean_line_length: int = Field(
+        300, description="Mean line length above which a long-lined file is minified"
+    )
+    large_data_file_bytes: int = Field(
+        256 * 1024, description="JSON/YAML/XML files larger than this are truncated"
+    )
+    large_data_truncate_bytes: int = Field(
+        64 * 1024, description="Chunk bytes kept from the start of a large data file"
+    )
+    tree_sitter_max_chunk_bytes: int = Field(
+        4000, description="Tree-sitter chunks larger than this are split into members"
+    )
+    tree_sitter_min_chunk_bytes: int = Field(
+        800, description="Adjacent tree-sitter chunks smaller than this are merged"
+    )
+    chunk_layout: Literal["objects", "shards"] = Field(
+        "objects",
+        description="Upload one GCS object per chunk, or pack chunks into JSONL shards",
+    )
+    chunk_shard_buckets: int = Field(
+        64, description="Number of hash buckets files are spread over in shards"
+    )
+    chunk_shard_max_bytes: int = Field(
+        2 * 1024 * 1024, description="Size cap of a JSONL chunk shard"
+    )
     chunk_size: int = Field(500, description="Chunk size for RAG import")
     chunk_overlap: int = Field(100, description="Chunk overlap for RAG import")
     similarity_top_k: int = Field(10, description="Top K for similarity search")
@@ -0,0 +1,232 @@
+import os
+import re
+from pathlib import Path
+from typing import Iterator, Optional
+
+from logger import structlog
+from rag.ingestion.config import config
+
+logger = structlog.get_logger()
+
+# Entries ending in "/" are directory names pruned at any depth, the others are
+# file names. Hidden files and directories are always skipped.
+IGNORE_PATTERN = [
+    "node_modules/",
+    "dist/",
+    "build/",
+    "target/",
+    "venv/",
+    "assets/",
+    "public/",
+    "static/",
+    "images/",
+    ".git/",
+    ".DS_Store/",
+    ".idea/",
+    ".vscode/",
+    ".pytest_cache/",
+    ".ruff_cache/",
+    ".venv/",
+    ".env",
+    ".env.local",
+    ".env.development",
+    ".env.production",
+    ".env.test",
+    ".env.development.local",
+]
+
+
+def _translate_gitignore_pattern(pattern: str) -> str:
+    """Translates the path part of a .gitignore pattern into a regex body."""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i) and (i == 0 or pattern[i - 1] == "/"):
+            out.append("(?:.*/)?")
+            i += 3
+        elif (
+            pattern.startswith("**", i)
+            and i + 2 == n
+            and (i == 0 or pattern[i - 1] == "/")
+        ):
+            out.append(".*")
+            i += 2
+        elif c == "*":
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                out.append(re.escape(c))
+                i += 1
+                continue
+            body = pattern[i + 1 : end]
+            if body[0] in "!^":
+                body = "^" + body[1:]
+            out.append(f"[{body}]")
+            i = end + 1
+        elif c == "\\" and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+
+class GitignoreRules:
+    """
+    Compiled rules of one .gitignore file. Paths are matched relative to the
+    directory holding the file, with "/" separators; the last matching rule
+    wins, as in git.
+    """
+
+    def __init__(self, lines: list[str]):
+        self.rules: list[tuple[re.Pattern, bool, bool]] = []
+        for line in lines:
+            line = line.rstrip("\n")
+            if not line.endswith("\\ "):
+                line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            if negated:
+                line = line[1:]
+            elif line.startswith("\\"):
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            anchored = "/" in line
+            body = _translate_gitignore_pattern(line.lstrip("/"))
+            regex = f"^{body}$" if anchored else f"^(?:.*/)?{body}$"
+            self.rules.append((re.compile(regex), negated, dir_only))
+
+    @classmethod
+    def load(cls, directory: Path) -> Optional["GitignoreRules"]:
+        try:
+            with open(directory / ".gitignore", "r", encoding="utf-8") as f:
+                rules = cls(f.readlines())
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        except (OSError, UnicodeDecodeError) as e:
+            logger.warn(
+                "Ignoring unreadable .gitignore", directory=str(directory), error=str(e)
+            )
+            return None
+        return rules if rules.rules else None
+
+    def match(self, rel_path: str, is_dir: bool) -> Optional[bool]:
+        """True if ignored, False if re-included by a negation, None if no rule matches."""
+        for regex, negated, dir_only in reversed(self.rules):
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path):
+                return not negated
+        return None
+
+
+class RepoWalker:
+    """
+    Discovers the files of a local repo that should be chunked.
+
+    The tree is walked with `os.scandir`, and ignored directories (the
+    `IGNORE_PATTERN` directory names, hidden directories and anything excluded
+    by the repo's .gitignore files) are pruned before they are entered, so
+    `node_modules/`, `.git/` etc. cost one directory entry each. Supported
+    files are recognised with a single `str.endswith` over the configured
+    extensions.
+    """
+
+    def __init__(
+        self,
+        local_repo_path: Path,
+        supported_extensions: list[str] = config.supported_extensions,
+        ignore_patterns: list[str] = IGNORE_PATTERN,
+        use_gitignore: bool = True,
+    ):
+        self.root = Path(local_repo_path)
+        self.use_gitignore = use_gitignore
+        self._suffixes = tuple(ext.lower() for ext in supported_extensions)
+        self._names = frozenset(supported_extensions)
+        self._ignored_dirs = frozenset(
+            pattern.rstrip("/") for pattern in ignore_patterns if pattern.endswith("/")
+        )
+        self._ignored_files = frozenset(
+            pattern for pattern in ignore_patterns if not pattern.endswith("/")
+        )
+        self._gitignores: dict[str, Optional[GitignoreRules]] = {}
+
+    def is_supported(self, name: str) -> bool:
+        return name.lower().endswith(self._suffixes) or name in self._names
+
+    def iter_files(self) -> Iterator[Path]:
+        """Yields the supported, non-ignored files under the root in sorted order."""
+        yield from self._walk("")
+
+    def includes(self, rel_path: str) -> bool:
+        """Whether a repo-relative file path would be yielded by `iter_files`."""
+        parts = Path(rel_path).parts
+        if not parts or not self.is_supported(parts[-1]):
+            return False
+        for depth, name in enumerate(parts):
+            parent = "/".join(parts[:depth])
+            is_dir = depth < len(parts) - 1
+            if self._is_ignored(parent, name, is_dir):
+                return False
+        return True
+
+    def _walk(self, rel_dir: str) -> Iterator[Path]:
+        directory = self.root / rel_dir if rel_dir else self.root
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as e:
+            logger.warn("Cannot list directory", directory=str(directory), error=str(e))
+            return
+
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                if not self._is_ignored(rel_dir, entry.name, is_dir=True):
+                    yield from self._walk(rel_path)
+            elif (
+                entry.is_file()
+                and self.is_supported(entry.name)
+                and not self._is_ignored(rel_dir, entry.name, is_dir=False)
+            ):
+                yield Path(entry.path)
+
+    def _is_ignored(self, rel_dir: str, name: str, is_dir: bool) -> bool:
+        if name.startswith("."):
+            return True
+        if name in (self._ignored_dirs if is_dir else self._ignored_files):
+            return True
+        if not self.use_gitignore:
+            return False
+
+        # The deepest .gitignore with a matching rule decides.
+        rel_path = f"{rel_dir}/{name}" if rel_dir else name
+        parts = rel_dir.split("/") if rel_dir else []
+        for depth in range(len(parts), -1, -1):
+            base = "/".join(parts[:depth])
+            rules = self._rules_for(base)
+            if rules is None:
+                continue
+            matched = rules.match(
+                rel_path[len(base) + 1 :] if base else rel_path, is_dir
+            )
+            if matched is not None:
+                return matched
+        return False
+
+    def _rules_for(self, rel_dir: str) -> Optional[GitignoreRules]:
+        if rel_dir not in self._gitignores:
+            directory = self.root / rel_dir if rel_dir else self.root
+            self._gitignores[rel_dir] = GitignoreRules.load(directory)
+        return self._gitignores[rel_dir]
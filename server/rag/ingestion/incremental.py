@@ -0,0 +1,104 @@
+from pathlib import Path
+from typing import Iterable
+
+import git
+from rag.ingestion.backends import rag
+
+from logger import structlog
+from utils.git_clone import ensure_commit
+
+logger = structlog.get_logger()
+
+
+def diff_commits(
+    local_repo_path: Path, old_commit: str, new_commit: str
+) -> tuple[set[str], set[str]]:
+    """
+    Lists the files that changed between two commits of a local clone.
+
+    Renames are reported as a deletion of the old path plus an addition of the
+    new one, so chunk names (which embed the path) stay consistent. Output is
+    NUL-separated so paths with non-ASCII characters are not quoted by git.
+
+    Returns:
+        tuple[set[str], set[str]]: (added or modified paths, deleted paths),
+        both relative to the repository root.
+
+    In a shallow or partial clone the old commit is fetched on demand.
+
+    Raises:
+        git.GitCommandError: if either commit is not available.
+    """
+    repo = git.Repo(local_repo_path)
+    ensure_commit(repo, old_commit)
+    output = repo.git.diff(
+        "--name-status", "--no-renames", "-z", old_commit, new_commit
+    )
+
+    changed, deleted = set(), set()
+    fields = output.split("\0")
+    for status, rel_path in zip(fields[0::2], fields[1::2]):
+        if not status:
+            continue
+        if status.startswith("D"):
+            deleted.add(rel_path)
+        else:
+            changed.add(rel_path)
+
+    logger.info(
+        "Computed commit diff",
+        old_commit=old_commit,
+        new_commit=new_commit,
+        changed=len(changed),
+        deleted=len(deleted),
+    )
+    return changed, deleted
+
+
+def delete_rag_files_for_uris(
+    rag_corpus_name: str,
+    deleted_uris: Iterable[str],
+    replaced_uris: Iterable[str] = (),
+) -> int:
+    """
+    Removes RagFiles that no longer reflect the chunk objects in GCS. Meant to
+    run after the new chunks have been imported, so the corpus never loses
+    content if the import fails part way.
+
+    - RagFiles imported from `deleted_uris` are deleted.
+    - For `replaced_uris`, only the most recently created RagFile per URI is
+      kept, which drops the copy imported before the chunk was re-uploaded.
+
+    Lists the corpus once and deletes only the matching files.
+
+    Returns:
+        int: Number of RagFiles deleted.
+    """
+    deleted_uris = set(deleted_uris)
+    replaced_uris = set(replaced_uris)
+    if not deleted_uris and not replaced_uris:
+        return 0
+
+    to_delete = []
+    replaced_by_uri = {}
+    for rag_file in rag.list_files(corpus_name=rag_corpus_name):
+        uris = set(rag_file.gcs_source.uris)
+        if uris & deleted_uris:
+            to_delete.append(rag_file.name)
+            continue
+        for uri in uris & replaced_uris:
+            replaced_by_uri.setdefault(uri, []).append(rag_file)
+
+    for rag_files in replaced_by_uri.values():
+        rag_files.sort(key=lambda rag_file: rag_file.create_time, reverse=True)
+        to_delete.extend(rag_file.name for rag_file in rag_files[1:])
+
+    for name in to_delete:
+        rag.delete_file(name=name)
+
+    logger.info(
+        "Deleted RagFiles for replaced or removed chunks",
+        rag_corpus_name=rag_corpus_name,
+        deleted=len(to_delete),
+    )
+    return len(to_delete)
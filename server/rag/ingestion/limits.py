@@ -0,0 +1,97 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from logger import structlog
+from rag.ingestion.config import config
+
+logger = structlog.get_logger()
+
+
+class RateLimiter:
+    """
+    Token bucket allowing `rate` calls per second on average, in bursts of up
+    to `burst` calls. A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Waits for a token; returns the seconds spent waiting."""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class Slots:
+    """
+    A named counting semaphore shared by every ingestion in the process, used
+    as `with slots:`. Logs when a caller has to wait for a slot.
+    """
+
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = max(1, size)
+        self._semaphore = threading.BoundedSemaphore(self.size)
+
+    def __enter__(self) -> "Slots":
+        if not self._semaphore.acquire(blocking=False):
+            logger.info("Waiting for a free slot", limit=self.name, size=self.size)
+            self._semaphore.acquire()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._semaphore.release()
+
+
+class KeyedLocks:
+    """
+    One lock per key, taken with `with locks.hold(key):`. Logs when a caller
+    has to wait for another holder of the same key.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def hold(self, key: str) -> Iterator[None]:
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        if not lock.acquire(blocking=False):
+            logger.info("Waiting for lock", limit=self.name, key=key)
+            lock.acquire()
+        try:
+            yield
+        finally:
+            lock.release()
+
+
+# Process-wide limits, so concurrent and batch ingestions share them.
+clone_slots = Slots("clone", config.max_concurrent_clones)
+chunking_slots = Slots("chunking", config.max_concurrent_chunking)
+rag_api_rate = RateLimiter(config.rag_api_qps, burst=config.rag_api_burst)
+# Ingestions of one repo (registry key) from any entry point, e.g. a batch and
+# a single-repo operation, run one at a time: they share its clone directory,
+# GCS prefix, manifest and checkpoint.
+repo_locks = KeyedLocks("repo")
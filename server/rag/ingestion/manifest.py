@@ -0,0 +1,197 @@
+import base64
+import hashlib
+import json
+from typing import Iterable, Optional
+
+from google.api_core.exceptions import NotFound
+from google.cloud import storage
+
+from logger import structlog
+
+logger = structlog.get_logger()
+
+MANIFEST_VERSION = 1
+# Placeholder hash that never matches `content_hash` of any chunk.
+UNKNOWN_HASH = ""
+
+
+def content_hash(chunk_text: str) -> str:
+    """
+    Returns the base64 MD5 digest of a chunk, in the same format GCS reports as
+    `Blob.md5_hash`, so manifests and bucket listings can be compared directly.
+    """
+    digest = hashlib.md5(chunk_text.encode("utf-8"), usedforsecurity=False).digest()
+    return base64.b64encode(digest).decode("ascii")
+
+
+def manifest_blob_name(gcs_folder_prefix: str) -> str:
+    """
+    The manifest lives next to the chunk folder rather than inside it so that
+    importing `gs://<bucket>/<prefix>/` never picks it up as a RAG file.
+    """
+    return f"{gcs_folder_prefix.rstrip('/')}.manifest.json"
+
+
+class ChunkManifest:
+    """
+    Maps chunk blob names under a GCS folder prefix to their content hashes.
+
+    The manifest also records which corpus the chunks were last imported into
+    and at which commit, which is what incremental re-ingestion diffs against.
+
+    `pending_paths` and `pending_deletes` record work the recorded corpus has
+    not caught up with yet: files whose chunks failed to upload or import (or
+    were re-uploaded without importing into that corpus), and chunk objects
+    deleted from GCS whose RagFiles are still in the corpus. Incremental runs
+    retry both.
+
+    `from_listing` is True when the manifest was rebuilt from a bucket listing
+    because no manifest object existed; such manifests should be saved even if
+    nothing changed, so later runs only need a single object read.
+    """
+
+    def __init__(
+        self,
+        gcs_folder_prefix: str,
+        chunks: Optional[dict[str, str]] = None,
+        commit_hash: Optional[str] = None,
+        corpus_name: Optional[str] = None,
+        pending_paths: Optional[Iterable[str]] = None,
+        pending_deletes: Optional[Iterable[str]] = None,
+    ):
+        self.gcs_folder_prefix = gcs_folder_prefix
+        self.chunks: dict[str, str] = dict(chunks or {})
+        self.commit_hash = commit_hash
+        self.corpus_name = corpus_name
+        self.pending_paths: set[str] = set(pending_paths or ())
+        self.pending_deletes: set[str] = set(pending_deletes or ())
+        self.from_listing = False
+
+    def __contains__(self, blob_name: str) -> bool:
+        return blob_name in self.chunks
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def get(self, blob_name: str) -> Optional[str]:
+        return self.chunks.get(blob_name)
+
+    def add(self, blob_name: str, chunk_hash: str) -> None:
+        self.chunks[blob_name] = chunk_hash
+
+    def discard(self, blob_names: Iterable[str]) -> None:
+        for blob_name in blob_names:
+            self.chunks.pop(blob_name, None)
+
+    def is_unchanged(self, blob_name: str, chunk_hash: str) -> bool:
+        return self.chunks.get(blob_name) == chunk_hash
+
+    def source_path(self, blob_name: str) -> str:
+        """Repo-relative path of the file a chunk blob was cut from."""
+        rel_name = blob_name[len(self.gcs_folder_prefix.rstrip("/")) + 1 :]
+        return rel_name.rsplit("__lines_", 1)[0]
+
+    def without_files(self, rel_paths: Iterable[str]) -> "ChunkManifest":
+        """Returns a copy without the chunks of the given repo-relative files."""
+        rel_paths = set(rel_paths)
+        return ChunkManifest(
+            self.gcs_folder_prefix,
+            {
+                blob_name: chunk_hash
+                for blob_name, chunk_hash in self.chunks.items()
+                if self.source_path(blob_name) not in rel_paths
+            },
+            commit_hash=self.commit_hash,
+            corpus_name=self.corpus_name,
+            pending_paths=self.pending_paths,
+            pending_deletes=self.pending_deletes,
+        )
+
+    def stale(self, current: "ChunkManifest") -> list[str]:
+        """Blob names recorded here that are no longer present in `current`."""
+        return sorted(set(self.chunks) - set(current.chunks))
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "version": MANIFEST_VERSION,
+                "gcs_folder_prefix": self.gcs_folder_prefix,
+                "commit_hash": self.commit_hash,
+                "corpus_name": self.corpus_name,
+                "pending_paths": sorted(self.pending_paths),
+                "pending_deletes": sorted(self.pending_deletes),
+                "chunks": self.chunks,
+            },
+            sort_keys=True,
+        )
+
+    @classmethod
+    def from_json(cls, gcs_folder_prefix: str, data: str) -> "ChunkManifest":
+        payload = json.loads(data)
+        if payload.get("version") != MANIFEST_VERSION:
+            raise ValueError(
+                f"Unsupported manifest version: {payload.get('version')!r}"
+            )
+        return cls(
+            gcs_folder_prefix,
+            payload.get("chunks", {}),
+            commit_hash=payload.get("commit_hash"),
+            corpus_name=payload.get("corpus_name"),
+            pending_paths=payload.get("pending_paths"),
+            pending_deletes=payload.get("pending_deletes"),
+        )
+
+    @classmethod
+    def load(cls, bucket: storage.Bucket, gcs_folder_prefix: str) -> "ChunkManifest":
+        """
+        Loads the manifest for a prefix with a single object read. When no
+        manifest exists yet (e.g. a prefix written before manifests were
+        introduced), falls back to one listing of the prefix and uses the
+        MD5 hashes GCS reports for each object.
+
+        GCS hashes gzip-encoded objects (see `upload_gzip`) over the compressed
+        bytes, which never equal the hash of the chunk text. Those objects are
+        recorded as `UNKNOWN_HASH` so they stay eligible for stale-chunk cleanup
+        but are re-uploaded once; the saved manifest holds the real hashes.
+        """
+        blob = bucket.blob(manifest_blob_name(gcs_folder_prefix))
+        try:
+            manifest = cls.from_json(gcs_folder_prefix, blob.download_as_text())
+            logger.info(
+                "Loaded chunk manifest",
+                gcs_folder_prefix=gcs_folder_prefix,
+                chunks=len(manifest),
+            )
+            return manifest
+        except NotFound:
+            pass
+        except ValueError as e:
+            logger.warn(
+                "Ignoring unreadable chunk manifest",
+                gcs_folder_prefix=gcs_folder_prefix,
+                error=str(e),
+            )
+
+        manifest = cls(gcs_folder_prefix)
+        manifest.from_listing = True
+        for listed in bucket.list_blobs(prefix=gcs_folder_prefix.rstrip("/") + "/"):
+            if listed.content_encoding == "gzip":
+                manifest.add(listed.name, UNKNOWN_HASH)
+            elif listed.md5_hash:
+                manifest.add(listed.name, listed.md5_hash)
+        logger.info(
+            "Built chunk manifest from bucket listing",
+            gcs_folder_prefix=gcs_folder_prefix,
+            chunks=len(manifest),
+        )
+        return manifest
+
+    def save(self, bucket: storage.Bucket) -> None:
+        bucket.blob(manifest_blob_name(self.gcs_folder_prefix)).upload_from_string(
+            self.to_json(), content_type="application/json"
+        )
+        logger.info(
+            "Saved chunk manifest",
+            gcs_folder_prefix=self.gcs_folder_prefix,
+            chunks=len(self),
+        )
@@ -0,0 +1,184 @@
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Literal, Optional
+
+from pydantic import BaseModel, PrivateAttr
+
+from logger import structlog
+from rag.ingestion.config import config
+
+logger = structlog.get_logger()
+
+OperationState = Literal["pending", "running", "succeeded", "failed"]
+
+
+class IngestionOperation(BaseModel):
+    """A snapshot of a background ingestion, as returned to pollers."""
+
+    operation_id: str
+    source: str
+    state: OperationState = "pending"
+    submitted_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    # The result dict of the ingestion tool, once finished.
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    # Reported by ingestions that track their own progress, e.g. batches.
+    progress: Optional[dict] = None
+    _done: threading.Event = PrivateAttr(default_factory=threading.Event)
+    _progress: Optional[Callable[[], dict]] = PrivateAttr(default=None)
+
+    @property
+    def done(self) -> bool:
+        return self.state in ("succeeded", "failed")
+
+
+class IngestionOperations:
+    """
+    Runs ingestions in the background on a bounded pool of threads and keeps
+    their state for polling.
+
+    At most `max_workers` ingestions run at once; further submissions wait in
+    the pool's queue as `pending`. Submitting a source that is already pending
+    or running returns the existing operation, since two jobs for one repo
+    would share its GCS prefix and checkpoint. Only the last `max_finished`
+    finished operations are kept.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = config.max_concurrent_ingestions,
+        max_finished: int = config.max_finished_operations,
+    ):
+        self.max_workers = max_workers
+        self.max_finished = max_finished
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._operations: OrderedDict[str, IngestionOperation] = OrderedDict()
+        self._active: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        source: str,
+        fn: Callable[..., dict],
+        *args,
+        progress: Optional[Callable[[], dict]] = None,
+        **kwargs,
+    ) -> IngestionOperation:
+        """
+        Schedules `fn(*args, **kwargs)`, which returns the ingestion's result
+        dict (`status` "error" marks it failed), and returns its operation.
+        `progress`, if given, is called for the operation's `progress` while
+        it is running.
+        """
+        with self._lock:
+            if source in self._active:
+                operation = self._operations[self._active[source]]
+                logger.info(
+                    "Ingestion already in progress",
+                    operation_id=operation.operation_id,
+                    source=source,
+                )
+                return self._snapshot(operation)
+            operation = IngestionOperation(
+                operation_id=uuid.uuid4().hex,
+                source=source,
+                submitted_at=datetime.now(timezone.utc),
+            )
+            operation._progress = progress
+            self._operations[operation.operation_id] = operation
+            self._active[source] = operation.operation_id
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="ingestion"
+                )
+            self._executor.submit(self._run, operation.operation_id, fn, args, kwargs)
+        logger.info(
+            "Ingestion submitted", operation_id=operation.operation_id, source=source
+        )
+        return self._snapshot(operation)
+
+    def get(self, operation_id: str) -> Optional[IngestionOperation]:
+        with self._lock:
+            operation = self._operations.get(operation_id)
+            return self._snapshot(operation) if operation else None
+
+    def list(self) -> list[IngestionOperation]:
+        """All kept operations, most recently submitted first."""
+        with self._lock:
+            return [
+                self._snapshot(operation)
+                for operation in reversed(self._operations.values())
+            ]
+
+    def wait(
+        self, operation_id: str, timeout: Optional[float] = None
+    ) -> Optional[IngestionOperation]:
+        """Blocks until the operation finished or `timeout` seconds passed."""
+        with self._lock:
+            operation = self._operations.get(operation_id)
+        if operation is None:
+            return None
+        operation._done.wait(timeout)
+        with self._lock:
+            # Still returned if it was evicted in the meantime.
+            return self._snapshot(operation)
+
+    @staticmethod
+    def _snapshot(operation: IngestionOperation) -> IngestionOperation:
+        snapshot = operation.model_copy()
+        if operation._progress is not None and not operation.done:
+            snapshot.progress = operation._progress()
+        return snapshot
+
+    def _run(self, operation_id: str, fn: Callable[..., dict], args, kwargs) -> None:
+        self._update(
+            operation_id, state="running", started_at=datetime.now(timezone.utc)
+        )
+        try:
+            result = fn(*args, **kwargs)
+            state = "failed" if result.get("status") == "error" else "succeeded"
+            self._update(operation_id, state=state, result=result)
+        except Exception as e:
+            logger.error(
+                "Background ingestion failed",
+                operation_id=operation_id,
+                error=str(e),
+                exc_info=e,
+            )
+            self._update(operation_id, state="failed", error=str(e))
+
+    def _update(self, operation_id: str, **fields) -> None:
+        with self._lock:
+            operation = self._operations[operation_id]
+            for name, value in fields.items():
+                setattr(operation, name, value)
+            if operation.done:
+                operation.finished_at = datetime.now(timezone.utc)
+                if operation._progress is not None:
+                    operation.progress = operation._progress()
+                self._active.pop(operation.source, None)
+                operation._done.set()
+                self._evict_finished()
+        if fields.get("state") in ("succeeded", "failed"):
+            logger.info(
+                "Ingestion finished",
+                operation_id=operation_id,
+                state=fields["state"],
+            )
+
+    def _evict_finished(self) -> None:
+        finished = [
+            operation_id
+            for operation_id, operation in self._operations.items()
+            if operation.done
+        ]
+        for operation_id in finished[: max(0, len(finished) - self.max_finished)]:
+            del self._operations[operation_id]
+
+
+ingestion_operations = IngestionOperations()
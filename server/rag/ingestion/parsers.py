@@ -0,0 +1,145 @@
+import importlib
+import os
+import threading
+import time
+from pathlib import Path
+
+import tree_sitter
+
+from logger import structlog
+
+logger = structlog.get_logger()
+
+# dialect -> (grammar module, function returning the language pointer)
+GRAMMARS = {
+    "python": ("tree_sitter_python", "language"),
+    "typescript": ("tree_sitter_typescript", "language_typescript"),
+    "tsx": ("tree_sitter_typescript", "language_tsx"),
+    "javascript": ("tree_sitter_javascript", "language"),
+    "java": ("tree_sitter_java", "language"),
+    "kotlin": ("tree_sitter_kotlin", "language"),
+    "go": ("tree_sitter_go", "language"),
+}
+
+
+def dialect_for(language: str, file_path: Path) -> str:
+    """Grammar dialect to use for a file, e.g. `tsx` for TypeScript `.tsx` files."""
+    if language == "typescript" and file_path.suffix.lower() == ".tsx":
+        return "tsx"
+    return language
+
+
+class ParserRegistry:
+    """
+    Process-wide cache of tree-sitter languages and parsers.
+
+    Each grammar is loaded into a `tree_sitter.Language` once per process.
+    `tree_sitter.Parser` objects are not safe to share between threads, so one
+    parser per dialect is kept per thread. Forked worker processes start with an
+    empty registry and build their own parsers on first use.
+
+    The registry also counts how much time goes into setting up grammars and
+    parsing files, per dialect, so chunking time can be broken down.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._languages: dict[str, tree_sitter.Language] = {}
+        self._local = threading.local()
+        self._stats: dict[str, dict[str, float]] = {}
+
+    def language(self, dialect: str) -> tree_sitter.Language:
+        language = self._languages.get(dialect)
+        if language is not None:
+            return language
+
+        with self._lock:
+            language = self._languages.get(dialect)
+            if language is None:
+                if dialect not in GRAMMARS:
+                    raise ValueError(
+                        f"Language {dialect} not supported for tree-sitter chunking."
+                    )
+                started = time.perf_counter()
+                module_name, loader_name = GRAMMARS[dialect]
+                module = importlib.import_module(module_name)
+                language = tree_sitter.Language(getattr(module, loader_name)())
+                self._languages[dialect] = language
+                self._record(dialect, setup_s=time.perf_counter() - started)
+                logger.debug("Loaded tree-sitter grammar", dialect=dialect)
+        return language
+
+    def parser(self, dialect: str) -> tree_sitter.Parser:
+        parsers = getattr(self._local, "parsers", None)
+        if parsers is None:
+            parsers = self._local.parsers = {}
+        parser = parsers.get(dialect)
+        if parser is None:
+            parser = tree_sitter.Parser(self.language(dialect))
+            parsers[dialect] = parser
+        return parser
+
+    def parse(self, dialect: str, source: bytes) -> tree_sitter.Tree:
+        parser = self.parser(dialect)
+        started = time.perf_counter()
+        tree = parser.parse(source)
+        self._record(
+            dialect,
+            files=1,
+            bytes=len(source),
+            parse_s=time.perf_counter() - started,
+        )
+        return tree
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """Snapshot of the per-dialect counters (files, bytes, parse_s, setup_s)."""
+        with self._lock:
+            return {
+                dialect: dict(counters) for dialect, counters in self._stats.items()
+            }
+
+    def stats_since(
+        self, snapshot: dict[str, dict[str, float]]
+    ) -> dict[str, dict[str, float]]:
+        """
+        Counters accumulated since `snapshot` (a previous `stats()` result).
+        The registry is shared by every run in the process, so callers that
+        report on a single run should diff against a snapshot taken at its start.
+        """
+        delta = {}
+        for dialect, counters in self.stats().items():
+            before = snapshot.get(dialect, {})
+            changes = {
+                key: value - before.get(key, 0) for key, value in counters.items()
+            }
+            if any(changes.values()):
+                delta[dialect] = changes
+        return delta
+
+    def merge_stats(self, stats: dict[str, dict[str, float]]) -> None:
+        """Adds counters gathered elsewhere, e.g. in a chunking worker process."""
+        for dialect, counters in stats.items():
+            self._record(dialect, **counters)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def _record(self, dialect: str, **increments: float) -> None:
+        with self._lock:
+            counters = self._stats.setdefault(
+                dialect, {"files": 0, "bytes": 0, "parse_s": 0.0, "setup_s": 0.0}
+            )
+            for key, value in increments.items():
+                counters[key] += value
+
+    def _reset_after_fork(self) -> None:
+        self._lock = threading.RLock()
+        self._languages = {}
+        self._local = threading.local()
+        self._stats = {}
+
+
+parser_registry = ParserRegistry()
+
+os.register_at_fork(after_in_child=parser_registry._reset_after_fork)
@@ -0,0 +1,164 @@
+import queue
+import random
+import threading
+import time
+from typing import Iterable, Iterator, Optional, TypeVar
+
+from logger import structlog
+
+logger = structlog.get_logger()
+
+T = TypeVar("T")
+
+# Latency samples kept per stage; beyond this a uniform reservoir sample is kept
+# so memory stays flat on huge repos.
+LATENCY_RESERVOIR_SIZE = 10_000
+
+
+class StageMetrics:
+    """
+    Counters of one ingestion stage: items and bytes processed, per-item
+    latency percentiles, throughput over the stage's active time, and the depth
+    of the queue (or number of in-flight items) feeding it. Thread-safe.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.bytes = 0
+        self._latencies: list[float] = []
+        self._latency_count = 0
+        self._depth_sum = 0
+        self._depth_samples = 0
+        self._depth_max = 0
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, latency_s: float, items: int = 1, nbytes: int = 0) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            if self._started is None:
+                self._started = now - latency_s
+            self._finished = now
+            self.items += items
+            self.bytes += nbytes
+            self._latency_count += 1
+            if len(self._latencies) < LATENCY_RESERVOIR_SIZE:
+                self._latencies.append(latency_s)
+            else:
+                slot = random.randrange(self._latency_count)
+                if slot < LATENCY_RESERVOIR_SIZE:
+                    self._latencies[slot] = latency_s
+
+    def record_depth(self, depth: int) -> None:
+        with self._lock:
+            self._depth_sum += depth
+            self._depth_samples += 1
+            self._depth_max = max(self._depth_max, depth)
+
+    def summary(self) -> dict[str, float]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            elapsed = (
+                self._finished - self._started
+                if self._started is not None and self._finished is not None
+                else 0.0
+            )
+            summary = {
+                "items": self.items,
+                "bytes": self.bytes,
+                "items_per_s": round(self.items / elapsed, 1) if elapsed > 0 else 0.0,
+                "queue_depth_avg": (
+                    round(self._depth_sum / self._depth_samples, 1)
+                    if self._depth_samples
+                    else 0.0
+                ),
+                "queue_depth_max": self._depth_max,
+            }
+        for percentile in (50, 95, 99):
+            summary[f"p{percentile}_ms"] = (
+                round(
+                    latencies[
+                        min(len(latencies) - 1, len(latencies) * percentile // 100)
+                    ]
+                    * 1000,
+                    2,
+                )
+                if latencies
+                else 0.0
+            )
+        return summary
+
+
+class PipelineMetrics:
+    """Metrics of every stage of one ingestion run, keyed by stage name."""
+
+    def __init__(self):
+        self.stages: dict[str, StageMetrics] = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name: str) -> StageMetrics:
+        with self._lock:
+            if name not in self.stages:
+                self.stages[name] = StageMetrics(name)
+            return self.stages[name]
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        return {name: stage.summary() for name, stage in self.stages.items()}
+
+    def log(self, **kwargs) -> None:
+        logger.info("Ingestion pipeline metrics", stages=self.summary(), **kwargs)
+
+
+_DONE = object()
+
+
+def prefetch(
+    items: Iterable[T], maxsize: int, metrics: Optional[StageMetrics] = None
+) -> Iterator[T]:
+    """
+    Runs `items` in a background thread, handing them over through a queue of
+    at most `maxsize` entries. The producer blocks when the consumer falls
+    behind, and stops when the consumer goes away. Exceptions raised by the
+    producer are re-raised in the consumer.
+    """
+    buffer: queue.Queue = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            started = time.perf_counter()
+            for item in items:
+                if metrics is not None:
+                    metrics.record(time.perf_counter() - started)
+                if not put(item):
+                    return
+                started = time.perf_counter()
+            put(_DONE)
+        except BaseException as e:  # handed to the consumer
+            put(e)
+
+    thread = threading.Thread(target=produce, name="ingest-prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            if metrics is not None:
+                metrics.record_depth(buffer.qsize())
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
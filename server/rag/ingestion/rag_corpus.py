@@ -1,18 +1,37 @@
 import argparse
-import tempfile
+import sqlite3
+import time
 import uuid
 from pathlib import Path
 from typing import List, Optional, Tuple
 
 import git
-import vertexai
+from rag.chunk_index import ChunkRecord, get_chunk_index, symbol_of
+from rag.ingestion.backends import get_backend, rag
+from rag.ingestion.checkpoint import IngestionCheckpoint
+from rag.ingestion.chunking import TREE_SITTER_AVAILABLE, chunk_files
 from rag.ingestion.config import config
+from rag.ingestion.discovery import RepoWalker
+from rag.ingestion.incremental import delete_rag_files_for_uris, diff_commits
+from rag.ingestion.limits import clone_slots, repo_locks
+from rag.ingestion.manifest import ChunkManifest, content_hash
+from rag.ingestion.pipeline import PipelineMetrics, prefetch
+from rag.ingestion.registry import (
+    CorpusEntry,
+    CorpusRegistry,
+    corpus_display_name,
+    registry_key,
+)
+from rag.ingestion.shards import Shard, ShardWriter
+from rag.ingestion.uploader import ChunkUploader
 from logger import structlog
+from google.api_core.exceptions import NotFound
 from google.cloud import storage
+from pydantic import BaseModel, ConfigDict, Field
+from utils.git_clone import clone_repo, sparse_patterns_for_extensions
 from google.cloud.aiplatform_v1.types.vertex_rag_data_service import (
     ImportRagFilesResponse,
 )
-from vertexai.preview import rag
 from vertexai.preview.rag.rag_data import (
     RagCorpus,
     TransformationConfig,
@@ -24,42 +43,40 @@ from vertexai.preview.rag.utils.resources import (
 
 logger = structlog.get_logger()
 
-IGNORE_PATTERN = [
-    "node_modules/",
-    "dist/",
-    "build/",
-    "target/",
-    "venv/",
-    "assets/",
-    "public/",
-    "static/",
-    "images/",
-    ".git/",
-    ".DS_Store/",
-    ".idea/",
-    ".vscode/",
-    ".pytest_cache/",
-    ".ruff_cache/",
-    ".venv/",
-    ".env",
-    ".env.local",
-    ".env.development",
-    ".env.production",
-    ".env.test",
-    ".env.development.local",
-]
-
-
-def clone_github_repo(github_url: str) -> Tuple[Path, str]:
-    repo_path = Path(config.local_repo_path) / github_url.split("/")[-1]
-    if repo_path.exists():
-        logger.info("Repo already cloned", path=str(repo_path))
-        return repo_path
-    logger.info("Cloning repo", github_url=github_url, path=str(repo_path))
+if TREE_SITTER_AVAILABLE:
+    from rag.ingestion.parsers import parser_registry
+
+
+def clone_github_repo(
+    github_url: str, branch: Optional[str] = None
+) -> Tuple[Path, str]:
+    owner, name = github_url.rstrip("/").removesuffix(".git").split("/")[-2:]
+    # Under the owner, so same-named repos of different orgs do not collide.
+    repo_path = Path(config.local_repo_path) / owner / name
+    if branch:
+        # Branches get their own checkout, and so their own GCS folder prefix.
+        repo_path = repo_path.with_name(
+            f"{repo_path.name}--{branch.replace('/', '--')}"
+        )
     try:
-        repo_path.parent.mkdir(parents=True, exist_ok=True)
-        git.Repo.clone_from(github_url, repo_path)
-        logger.info("Repo cloned successfully", path=str(repo_path))
+        # Bounds the network bandwidth all ingestions spend on git at once.
+        with clone_slots:
+            if repo_path.exists():
+                logger.info("Repo already cloned, pulling", path=str(repo_path))
+                git.Repo(repo_path).remotes.origin.pull()
+            else:
+                logger.info("Cloning repo", github_url=github_url, path=str(repo_path))
+                repo_path.parent.mkdir(parents=True, exist_ok=True)
+                clone_repo(
+                    github_url,
+                    repo_path,
+                    strategy=config.clone_strategy,
+                    branch=branch,
+                    sparse_patterns=sparse_patterns_for_extensions(
+                        config.supported_extensions
+                    ),
+                )
+                logger.info("Repo cloned successfully", path=str(repo_path))
     except git.GitCommandError as e:
         logger.error("Error cloning repository", error=str(e))
         raise
@@ -78,9 +95,8 @@ def get_gcs_bucket(
         bucket_name=bucket_name_to_get,
         project_id=project_id,
     )
-    storage_client = storage.Client(project=project_id)
     try:
-        bucket_obj = storage_client.get_bucket(bucket_name_to_get)
+        bucket_obj = get_backend().get_bucket(project_id, bucket_name_to_get)
         logger.info("Connected to bucket", bucket_name=bucket_obj.name)
         return bucket_obj
     except Exception as e:
@@ -90,165 +106,127 @@ def get_gcs_bucket(
         raise
 
 
-def chunk_file_by_lines(file_path: Path, chunk_size: int = 20):
-    """
-    Splits a file into chunks of N lines. Returns a list of (start_line, end_line, chunk_text).
-    """
-    with open(file_path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-    chunks = []
-    for i in range(0, len(lines), chunk_size):
-        chunk_lines = lines[i : i + chunk_size]
-        start_line = i + 1
-        end_line = i + len(chunk_lines)
-        chunks.append((start_line, end_line, "".join(chunk_lines)))
-    return chunks
-
+def github_registry_key(github_url: str, branch: Optional[str] = None) -> str:
+    """The `CorpusRegistry` key (`owner/repo[@branch]`) of a GitHub repo."""
+    repo_org_and_name = "/".join(github_url.split("/")[-2:]).replace(".git", "")
+    return registry_key(repo_org_and_name, branch)
 
-try:
-    import tree_sitter
 
-    TREE_SITTER_AVAILABLE = True
-except ImportError:
-    TREE_SITTER_AVAILABLE = False
-
-
-def chunk_file_by_tree_sitter(file_path: Path, language: str = "python"):
+def get_gcs_folder_prefix(local_repo_path: Path) -> str:
     """
-    Chunks a file using tree-sitter to create semantically meaningful chunks.
-    Returns a list of (start_line, end_line, chunk_text).
-    Supported languages: python, typescript, java, kotlin, go
+    GCS folder prefix that holds the chunks of a local repo. For clones under
+    `config.local_repo_path` it includes the owner (`<owner>--<name>`).
     """
-
-    if not TREE_SITTER_AVAILABLE:
-        logger.warn(
-            "tree-sitter not available; falling back to line-based chunking.",
-            file=str(file_path),
-        )
-        return chunk_file_by_lines(file_path)
-
-    supported_langs = {"python", "typescript", "java", "kotlin", "go", "javascript"}
-    if language not in supported_langs:
-        logger.warn(
-            f"Language {language} not supported for tree-sitter chunking; falling back to line-based chunking.",
-            file=str(file_path),
-        )
-        return chunk_file_by_lines(file_path)
-
     try:
-        # Load the appropriate language parser
-        if language == "python":
-            import tree_sitter_python as python_tree_sitter
-
-            language_parser = python_tree_sitter.language()
-        elif language == "typescript":
-            import tree_sitter_typescript as typescript_tree_sitter
-
-            if file_path.suffix.lower() == ".tsx":
-                language_parser = typescript_tree_sitter.language_tsx()
-            else:
-                language_parser = typescript_tree_sitter.language_typescript()
-        elif language == "java":
-            import tree_sitter_java as java_tree_sitter
-
-            language_parser = java_tree_sitter.language()
-        elif language == "kotlin":
-            import tree_sitter_kotlin as kotlin_tree_sitter
-
-            language_parser = kotlin_tree_sitter.language()
-        elif language == "go":
-            import tree_sitter_go as go_tree_sitter
+        name = (
+            local_repo_path.resolve()
+            .relative_to(Path(config.local_repo_path).resolve())
+            .as_posix()
+            .replace("/", "--")
+        )
+    except ValueError:
+        name = local_repo_path.name
+    return config.gcs_folder_prefix + name
 
-            language_parser = go_tree_sitter.language()
-        elif language == "javascript":
-            import tree_sitter_javascript as javascript_tree_sitter
 
-            language_parser = javascript_tree_sitter.language()
-        else:
-            raise ValueError(
-                f"Language {language} not supported for tree-sitter chunking."
-            )
+class ChunkSyncResult(BaseModel):
+    """Outcome of syncing a local repo's chunks to its GCS folder prefix."""
 
-        language = tree_sitter.Language(language_parser)
-        parser = tree_sitter.Parser(language=language)
-
-        # Read file content
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read()
-            lines = content.splitlines()
-
-        # Parse the file
-        tree = parser.parse(bytes(content, "utf-8"))
-
-        chunks = []
-        root_node = tree.root_node
-
-        for child in root_node.children:
-            if child.type in (
-                "function_definition",
-                "class_definition",
-                "method_definition",
-                "function_declaration",
-                "class_declaration",
-                "method_declaration",
-                "interface_declaration",
-                "type_alias_declaration",
-                "enum_declaration",
-                "variable_declaration",
-                "const_declaration",
-                "let_declaration",
-                "import_declaration",
-                "export_declaration",
-            ):
-                start_line = child.start_point[0] + 1  # 1-indexed
-                end_line = child.end_point[0] + 1
-                chunk_text = "\n".join(lines[start_line - 1 : end_line])
-                chunks.append((start_line, end_line, chunk_text))
-
-        if not chunks:
-            logger.debug(
-                "No suitable tree-sitter chunks found; falling back to line-based chunking.",
-                file=str(file_path),
-            )
-            return chunk_file_by_lines(file_path)
+    model_config = ConfigDict(arbitrary_types_allowed=True)
 
-        return chunks
+    gcs_folder_prefix: str
+    manifest: ChunkManifest
+    uploaded_blobs: list[str] = Field(default_factory=list)
+    deleted_blobs: list[str] = Field(default_factory=list)
+    failed_paths: list[str] = Field(default_factory=list)
+    manifest_changed: bool = False
+    # Records of every chunk that was (re-)chunked, staged in the ChunkIndex
+    # under this id (None when there is no index); they cover the files in
+    # `reindexed_paths`, or the whole repo when None.
+    chunk_staging_id: Optional[str] = None
+    chunk_records_count: int = 0
+    reindexed_paths: Optional[list[str]] = None
 
-    except Exception as e:
-        logger.error(
-            "Error during tree-sitter chunking; falling back to line-based chunking.",
-            file=str(file_path),
-            error=str(e),
-        )
-        return chunk_file_by_lines(file_path)
 
+class _ChunkStaging:
+    """
+    Writes the chunk records of a sync to the ChunkIndex staging area in
+    batches as files are chunked, so they are not all held in memory until
+    the sync ends. Indexing is best effort: on a SQLite error the sync goes
+    on without it.
+    """
 
-def upload_repo_to_gcs(
+    batch_size = 1000
+
+    def __init__(self):
+        self.staging_id: Optional[str] = None
+        self.count = 0
+        self._batch: list[ChunkRecord] = []
+        try:
+            self._index = get_chunk_index(config.chunk_index_path)
+        except sqlite3.Error as e:
+            logger.warn("Could not open chunk index", error=str(e))
+            self._index = None
+        if self._index is not None:
+            self.staging_id = uuid.uuid4().hex
+
+    def add(self, records: list[ChunkRecord]) -> None:
+        if self._index is None:
+            return
+        self._batch.extend(records)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._index is None or not self._batch:
+            return
+        try:
+            self._index.stage(self.staging_id, self._batch)
+            self.count += len(self._batch)
+        except sqlite3.Error as e:
+            # Retrieval falls back to parsing source URIs without the index.
+            logger.warn("Could not stage chunk records", error=str(e))
+            self._index, self.staging_id = None, None
+        self._batch = []
+
+
+def sync_repo_to_gcs(
     bucket: storage.Bucket,
     local_repo_path: Path,
     chunking_strategy: str = "tree-sitter",  # 'lines' or 'tree-sitter'
     chunk_size: int = 20,  # Only used for line-based chunking
-) -> str:
+    previous_manifest: Optional[ChunkManifest] = None,
+    changed_paths: Optional[set[str]] = None,
+    deleted_paths: Optional[set[str]] = None,
+    force_paths: Optional[set[str]] = None,
+    metrics: Optional[PipelineMetrics] = None,
+    checkpoint: Optional[IngestionCheckpoint] = None,
+    upload_workers: int = config.upload_workers,
+) -> ChunkSyncResult:
     """
-    Uploads supported files from a local repo to GCS, chunking them as specified.
+    Chunks supported files from a local repo and syncs them to GCS.
     Each chunk is uploaded as a separate file named <relative_path>__lines_<start>-<end>.txt.
+    Files are chunked across worker processes (see `chunk_files`) and the chunks
+    are handed to a ChunkUploader so uploads run concurrently with chunking.
+    The previous ChunkManifest decides which chunks actually need uploading and
+    which ones are stale and get deleted. The returned manifest is not saved;
+    callers persist it once the chunks have been imported.
+
+    When `changed_paths` / `deleted_paths` (repo-relative) are given, only the
+    changed files are re-chunked and every other file keeps its previous chunks.
+    Chunks of files in `force_paths` are uploaded even if their content hash
+    is unchanged.
+
+    With the `shards` chunk layout, chunks are packed into JSONL shard objects
+    (see `ShardWriter`) instead. The whole repo is re-chunked on every sync,
+    and the manifest tracks shards, so only changed shards are uploaded.
+
+    With a `checkpoint`, the chunks uploaded so far are saved to it every
+    `config.checkpoint_interval_s` and once more when the sync is done.
     chunking_strategy: 'lines' (default) or 'tree-sitter'.
     """
 
-    def is_supported_file(file_path: Path) -> bool:
-        file_lower = file_path.name.lower()
-        return (
-            any(file_lower.endswith(ext.lower()) for ext in config.supported_extensions)
-            or file_path.name in config.supported_extensions
-        )
-
-    def upload_file(blob, src_path: Path):
-        if blob.exists():
-            return False
-        blob.upload_from_filename(str(src_path))
-        return True
-
-    gcs_folder_prefix = config.gcs_folder_prefix + local_repo_path.name
+    gcs_folder_prefix = get_gcs_folder_prefix(local_repo_path)
     logger.info(
         "Uploading repo files to GCS (chunked)",
         local_repo_path=str(local_repo_path),
@@ -256,124 +234,300 @@ def upload_repo_to_gcs(
         gcs_folder_prefix=gcs_folder_prefix,
         chunking_strategy=chunking_strategy,
         chunk_size=chunk_size,
+        job_id=checkpoint.job_id if checkpoint else None,
     )
 
+    parse_stats_before = parser_registry.stats() if TREE_SITTER_AVAILABLE else {}
     max_bytes = (
         config.max_file_size_mb * 1024 * 1024 if config.max_file_size_mb > 0 else 0
     )
-    uploaded, skipped = 0, 0
-    files_to_process = [
-        file_path
-        for file_path in Path(local_repo_path).rglob("*")
-        if is_supported_file(file_path)
-        and not any(pattern in str(file_path) for pattern in IGNORE_PATTERN)
-        and not (
-            file_path.name.startswith(".")
-            or any(part.startswith(".") for part in file_path.parts)
+    skipped = 0
+    sharded = config.chunk_layout == "shards"
+    if sharded:
+        # Shards mix files, so every file is re-chunked; the manifest still
+        # limits uploads to the shards whose content changed.
+        changed_paths = deleted_paths = None
+    # Callers that go on to import log the metrics of the whole run themselves.
+    log_metrics = metrics is None
+    metrics = metrics or PipelineMetrics()
+    walker = RepoWalker(local_repo_path)
+    if changed_paths is None:
+        # Files are discovered while earlier ones are chunked and uploaded.
+        files_to_process = prefetch(
+            walker.iter_files(),
+            config.discover_queue_size,
+            metrics=metrics.stage("discover"),
         )
-    ]
-    total_files = len(files_to_process)
+        total_files = None
+    else:
+        files_to_process = [
+            local_repo_path / rel_path
+            for rel_path in sorted(changed_paths)
+            if walker.includes(rel_path) and (local_repo_path / rel_path).is_file()
+        ]
+        total_files = len(files_to_process)
     processed_files = 0
 
-    for file_path in files_to_process:
-        processed_files += 1
-        logger.info(
-            f"Processing file {processed_files}/{total_files}",
-            file=str(file_path),
-            progress=f"{processed_files / total_files * 100:.2f}%",
+    if previous_manifest is None:
+        previous_manifest = ChunkManifest.load(bucket, gcs_folder_prefix)
+    if changed_paths is None:
+        manifest = ChunkManifest(
+            gcs_folder_prefix,
+            commit_hash=previous_manifest.commit_hash,
+            corpus_name=previous_manifest.corpus_name,
+            pending_paths=previous_manifest.pending_paths,
+            pending_deletes=previous_manifest.pending_deletes,
+        )
+    else:
+        manifest = previous_manifest.without_files(
+            set(changed_paths) | set(deleted_paths or ())
+        )
+
+    force_paths = force_paths or set()
+    shard_writer = (
+        ShardWriter(
+            gcs_folder_prefix, config.chunk_shard_buckets, config.chunk_shard_max_bytes
         )
+        if sharded
+        else None
+    )
 
-        if max_bytes > 0 and file_path.stat().st_size > max_bytes:
+    uploaded_blobs = []
+    staging = _ChunkStaging()
+
+    def submit_shard(shard: Shard) -> None:
+        # Shards are uploaded as ShardWriter completes them, while chunking.
+        nonlocal skipped
+        gcs_blob_name, shard_text, shard_paths, records = shard
+        shard_hash = content_hash(shard_text)
+        manifest.add(gcs_blob_name, shard_hash)
+        staging.add(
+            [
+                ChunkRecord(
+                    f"gs://{bucket.name}/{gcs_blob_name}",
+                    record.rel_path,
+                    record.start_line,
+                    record.end_line,
+                    record.symbol,
+                    byte_start,
+                    byte_end,
+                    record.text if config.lexical_index else None,
+                )
+                for record, byte_start, byte_end in records
+            ]
+        )
+        shard_name = manifest.source_path(gcs_blob_name)
+        if previous_manifest.is_unchanged(
+            gcs_blob_name, shard_hash
+        ) and force_paths.isdisjoint([shard_name, *shard_paths]):
             skipped += 1
-            logger.debug(
-                "Skipping large file",
-                file=str(file_path),
-                size=file_path.stat().st_size,
-            )
-            continue
+            return
+        uploader.submit_file(shard_name, [(gcs_blob_name, shard_text)])
+        uploaded_blobs.append(gcs_blob_name)
+        _checkpoint_uploads(checkpoint, bucket, uploader, manifest)
+
+    with ChunkUploader(
+        bucket,
+        workers=upload_workers,
+        total_files=None if sharded else total_files,
+        metrics=metrics.stage("upload"),
+    ) as uploader:
+        for rel_path, chunks in chunk_files(
+            local_repo_path,
+            files_to_process,
+            chunking_strategy=chunking_strategy,
+            chunk_size=chunk_size,
+            max_bytes=max_bytes,
+            metrics=metrics.stage("chunk"),
+        ):
+            processed_files += 1
+            logger.debug(f"Chunked file {processed_files}", file=rel_path)
+            if chunks is None:
+                skipped += 1
+                if not sharded:
+                    uploader.submit_file(rel_path, [])
+                continue
+            if sharded:
+                for shard in shard_writer.add(rel_path, chunks):
+                    submit_shard(shard)
+                continue
+
+            upload_chunks = []
+            for start_line, end_line, chunk_text in chunks:
+                chunk_file_name = f"{rel_path}__lines_{start_line}-{end_line}.txt"
+                gcs_blob_name = str(Path(gcs_folder_prefix) / chunk_file_name).replace(
+                    "\\", "/"
+                )
+                chunk_hash = content_hash(chunk_text)
+                manifest.add(gcs_blob_name, chunk_hash)
+                staging.add(
+                    [
+                        ChunkRecord(
+                            f"gs://{bucket.name}/{gcs_blob_name}",
+                            rel_path,
+                            start_line,
+                            end_line,
+                            symbol_of(chunk_text),
+                            0,
+                            len(chunk_text.encode("utf-8")),
+                            chunk_text if config.lexical_index else None,
+                        )
+                    ]
+                )
+                if (
+                    previous_manifest.is_unchanged(gcs_blob_name, chunk_hash)
+                    and rel_path not in force_paths
+                ):
+                    skipped += 1
+                    continue
+                upload_chunks.append((gcs_blob_name, chunk_text))
+                uploaded_blobs.append(gcs_blob_name)
+            uploader.submit_file(rel_path, upload_chunks)
+            _checkpoint_uploads(checkpoint, bucket, uploader, manifest)
+
+        if sharded:
+            for shard in shard_writer.close():
+                submit_shard(shard)
+
+        staging.flush()
+        stale_blobs = previous_manifest.stale(manifest)
+        if stale_blobs:
+            logger.info("Deleting stale chunks", count=len(stale_blobs))
+            uploader.delete_blobs(stale_blobs)
+
+    # Failed uploads are left out of the manifest so the next run retries them;
+    # failed deletes stay in it so they are retried as stale as well.
+    for blob_name in uploader.failed_blobs:
+        if blob_name in stale_blobs:
+            manifest.add(blob_name, previous_manifest.get(blob_name))
+        else:
+            manifest.discard([blob_name])
+    _checkpoint_uploads(checkpoint, bucket, uploader, manifest, force=True)
 
-        rel_path = file_path.relative_to(local_repo_path)
-        ext = file_path.suffix.lower()
+    logger.info(
+        "Upload complete",
+        uploaded=uploader.uploaded,
+        skipped=skipped,
+        deleted=uploader.deleted,
+        failed=uploader.failed,
+    )
+    if log_metrics:
+        metrics.log(gcs_folder_prefix=gcs_folder_prefix)
+    if chunking_strategy == "tree-sitter" and TREE_SITTER_AVAILABLE:
+        logger.info(
+            "Tree-sitter parse stats",
+            stats=parser_registry.stats_since(parse_stats_before),
+        )
+    uploaded_blobs = [
+        blob_name
+        for blob_name in uploaded_blobs
+        if blob_name not in uploader.failed_blobs
+    ]
+    deleted_blobs = [
+        blob_name for blob_name in stale_blobs if blob_name not in uploader.failed_blobs
+    ]
+    return ChunkSyncResult(
+        gcs_folder_prefix=gcs_folder_prefix,
+        manifest=manifest,
+        uploaded_blobs=uploaded_blobs,
+        deleted_blobs=deleted_blobs,
+        failed_paths=sorted(
+            {
+                manifest.source_path(blob_name)
+                for blob_name in uploader.failed_blobs
+                if blob_name not in stale_blobs
+            }
+        ),
+        manifest_changed=bool(
+            uploaded_blobs
+            or deleted_blobs
+            or previous_manifest.from_listing
+            or manifest.chunks != previous_manifest.chunks
+        ),
+        chunk_staging_id=staging.staging_id,
+        chunk_records_count=staging.count,
+        reindexed_paths=None
+        if changed_paths is None
+        else sorted(set(changed_paths) | set(deleted_paths or ())),
+    )
 
-        # For .md/.txt, treat as a single chunk
-        if ext in [".md", ".txt"]:
-            with open(file_path, "r", encoding="utf-8") as f:
-                chunk_text = f.read()
-            start_line = 1
-            end_line = chunk_text.count("\n") + 1
-            chunks = [(start_line, end_line, chunk_text)]
-        else:
-            # For code, chunk by lines or tree-sitter
-            if chunking_strategy == "tree-sitter":
-                if TREE_SITTER_AVAILABLE:
-                    # Detect language from file extension
-                    ext = file_path.suffix.lower()
-                    language = None
-                    if ext == ".py":
-                        language = "python"
-                    elif ext in [".js", ".jsx"]:
-                        language = "javascript"
-                    elif ext in [".ts", ".tsx"]:
-                        language = "typescript"
-                    elif ext == ".java":
-                        language = "java"
-                    elif ext == ".kt":
-                        language = "kotlin"
-                    elif ext == ".go":
-                        language = "go"
-
-                    if language:
-                        chunks = chunk_file_by_tree_sitter(file_path, language=language)
-                    else:
-                        # Fall back to line-based chunking for unsupported languages
-                        logger.warn(
-                            "Unsupported language for tree-sitter chunking, falling back to line-based.",
-                            file=str(file_path),
-                            extension=ext,
-                        )
-                        chunks = chunk_file_by_lines(file_path, chunk_size=chunk_size)
-                else:
-                    logger.warn(
-                        "tree-sitter not available, falling back to line-based chunking.",
-                        file=str(file_path),
-                    )
-                    chunks = chunk_file_by_lines(file_path, chunk_size=chunk_size)
-            else:
-                chunks = chunk_file_by_lines(file_path, chunk_size=chunk_size)
 
-        for start_line, end_line, chunk_text in chunks:
-            chunk_file_name = f"{rel_path}__lines_{start_line}-{end_line}.txt"
-            # Replace / with __ in temp file name to avoid subdirs in temp
-            temp_chunk_path = Path(tempfile.gettempdir()) / chunk_file_name.replace(
-                "/", "__"
-            )
-            with open(temp_chunk_path, "w", encoding="utf-8") as f:
-                f.write(chunk_text)
-            gcs_blob_name = str(Path(gcs_folder_prefix) / chunk_file_name).replace(
-                "\\", "/"
+def _index_chunks(
+    sync_result: ChunkSyncResult,
+    commit_hash: Optional[str],
+    corpus_name: Optional[str] = None,
+) -> None:
+    """
+    Promotes the chunks staged by a sync in the local ChunkIndex, if one is
+    configured, and records the commit now imported into `corpus_name`.
+    """
+    if sync_result.chunk_staging_id is None:
+        return
+    try:
+        chunk_index = get_chunk_index(config.chunk_index_path)
+        chunk_index.promote(
+            sync_result.chunk_staging_id,
+            sync_result.gcs_folder_prefix,
+            commit_hash,
+            paths=sync_result.reindexed_paths,
+        )
+        if corpus_name:
+            chunk_index.set_corpus_version(
+                corpus_name, sync_result.gcs_folder_prefix, commit_hash
             )
-            blob = bucket.blob(gcs_blob_name)
-            try:
-                if upload_file(blob, temp_chunk_path):
-                    uploaded += 1
-                    if uploaded % 50 == 0:
-                        logger.debug("Uploaded chunks so far", uploaded=uploaded)
-                else:
-                    skipped += 1
-            except Exception as e:
-                logger.error(
-                    "Error uploading chunk to GCS",
-                    file=str(file_path),
-                    chunk_file=chunk_file_name,
-                    gcs_path=f"gs://{config.bucket_name}/{gcs_blob_name}",
-                    error=str(e),
-                )
-            finally:
-                if temp_chunk_path.exists():
-                    temp_chunk_path.unlink()
+    except sqlite3.Error as e:
+        # Retrieval falls back to parsing source URIs without the index.
+        logger.warn(
+            "Could not update chunk index",
+            gcs_folder_prefix=sync_result.gcs_folder_prefix,
+            error=str(e),
+        )
+
 
-    logger.info("Upload complete", uploaded=uploaded, skipped=skipped)
-    return gcs_folder_prefix
+def _checkpoint_uploads(
+    checkpoint: Optional[IngestionCheckpoint],
+    bucket: storage.Bucket,
+    uploader: ChunkUploader,
+    manifest: ChunkManifest,
+    force: bool = False,
+) -> None:
+    if checkpoint is None:
+        return
+    if force or checkpoint.is_due(config.checkpoint_interval_s):
+        checkpoint.record_uploads(manifest, uploader.completed_uploads())
+        checkpoint.save(bucket)
+
+
+def upload_repo_to_gcs(
+    bucket: storage.Bucket,
+    local_repo_path: Path,
+    chunking_strategy: str = "tree-sitter",  # 'lines' or 'tree-sitter'
+    chunk_size: int = 20,  # Only used for line-based chunking
+) -> str:
+    """
+    Uploads supported files from a local repo to GCS, chunking them as specified,
+    and saves the resulting chunk manifest. Returns the GCS folder prefix.
+
+    Nothing is imported into the corpus recorded in the manifest here, so the
+    changed files and deleted chunks are recorded as pending for the next
+    incremental ingestion into that corpus.
+    """
+    result = sync_repo_to_gcs(
+        bucket,
+        local_repo_path,
+        chunking_strategy=chunking_strategy,
+        chunk_size=chunk_size,
+    )
+    manifest = result.manifest
+    if manifest.corpus_name:
+        manifest.pending_paths |= {
+            manifest.source_path(blob_name) for blob_name in result.uploaded_blobs
+        } | set(result.failed_paths)
+        manifest.pending_deletes |= set(result.deleted_blobs)
+    if result.manifest_changed:
+        result.manifest.save(bucket)
+    _index_chunks(result, manifest.commit_hash)
+    return result.gcs_folder_prefix
 
 
 def create_rag_corpus(
@@ -391,7 +545,7 @@ def create_rag_corpus(
         location=location,
         embedding_model=embedding_model_name,
     )
-    vertexai.init(project=project_id, location=location)
+    get_backend().init(project_id, location)
 
     corpus: RagCorpus = rag.create_corpus(
         display_name=rag_corpus_display_name,
@@ -411,18 +565,24 @@ def import_files_to_vertex_rag(
     location: str = config.google_config.location,
     chunk_size: int = config.chunk_size,
     chunk_overlap: int = config.chunk_overlap,
+    batch_size: int = config.import_batch_size,
+    metrics: Optional[PipelineMetrics] = None,
 ) -> ImportRagFilesResponse:
-    """Imports files from GCS to the specified Vertex AI RAG Corpus."""
+    """
+    Imports files from GCS to the specified Vertex AI RAG Corpus.
+    URIs may be folders or single chunk objects; they are imported in batches of
+    `batch_size` and the per-batch counts are summed.
+    """
     logger.info(
         "Importing files from GCS to Vertex RAG corpus",
         rag_corpus_name=rag_corpus_name,
-        gcs_uris=gcs_uris,
+        gcs_uris=len(gcs_uris),
         project_id=project_id,
         location=location,
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
     )
-    vertexai.init(project=project_id, location=location)
+    get_backend().init(project_id, location)
 
     formatted_gcs_uris = []
     for uri in gcs_uris:
@@ -435,16 +595,30 @@ def import_files_to_vertex_rag(
         else:
             formatted_gcs_uris.append(uri)
 
-    result = rag.import_files(
-        corpus_name=rag_corpus_name,
-        paths=formatted_gcs_uris,
-        transformation_config=TransformationConfig(
-            chunking_config=ChunkingConfig(
-                chunk_size=chunk_size,
-                chunk_overlap=chunk_overlap,
-            )
-        ),
-    )
+    logger.debug("GCS URIs to import", gcs_uris=formatted_gcs_uris)
+
+    import_metrics = metrics.stage("import") if metrics is not None else None
+    batch_size = max(1, batch_size)
+    result = ImportRagFilesResponse()
+    for i in range(0, len(formatted_gcs_uris), batch_size):
+        batch = formatted_gcs_uris[i : i + batch_size]
+        started = time.perf_counter()
+        batch_result = rag.import_files(
+            corpus_name=rag_corpus_name,
+            paths=batch,
+            transformation_config=TransformationConfig(
+                chunking_config=ChunkingConfig(
+                    chunk_size=chunk_size,
+                    chunk_overlap=chunk_overlap,
+                )
+            ),
+        )
+        if import_metrics is not None:
+            import_metrics.record(time.perf_counter() - started, items=len(batch))
+        result.imported_rag_files_count += batch_result.imported_rag_files_count
+        result.failed_rag_files_count += batch_result.failed_rag_files_count
+    if metrics is not None:
+        metrics.log(rag_corpus_name=rag_corpus_name)
     logger.info(
         "Import to Vertex RAG completed",
         imported_files_count=result.imported_rag_files_count,
@@ -453,88 +627,455 @@ def import_files_to_vertex_rag(
     return result
 
 
-def ingest_repository_to_rag_corpus(
-    github_url: str,
-    rag_corpus_display_name: Optional[str] = None,
+def ingest_repository_delta(
+    local_repo_path: Path,
+    commit_hash: str,
+    bucket: storage.Bucket,
+    previous_manifest: ChunkManifest,
     project_id: str = config.google_config.project_id,
     location: str = config.google_config.location,
-    gcs_bucket_name: str = config.bucket_name,
-    embedding_model_to_use: str = config.embedding_model,
     chunk_size_to_use: int = config.chunk_size,
     chunk_overlap_to_use: int = config.chunk_overlap,
-) -> Tuple[Optional[RagCorpus], Optional[ImportRagFilesResponse]]:
+    key: Optional[str] = None,
+) -> Optional[Tuple[RagCorpus, ImportRagFilesResponse]]:
     """
-    Orchestrates cloning a GitHub repo, uploading to GCS, creating a RAG Corpus, and importing files.
-    Relies on Vertex AI's built-in chunking.
+    Re-ingests only what changed since the commit recorded in `previous_manifest`
+    into the corpus recorded there. Chunks of added or modified files are
+    uploaded and imported first; afterwards the RagFiles of replaced or removed
+    chunks are deleted from the corpus. Files left pending by an earlier run
+    (failed uploads or imports) are retried along with the diff.
+
+    Returns None when an incremental update is not possible (no previous
+    ingestion, the corpus is gone, or the previous commit is not available
+    locally), in which case the caller should fall back to a full ingestion.
+    The corpus is recorded in the `CorpusRegistry` under `key`, if given.
     """
-    logger.info(
-        "Starting RAG ingestion pipeline for repository",
-        github_url=github_url,
-        project_id=project_id,
-        location=location,
-    )
-    vertexai.init(project=project_id, location=location)
+    if not previous_manifest.corpus_name or not previous_manifest.commit_hash:
+        logger.info("No previous ingestion recorded; running full ingestion.")
+        return None
 
     try:
-        repo_name_from_url = github_url.split("/")[-1].replace(".git", "")
-        repo_org_and_name = "/".join(github_url.split("/")[-2:]).replace(".git", "")
+        corpus = rag.get_corpus(name=previous_manifest.corpus_name)
+    except NotFound:
+        logger.warn(
+            "Previously ingested corpus not found; running full ingestion.",
+            corpus_name=previous_manifest.corpus_name,
+        )
+        return None
 
-        local_repo_path, commit_hash = clone_github_repo(github_url)
+    has_pending = bool(
+        previous_manifest.pending_paths or previous_manifest.pending_deletes
+    )
+    if previous_manifest.commit_hash == commit_hash and not has_pending:
+        logger.info(
+            "Corpus already up to date",
+            corpus_name=corpus.name,
+            commit_hash=commit_hash,
+        )
+        if key is not None:
+            # Registers corpora ingested before there was a registry.
+            CorpusRegistry(bucket).upsert(
+                key, corpus.name, get_gcs_folder_prefix(local_repo_path), commit_hash
+            )
+        return corpus, ImportRagFilesResponse()
 
-        gcs_bucket_object = get_gcs_bucket(
-            project_id=project_id, bucket_name_to_get=gcs_bucket_name
+    changed_paths, deleted_paths = set(), set()
+    if previous_manifest.commit_hash != commit_hash:
+        try:
+            changed_paths, deleted_paths = diff_commits(
+                local_repo_path, previous_manifest.commit_hash, commit_hash
+            )
+        except git.GitCommandError as e:
+            logger.warn(
+                "Could not diff against previously ingested commit; running full ingestion.",
+                previous_commit=previous_manifest.commit_hash,
+                error=str(e),
+            )
+            return None
+    retry_paths = previous_manifest.pending_paths - deleted_paths
+    changed_paths |= retry_paths
+
+    metrics = PipelineMetrics()
+    sync_result = sync_repo_to_gcs(
+        bucket,
+        local_repo_path,
+        previous_manifest=previous_manifest,
+        changed_paths=changed_paths,
+        deleted_paths=deleted_paths,
+        force_paths=retry_paths,
+        metrics=metrics,
+    )
+
+    uploaded_uris = [
+        f"gs://{bucket.name}/{blob_name}" for blob_name in sync_result.uploaded_blobs
+    ]
+    import_response = ImportRagFilesResponse()
+    if uploaded_uris:
+        import_response = import_files_to_vertex_rag(
+            rag_corpus_name=corpus.name,
+            gcs_uris=uploaded_uris,
+            project_id=project_id,
+            location=location,
+            chunk_size=chunk_size_to_use,
+            chunk_overlap=chunk_overlap_to_use,
+            metrics=metrics,
         )
+    else:
+        metrics.log(rag_corpus_name=corpus.name)
+
+    delete_rag_files_for_uris(
+        corpus.name,
+        deleted_uris=[
+            f"gs://{bucket.name}/{blob_name}"
+            for blob_name in set(sync_result.deleted_blobs)
+            | previous_manifest.pending_deletes
+        ],
+        replaced_uris=uploaded_uris,
+    )
 
-        gcs_folder_prefix_uploaded = upload_repo_to_gcs(
-            gcs_bucket_object, local_repo_path
+    manifest = sync_result.manifest
+    manifest.commit_hash = commit_hash
+    manifest.corpus_name = corpus.name
+    manifest.pending_deletes = set()
+    manifest.pending_paths = set(sync_result.failed_paths)
+    if import_response.failed_rag_files_count > 0:
+        # The response does not say which files failed, so retry all of them.
+        manifest.pending_paths |= changed_paths
+    manifest.save(bucket)
+    _index_chunks(sync_result, commit_hash, corpus.name)
+    if key is not None:
+        CorpusRegistry(bucket).upsert(
+            key, corpus.name, sync_result.gcs_folder_prefix, commit_hash
         )
+    logger.info(
+        "Incremental RAG ingestion completed.",
+        corpus_name=corpus.name,
+        previous_commit=previous_manifest.commit_hash,
+        commit_hash=commit_hash,
+        changed_files=len(changed_paths),
+        deleted_files=len(deleted_paths),
+        imported_count=import_response.imported_rag_files_count,
+        failed_count=import_response.failed_rag_files_count,
+        pending_files=len(manifest.pending_paths),
+    )
+    return corpus, import_response
 
-        gcs_uri_for_import = [
-            f"gs://{gcs_bucket_name}/{gcs_folder_prefix_uploaded.strip('/')}/"
-        ]
 
-        if not rag_corpus_display_name:
-            rag_corpus_display_name = (
-                f"rag-corpus-{repo_name_from_url}-{str(uuid.uuid4())[:8]}"
+def _existing_corpus(
+    checkpoint: IngestionCheckpoint,
+    entry: Optional[CorpusEntry],
+    previous_manifest: ChunkManifest,
+) -> Optional[RagCorpus]:
+    """
+    The corpus a full ingestion goes into if it already exists: the one an
+    unfinished job created, else the one registered for the repo (or recorded
+    in its manifest by ingestions that predate the registry).
+    """
+    candidates = [("checkpoint", checkpoint.corpus_name)]
+    if config.reuse_corpora:
+        candidates += [
+            ("registry", entry.corpus_name if entry else None),
+            ("manifest", previous_manifest.corpus_name),
+        ]
+    for source, corpus_name in candidates:
+        if not corpus_name:
+            continue
+        try:
+            corpus = rag.get_corpus(name=corpus_name)
+        except NotFound:
+            logger.warn(
+                "Corpus not found; not reusing it.",
+                corpus_name=corpus_name,
+                source=source,
             )
+            continue
+        logger.info(
+            "Reusing existing corpus",
+            corpus_name=corpus.name,
+            source=source,
+            job_id=checkpoint.job_id,
+        )
+        return corpus
+    return None
+
+
+def _ingest_repository_full(
+    bucket: storage.Bucket,
+    local_repo_path: Path,
+    key: str,
+    commit_hash: Optional[str],
+    previous_manifest: ChunkManifest,
+    checkpoint: IngestionCheckpoint,
+    rag_corpus_display_name: str,
+    description: str,
+    project_id: str,
+    location: str,
+    embedding_model_name: str,
+    chunk_size: int,
+    chunk_overlap: int,
+) -> Tuple[Optional[RagCorpus], Optional[ImportRagFilesResponse]]:
+    """
+    Re-chunks the whole repo and brings the repo's corpus up to date.
 
-        description = f"RAG corpus for {repo_org_and_name} from {github_url}"
+    When the corpus registered for the repo already holds the chunks in the
+    previous manifest, it is upserted in place: only chunks uploaded by this
+    job (or an interrupted one) are imported, and the RagFiles of replaced or
+    removed chunks are deleted, so re-indexing costs the changed bytes. A new
+    corpus gets the whole chunk folder imported.
+    """
+    registry = CorpusRegistry(bucket)
+    corpus = _existing_corpus(checkpoint, registry.get(key), previous_manifest)
+    upsert = corpus is not None and corpus.name == previous_manifest.corpus_name
+
+    metrics = PipelineMetrics()
+    sync_result = sync_repo_to_gcs(
+        bucket,
+        local_repo_path,
+        previous_manifest=previous_manifest,
+        force_paths=previous_manifest.pending_paths if upsert else None,
+        metrics=metrics,
+        checkpoint=checkpoint,
+    )
+    manifest = sync_result.manifest
 
-        created_corpus = create_rag_corpus(
+    reused_corpus = corpus is not None
+    if corpus is None:
+        corpus = create_rag_corpus(
             rag_corpus_display_name=rag_corpus_display_name,
             description=description,
             project_id=project_id,
             location=location,
-            embedding_model_name=embedding_model_to_use,
+            embedding_model_name=embedding_model_name,
         )
-
-        if not created_corpus or not hasattr(created_corpus, "name"):
+        if not corpus or not hasattr(corpus, "name"):
             logger.error(
                 "Failed to create RAG corpus or corpus has no name.",
-                corpus_object=created_corpus,
+                corpus_object=corpus,
             )
             return None, None
-
-        import_response = import_files_to_vertex_rag(
-            rag_corpus_name=created_corpus.name,
-            gcs_uris=gcs_uri_for_import,
-            project_id=project_id,
-            location=location,
-            chunk_size=chunk_size_to_use,
-            chunk_overlap=chunk_overlap_to_use,
-        )
-        logger.info(
-            "RAG ingestion pipeline completed for repository.",
-            github_url=github_url,
-            corpus_name=created_corpus.name,
-            imported_count=import_response.imported_rag_files_count
-            if import_response
-            else "N/A",
-            failed_count=import_response.failed_rag_files_count
-            if import_response
-            else "N/A",
+    if checkpoint.corpus_name != corpus.name:
+        # Recorded before importing, so a restarted job reuses the corpus.
+        checkpoint.corpus_name = corpus.name
+        checkpoint.save(bucket)
+
+    if upsert:
+        # Everything this job uploaded, plus chunks an interrupted run uploaded
+        # (and may not have imported).
+        import_blobs = sorted(blob for blob in checkpoint.chunks if blob in manifest)
+        import_uris = [f"gs://{bucket.name}/{blob_name}" for blob_name in import_blobs]
+        import_response = ImportRagFilesResponse()
+        if import_uris:
+            import_response = import_files_to_vertex_rag(
+                rag_corpus_name=corpus.name,
+                gcs_uris=import_uris,
+                project_id=project_id,
+                location=location,
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                metrics=metrics,
+            )
+        else:
+            metrics.log(rag_corpus_name=corpus.name)
+        delete_rag_files_for_uris(
+            corpus.name,
+            deleted_uris=[
+                f"gs://{bucket.name}/{blob_name}"
+                for blob_name in set(sync_result.deleted_blobs)
+                | previous_manifest.pending_deletes
+            ],
+            replaced_uris=import_uris,
         )
-        return created_corpus, import_response
+    else:
+        import_blobs = list(manifest.chunks)
+        import_response = ImportRagFilesResponse()
+        if import_blobs:
+            import_response = import_files_to_vertex_rag(
+                rag_corpus_name=corpus.name,
+                gcs_uris=[
+                    f"gs://{bucket.name}/{sync_result.gcs_folder_prefix.strip('/')}/"
+                ],
+                project_id=project_id,
+                location=location,
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                metrics=metrics,
+            )
+        else:
+            # No supported files: an empty folder is not imported.
+            metrics.log(rag_corpus_name=corpus.name)
+        if reused_corpus:
+            # Part of the folder may be in the corpus already (an interrupted
+            # job, or a corpus out of sync with the manifest); drop the older
+            # copies of chunks that were imported twice.
+            delete_rag_files_for_uris(
+                corpus.name,
+                deleted_uris=[],
+                replaced_uris=[
+                    f"gs://{bucket.name}/{blob_name}" for blob_name in manifest.chunks
+                ],
+            )
+
+    manifest.corpus_name = corpus.name
+    manifest.commit_hash = commit_hash
+    manifest.pending_deletes = set()
+    manifest.pending_paths = set(sync_result.failed_paths)
+    if import_response.failed_rag_files_count > 0:
+        # The response does not say which files failed, so retry all of them.
+        manifest.pending_paths |= {
+            manifest.source_path(blob_name) for blob_name in import_blobs
+        }
+    manifest.save(bucket)
+    _index_chunks(sync_result, commit_hash, corpus.name)
+    registry.upsert(key, corpus.name, sync_result.gcs_folder_prefix, commit_hash)
+    checkpoint.delete(bucket)
+    logger.info(
+        "Full RAG ingestion completed.",
+        key=key,
+        job_id=checkpoint.job_id,
+        corpus_name=corpus.name,
+        upsert=upsert,
+        uploaded_chunks=len(sync_result.uploaded_blobs),
+        deleted_chunks=len(sync_result.deleted_blobs),
+        pending_files=len(manifest.pending_paths),
+    )
+    return corpus, import_response
+
+
+def _start_or_resume_job(
+    bucket: storage.Bucket,
+    gcs_folder_prefix: str,
+    commit_hash: Optional[str],
+    previous_manifest: ChunkManifest,
+    checkpoint: Optional[IngestionCheckpoint],
+    source: str,
+) -> IngestionCheckpoint:
+    if checkpoint is None:
+        checkpoint = IngestionCheckpoint(gcs_folder_prefix, commit_hash=commit_hash)
+        logger.info("Starting ingestion job", job_id=checkpoint.job_id, source=source)
+        return checkpoint
+    logger.info(
+        "Resuming ingestion job",
+        job_id=checkpoint.job_id,
+        source=source,
+        uploaded_chunks=len(checkpoint.chunks),
+        corpus_name=checkpoint.corpus_name,
+    )
+    checkpoint.resume(previous_manifest)
+    checkpoint.commit_hash = commit_hash
+    return checkpoint
+
+
+def ingest_repository_to_rag_corpus(
+    github_url: str,
+    rag_corpus_display_name: Optional[str] = None,
+    project_id: str = config.google_config.project_id,
+    location: str = config.google_config.location,
+    gcs_bucket_name: str = config.bucket_name,
+    embedding_model_to_use: str = config.embedding_model,
+    chunk_size_to_use: int = config.chunk_size,
+    chunk_overlap_to_use: int = config.chunk_overlap,
+    incremental: bool = False,
+    branch: Optional[str] = None,
+) -> Tuple[Optional[RagCorpus], Optional[ImportRagFilesResponse]]:
+    """
+    Orchestrates cloning a GitHub repo, uploading to GCS, creating a RAG Corpus, and importing files.
+    Relies on Vertex AI's built-in chunking.
+
+    Each repo (and `branch`, if given) has one corpus, recorded in the
+    `CorpusRegistry`; later ingestions upsert into it rather than creating a
+    new corpus.
+
+    With `incremental=True`, only files changed since the commit recorded in
+    the repo's chunk manifest are re-chunked, uploaded and imported. Falls back
+    to a full ingestion when there is no previous ingestion to diff against.
+
+    Full ingestions run as jobs that checkpoint their progress (see
+    `IngestionCheckpoint`). If an earlier job for the repo did not finish, it is
+    resumed instead: chunks it already uploaded are skipped and the corpus it
+    created is reused.
+    """
+    logger.info(
+        "Starting RAG ingestion pipeline for repository",
+        github_url=github_url,
+        branch=branch,
+        project_id=project_id,
+        location=location,
+    )
+    get_backend().init(project_id, location)
+
+    try:
+        repo_name_from_url = github_url.split("/")[-1].replace(".git", "")
+        key = github_registry_key(github_url, branch)
+
+        with repo_locks.hold(key):
+            local_repo_path, commit_hash = clone_github_repo(github_url, branch=branch)
+
+            gcs_bucket_object = get_gcs_bucket(
+                project_id=project_id, bucket_name_to_get=gcs_bucket_name
+            )
+            gcs_folder_prefix = get_gcs_folder_prefix(local_repo_path)
+            previous_manifest = ChunkManifest.load(gcs_bucket_object, gcs_folder_prefix)
+            checkpoint = IngestionCheckpoint.load(gcs_bucket_object, gcs_folder_prefix)
+
+            if incremental and checkpoint is not None:
+                logger.info(
+                    "Resuming unfinished ingestion job instead of an incremental update",
+                    job_id=checkpoint.job_id,
+                )
+            elif incremental:
+                delta_result = ingest_repository_delta(
+                    local_repo_path=local_repo_path,
+                    commit_hash=commit_hash,
+                    bucket=gcs_bucket_object,
+                    previous_manifest=previous_manifest,
+                    project_id=project_id,
+                    location=location,
+                    chunk_size_to_use=chunk_size_to_use,
+                    chunk_overlap_to_use=chunk_overlap_to_use,
+                    key=key,
+                )
+                if delta_result is not None:
+                    return delta_result
+
+            checkpoint = _start_or_resume_job(
+                gcs_bucket_object,
+                gcs_folder_prefix,
+                commit_hash,
+                previous_manifest,
+                checkpoint,
+                source=github_url,
+            )
+            corpus, import_response = _ingest_repository_full(
+                gcs_bucket_object,
+                local_repo_path,
+                key=key,
+                commit_hash=commit_hash,
+                previous_manifest=previous_manifest,
+                checkpoint=checkpoint,
+                rag_corpus_display_name=rag_corpus_display_name
+                or corpus_display_name(repo_name_from_url),
+                description=f"RAG corpus for {key} from {github_url}",
+                project_id=project_id,
+                location=location,
+                embedding_model_name=embedding_model_to_use,
+                chunk_size=chunk_size_to_use,
+                chunk_overlap=chunk_overlap_to_use,
+            )
+            if corpus is None:
+                return None, None
+            logger.info(
+                "RAG ingestion pipeline completed for repository.",
+                github_url=github_url,
+                job_id=checkpoint.job_id,
+                corpus_name=corpus.name,
+                imported_count=import_response.imported_rag_files_count
+                if import_response
+                else "N/A",
+                failed_count=import_response.failed_rag_files_count
+                if import_response
+                else "N/A",
+            )
+            return corpus, import_response
 
     except Exception as e:
         logger.error("Error during RAG ingestion pipeline", error=str(e), exc_info=True)
@@ -551,6 +1092,9 @@ def ingest_local_repo_to_rag_corpus(
     """
     Orchestrates cloning a local repo, uploading to GCS, creating a RAG Corpus, and importing files.
     Relies on Vertex AI's built-in chunking.
+
+    Local repos are registered as `local/<directory name>`, so re-ingesting
+    the same directory upserts into its corpus.
     """
     repo_name_from_url = local_repo_path.name
     if not local_repo_path.exists():
@@ -572,49 +1116,45 @@ def ingest_local_repo_to_rag_corpus(
         location=location,
         gcs_bucket_name=gcs_bucket_name,
     )
-    vertexai.init(project=project_id, location=location)
+    get_backend().init(project_id, location)
 
     try:
         gcs_bucket_object = get_gcs_bucket(
             project_id=project_id, bucket_name_to_get=gcs_bucket_name
         )
-
-        gcs_folder_prefix_uploaded = upload_repo_to_gcs(
-            gcs_bucket_object, local_repo_path
+        try:
+            commit_hash = git.Repo(local_repo_path).head.commit.hexsha
+        except (git.InvalidGitRepositoryError, ValueError):
+            commit_hash = None
+
+        gcs_folder_prefix = get_gcs_folder_prefix(local_repo_path)
+        previous_manifest = ChunkManifest.load(gcs_bucket_object, gcs_folder_prefix)
+        checkpoint = _start_or_resume_job(
+            gcs_bucket_object,
+            gcs_folder_prefix,
+            commit_hash,
+            previous_manifest,
+            IngestionCheckpoint.load(gcs_bucket_object, gcs_folder_prefix),
+            source=str(local_repo_path),
         )
-
-        gcs_uri_for_import = [
-            f"gs://{gcs_bucket_name}/{gcs_folder_prefix_uploaded.strip('/')}/"
-        ]
-
-        if not rag_corpus_display_name:
-            rag_corpus_display_name = (
-                f"rag-corpus-{repo_name_from_url}-{str(uuid.uuid4())[:8]}"
-            )
-
-        created_corpus = create_rag_corpus(
-            rag_corpus_display_name=rag_corpus_display_name,
+        created_corpus, import_response = _ingest_repository_full(
+            gcs_bucket_object,
+            local_repo_path,
+            key=registry_key(f"local/{repo_name_from_url}"),
+            commit_hash=commit_hash,
+            previous_manifest=previous_manifest,
+            checkpoint=checkpoint,
+            rag_corpus_display_name=rag_corpus_display_name
+            or corpus_display_name(repo_name_from_url),
             description=description,
             project_id=project_id,
             location=location,
             embedding_model_name=config.embedding_model,
-        )
-
-        if not created_corpus or not hasattr(created_corpus, "name"):
-            logger.error(
-                "Failed to create RAG corpus or corpus has no name.",
-                corpus_object=created_corpus,
-            )
-            return None, None
-
-        import_response = import_files_to_vertex_rag(
-            rag_corpus_name=created_corpus.name,
-            gcs_uris=gcs_uri_for_import,
-            project_id=project_id,
-            location=location,
             chunk_size=config.chunk_size,
             chunk_overlap=config.chunk_overlap,
         )
+        if created_corpus is None:
+            return None, None
         logger.info(
             "RAG ingestion pipeline completed for local repository.",
             local_repo_path=local_repo_path,
@@ -658,6 +1198,17 @@ def main():
         help="Google Cloud Location.",
     )
 
+    argparser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only re-ingest files changed since the last ingested commit.",
+    )
+    argparser.add_argument(
+        "--branch",
+        type=str,
+        help="Branch to ingest instead of the default branch; gets its own corpus.",
+    )
+
     args = argparser.parse_args()
 
     logger.info(
@@ -669,9 +1220,11 @@ def main():
         rag_corpus_display_name=args.corpus_display_name,
         project_id=args.project_id,
         location=args.location,
+        incremental=args.incremental,
+        branch=args.branch,
     )
 
-    if corpus_obj and import_result:
+    if corpus_obj and import_result is not None:
         logger.info(
             "RAG ingestion successful.",
             corpus_name=corpus_obj.name,
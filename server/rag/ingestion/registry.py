@@ -0,0 +1,246 @@
+import argparse
+import json
+import re
+import urllib.parse
+import uuid
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+
+from google.api_core.exceptions import NotFound
+from google.cloud import storage
+from pydantic import BaseModel
+
+from logger import structlog
+from rag.chunk_index import get_chunk_index
+from rag.ingestion.backends import get_backend, rag
+from rag.ingestion.checkpoint import IngestionCheckpoint, checkpoint_blob_name
+from rag.ingestion.config import config
+from rag.ingestion.manifest import ChunkManifest, manifest_blob_name
+
+logger = structlog.get_logger()
+
+# Display names given to corpora created by ingestion, see `corpus_display_name`.
+GENERATED_CORPUS_NAME_RE = re.compile(r"^rag-corpus-.+-[0-9a-f]{8}$")
+
+
+def registry_key(repo: str, branch: Optional[str] = None) -> str:
+    """`owner/name` of a repo, plus `@branch` when not the default branch."""
+    return f"{repo}@{branch}" if branch else repo
+
+
+def corpus_display_name(repo_name: str) -> str:
+    return f"rag-corpus-{repo_name}-{uuid.uuid4().hex[:8]}"
+
+
+class CorpusEntry(BaseModel):
+    """The corpus and GCS folder prefix that hold one repo (and branch)."""
+
+    key: str
+    corpus_name: str
+    gcs_folder_prefix: str
+    commit_hash: Optional[str] = None
+    updated_at: datetime
+
+
+class CorpusRegistry:
+    """
+    Maps `owner/repo[@branch]` to the one long-lived corpus of that repo, so
+    re-ingestions upsert into it instead of creating a new corpus every time.
+
+    Each entry is its own JSON object under `config.corpus_registry_prefix`, so
+    ingestions of different repos never overwrite each other's entries.
+    """
+
+    def __init__(
+        self, bucket: storage.Bucket, prefix: str = config.corpus_registry_prefix
+    ):
+        self.bucket = bucket
+        self.prefix = prefix.rstrip("/")
+
+    def _blob_name(self, key: str) -> str:
+        return f"{self.prefix}/{urllib.parse.quote(key, safe='')}.json"
+
+    def get(self, key: str) -> Optional[CorpusEntry]:
+        try:
+            payload = self.bucket.blob(self._blob_name(key)).download_as_text()
+        except NotFound:
+            return None
+        return CorpusEntry.model_validate_json(payload)
+
+    def upsert(
+        self,
+        key: str,
+        corpus_name: str,
+        gcs_folder_prefix: str,
+        commit_hash: Optional[str] = None,
+    ) -> CorpusEntry:
+        entry = CorpusEntry(
+            key=key,
+            corpus_name=corpus_name,
+            gcs_folder_prefix=gcs_folder_prefix,
+            commit_hash=commit_hash,
+            updated_at=datetime.now(timezone.utc),
+        )
+        self.bucket.blob(self._blob_name(key)).upload_from_string(
+            entry.model_dump_json(), content_type="application/json"
+        )
+        logger.info("Registered corpus", key=key, corpus_name=corpus_name)
+        return entry
+
+    def entries(self) -> Iterator[CorpusEntry]:
+        for blob in self.bucket.list_blobs(prefix=self.prefix + "/"):
+            if blob.name.endswith(".json"):
+                yield CorpusEntry.model_validate_json(blob.download_as_text())
+
+    def delete(self, key: str) -> Optional[CorpusEntry]:
+        """
+        Deletes a repo's corpus, its chunk objects, manifest and checkpoint,
+        and its registry entry. Returns the deleted entry, if there was one.
+        """
+        entry = self.get(key)
+        if entry is None:
+            return None
+        _delete_corpus(entry.corpus_name)
+        _delete_prefix(self.bucket, entry.gcs_folder_prefix)
+        try:
+            self.bucket.blob(self._blob_name(key)).delete()
+        except NotFound:
+            pass
+        logger.info("Deleted registered corpus", key=key, corpus_name=entry.corpus_name)
+        return entry
+
+
+def _delete_corpus(corpus_name: str) -> bool:
+    try:
+        rag.delete_corpus(name=corpus_name)
+    except NotFound:
+        return False
+    logger.info("Deleted corpus", corpus_name=corpus_name)
+    return True
+
+
+def _delete_prefix(bucket: storage.Bucket, gcs_folder_prefix: str) -> int:
+    """
+    Deletes the chunk objects, manifest and checkpoint of a folder prefix, and
+    its rows in the local chunk index.
+    """
+    prefix = gcs_folder_prefix.rstrip("/")
+    names = [blob.name for blob in bucket.list_blobs(prefix=prefix + "/")]
+    names += [manifest_blob_name(prefix), checkpoint_blob_name(prefix)]
+    deleted = 0
+    for name in names:
+        try:
+            bucket.blob(name).delete()
+            deleted += 1
+        except NotFound:
+            pass
+    chunk_index = get_chunk_index(config.chunk_index_path, create=False)
+    if chunk_index is not None:
+        chunk_index.delete_prefix(prefix)
+    logger.info("Deleted GCS folder prefix", gcs_folder_prefix=prefix, objects=deleted)
+    return deleted
+
+
+def _folder_prefixes(bucket: storage.Bucket) -> set[str]:
+    """Folder prefixes that have a manifest or checkpoint next to them."""
+    prefixes = set()
+    for blob in bucket.list_blobs(prefix=config.gcs_folder_prefix):
+        for suffix in (".manifest.json", ".checkpoint.json"):
+            if blob.name.endswith(suffix) and "/" not in blob.name:
+                prefixes.add(blob.name.removesuffix(suffix))
+    return prefixes
+
+
+def collect_garbage(bucket: storage.Bucket, dry_run: bool = True) -> dict[str, list]:
+    """
+    Finds and (unless `dry_run`) deletes what no repo uses anymore:
+
+    - corpora with an ingestion-generated display name that are not referenced
+      by a registry entry, a chunk manifest or an unfinished job's checkpoint;
+    - GCS folder prefixes without a registry entry or unfinished job whose
+      manifest points at a corpus that no longer exists.
+
+    Corpora with other display names were created by hand and are never touched.
+    """
+    registry = CorpusRegistry(bucket)
+    entries = list(registry.entries())
+    registered_prefixes = {entry.gcs_folder_prefix for entry in entries}
+    referenced = {entry.corpus_name for entry in entries}
+
+    stale_prefixes = []
+    for prefix in sorted(_folder_prefixes(bucket)):
+        checkpoint = IngestionCheckpoint.load(bucket, prefix)
+        manifest = ChunkManifest.load(bucket, prefix)
+        referenced |= {
+            name
+            for name in (manifest.corpus_name, checkpoint and checkpoint.corpus_name)
+            if name
+        }
+        if prefix in registered_prefixes or checkpoint is not None:
+            continue
+        if manifest.corpus_name:
+            try:
+                rag.get_corpus(name=manifest.corpus_name)
+                continue
+            except NotFound:
+                pass
+        stale_prefixes.append(prefix)
+
+    stale_corpora = [
+        corpus.name
+        for corpus in rag.list_corpora()
+        if corpus.name not in referenced
+        and GENERATED_CORPUS_NAME_RE.match(corpus.display_name or "")
+    ]
+
+    logger.info(
+        "Corpus garbage collection",
+        dry_run=dry_run,
+        stale_corpora=len(stale_corpora),
+        stale_prefixes=len(stale_prefixes),
+    )
+    if not dry_run:
+        for corpus_name in stale_corpora:
+            _delete_corpus(corpus_name)
+        for prefix in stale_prefixes:
+            _delete_prefix(bucket, prefix)
+    return {"corpora": stale_corpora, "gcs_folder_prefixes": stale_prefixes}
+
+
+def main():
+    # rag_corpus imports this module.
+    from rag.ingestion.rag_corpus import get_gcs_bucket
+
+    argparser = argparse.ArgumentParser(
+        description="Inspect and clean up the registry of per-repository corpora."
+    )
+    commands = argparser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="List registered repositories and corpora.")
+    delete = commands.add_parser(
+        "delete", help="Delete a repository's corpus, chunks and registry entry."
+    )
+    delete.add_argument("repo", help="owner/name of the repository.")
+    delete.add_argument("--branch", help="Branch, if not the default branch.")
+    gc = commands.add_parser(
+        "gc", help="Find corpora and GCS prefixes no repository uses anymore."
+    )
+    gc.add_argument(
+        "--apply", action="store_true", help="Delete them instead of listing them."
+    )
+    args = argparser.parse_args()
+
+    get_backend().init(config.google_config.project_id, config.google_config.location)
+    bucket = get_gcs_bucket()
+    if args.command == "list":
+        for entry in CorpusRegistry(bucket).entries():
+            print(entry.model_dump_json())
+    elif args.command == "delete":
+        key = registry_key(args.repo, args.branch)
+        if CorpusRegistry(bucket).delete(key) is None:
+            logger.error("Repository not registered", key=key)
+    else:
+        print(json.dumps(collect_garbage(bucket, dry_run=not args.apply), indent=2))
+
+
+if __name__ == "__main__":
+    main()
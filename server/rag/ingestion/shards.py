@@ -0,0 +1,132 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import NamedTuple
+
+from rag.chunk_index import symbol_of
+from rag.ingestion.chunking import Chunk
+
+SHARD_DIR = "shards"
+
+
+def shard_record(rel_path: str, start_line: int, end_line: int, text: str) -> str:
+    """
+    One JSONL line of a shard. The keys are written in this fixed order so the
+    retrieval side can recover the metadata from a piece of shard text.
+    """
+    return json.dumps(
+        {
+            "path": rel_path,
+            "start_line": start_line,
+            "end_line": end_line,
+            "text": text,
+        },
+        ensure_ascii=False,
+    )
+
+
+class ShardRecord(NamedTuple):
+    line: str
+    rel_path: str
+    start_line: int
+    end_line: int
+    symbol: str | None
+    text: str
+
+
+class Shard(NamedTuple):
+    blob_name: str
+    text: str
+    rel_paths: list[str]
+    # (record, byte_start, byte_end) in `text`
+    records: list[tuple[ShardRecord, int, int]]
+
+
+class _Part(NamedTuple):
+    number: int
+    size: int
+    records: list[ShardRecord]
+    rel_paths: list[str]
+
+
+class ShardWriter:
+    """
+    Packs chunks into size-capped JSONL shard objects instead of one GCS object
+    per chunk.
+
+    Each file is assigned to one of `buckets` by a stable hash of its path, and
+    the files of a bucket are packed in the order they are added (the repo
+    walker's sorted order) into parts of at most `max_bytes` (a single larger
+    file still gets a part of its own). Shards are named
+    `<prefix>/shards/<bucket>-<part>.jsonl`, so a changed file only changes the
+    shards of its own bucket, and the manifest can skip uploading every other
+    shard.
+
+    `add` returns a part as soon as it is full, so at most one open part per
+    bucket is held in memory; `close` returns the remaining ones.
+    """
+
+    def __init__(self, gcs_folder_prefix: str, buckets: int, max_bytes: int):
+        self.gcs_folder_prefix = gcs_folder_prefix.rstrip("/")
+        self.buckets = max(1, buckets)
+        self.max_bytes = max_bytes
+        self._width = len(str(self.buckets - 1))
+        self._parts: dict[int, _Part] = {}
+
+    def bucket_of(self, rel_path: str) -> int:
+        digest = hashlib.md5(rel_path.encode("utf-8"), usedforsecurity=False).digest()
+        return int.from_bytes(digest[:4], "big") % self.buckets
+
+    def add(self, rel_path: str, chunks: list[Chunk]) -> list[Shard]:
+        """Adds the chunks of a file. Returns the shards this completed."""
+        if not chunks:
+            return []
+        records = [
+            ShardRecord(
+                shard_record(rel_path, start_line, end_line, text),
+                rel_path,
+                start_line,
+                end_line,
+                symbol_of(text),
+                text,
+            )
+            for start_line, end_line, text in chunks
+        ]
+        file_size = sum(len(record.line.encode("utf-8")) + 1 for record in records)
+        bucket = self.bucket_of(rel_path)
+        done = []
+        part = self._parts.get(bucket, _Part(0, 0, [], []))
+        if part.records and part.size + file_size > self.max_bytes:
+            done.append(self._shard(bucket, part))
+            part = _Part(part.number + 1, 0, [], [])
+        part.records.extend(records)
+        part.rel_paths.append(rel_path)
+        part = part._replace(size=part.size + file_size)
+        if part.size >= self.max_bytes:
+            done.append(self._shard(bucket, part))
+            part = _Part(part.number + 1, 0, [], [])
+        self._parts[bucket] = part
+        return done
+
+    def close(self) -> list[Shard]:
+        """The shards of the parts that are still open, in bucket order."""
+        parts, self._parts = self._parts, {}
+        return [
+            self._shard(bucket, part)
+            for bucket, part in sorted(parts.items())
+            if part.records
+        ]
+
+    def _shard(self, bucket: int, part: _Part) -> Shard:
+        blob_name = str(
+            Path(self.gcs_folder_prefix)
+            / SHARD_DIR
+            / f"{bucket:0{self._width}d}-{part.number:03d}.jsonl"
+        ).replace("\\", "/")
+        spans, offset = [], 0
+        for record in part.records:
+            end = offset + len(record.line.encode("utf-8"))
+            spans.append((record, offset, end))
+            offset = end + 1
+        text = "\n".join(record.line for record in part.records) + "\n"
+        return Shard(blob_name, text, part.rel_paths, spans)
@@ -0,0 +1,236 @@
+import gzip
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional
+
+from google.api_core.exceptions import NotFound
+from google.cloud import storage
+
+from logger import structlog
+from rag.ingestion.config import config
+from rag.ingestion.pipeline import StageMetrics
+
+logger = structlog.get_logger()
+
+CHUNK_CONTENT_TYPE = "text/plain; charset=utf-8"
+# Log upload progress at INFO every this many files, per-file progress is DEBUG.
+PROGRESS_LOG_EVERY = 100
+
+
+class ChunkUploader:
+    """
+    Bounded-concurrency uploader for chunk objects.
+
+    Chunks are submitted per file and uploaded on a thread pool while the caller
+    keeps chunking. At most `queue_size` chunks (default `workers * 4`) are
+    held in memory at once; `submit_file` blocks when that limit is reached. Progress is reported in
+    file submission order, i.e. file N is only reported once files 1..N-1 have
+    finished uploading.
+    """
+
+    def __init__(
+        self,
+        bucket: storage.Bucket,
+        workers: int = config.upload_workers,
+        max_retries: int = config.upload_max_retries,
+        retry_backoff_s: float = config.upload_retry_backoff_s,
+        gzip_chunks: bool = config.upload_gzip,
+        total_files: Optional[int] = None,
+        queue_size: int = config.upload_queue_size,
+        metrics: Optional[StageMetrics] = None,
+    ):
+        self.bucket = bucket
+        self.workers = max(1, workers)
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff_s = retry_backoff_s
+        self.gzip_chunks = gzip_chunks
+        self.total_files = total_files
+        self.metrics = metrics
+
+        self.uploaded = 0
+        self.deleted = 0
+        self.failed = 0
+        self.failed_blobs: set[str] = set()
+        self.uploaded_blobs: set[str] = set()
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="chunk-upload"
+        )
+        self.queue_size = queue_size if queue_size > 0 else self.workers * 4
+        self._slots = threading.BoundedSemaphore(self.queue_size)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._pending: dict[int, int] = {}
+        self._file_names: dict[int, str] = {}
+        self._next_seq = 0
+        self._reported = 0
+
+    def __enter__(self) -> "ChunkUploader":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def submit_file(self, rel_path: str, chunks: list[tuple[str, str]]) -> None:
+        """
+        Queues all chunks of one file for upload.
+
+        Args:
+            rel_path (str): Path of the source file relative to the repo root.
+            chunks (list[tuple[str, str]]): (gcs_blob_name, chunk_text) pairs.
+        """
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            self._pending[seq] = len(chunks)
+            self._file_names[seq] = rel_path
+            if not chunks:
+                self._report_progress()
+
+        for blob_name, chunk_text in chunks:
+            self._acquire_slot()
+            future = self._executor.submit(
+                self._with_retry, self._upload_chunk, blob_name, chunk_text
+            )
+            future.add_done_callback(
+                lambda f, seq=seq, blob_name=blob_name: self._on_done(seq, blob_name, f)
+            )
+
+    def delete_blobs(self, blob_names: list[str]) -> None:
+        """Queues deletion of objects that are no longer part of the repo."""
+        for blob_name in blob_names:
+            self._acquire_slot()
+            future = self._executor.submit(
+                self._with_retry, self._delete_chunk, blob_name
+            )
+            future.add_done_callback(
+                lambda f, blob_name=blob_name: self._on_deleted(blob_name, f)
+            )
+
+    def close(self) -> dict[str, int]:
+        """Waits for all in-flight operations and returns the counters."""
+        self._executor.shutdown(wait=True)
+        return {
+            "uploaded": self.uploaded,
+            "deleted": self.deleted,
+            "failed": self.failed,
+        }
+
+    def completed_uploads(self) -> set[str]:
+        """Blob names uploaded so far; safe to call while uploads are running."""
+        with self._lock:
+            return set(self.uploaded_blobs)
+
+    def _with_retry(self, operation, blob_name: str, *args) -> None:
+        attempt = 0
+        while True:
+            try:
+                return operation(blob_name, *args)
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.retry_backoff_s * (2**attempt)
+                delay += random.uniform(0, delay)
+                attempt += 1
+                logger.warn(
+                    "GCS operation failed, retrying",
+                    gcs_path=f"gs://{self.bucket.name}/{blob_name}",
+                    attempt=attempt,
+                    delay=round(delay, 2),
+                    error=str(e),
+                )
+                time.sleep(delay)
+
+    def _acquire_slot(self) -> None:
+        self._slots.acquire()
+        with self._lock:
+            self._in_flight += 1
+            if self.metrics is not None:
+                self.metrics.record_depth(self._in_flight)
+
+    def _release_slot(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _upload_chunk(self, blob_name: str, chunk_text: str) -> None:
+        started = time.perf_counter()
+        blob = self.bucket.blob(blob_name)
+        data = chunk_text.encode("utf-8")
+        if self.gzip_chunks:
+            blob.content_encoding = "gzip"
+            data = gzip.compress(data, mtime=0)
+        blob.upload_from_string(data, content_type=CHUNK_CONTENT_TYPE)
+        if self.metrics is not None:
+            self.metrics.record(time.perf_counter() - started, nbytes=len(data))
+
+    def _delete_chunk(self, blob_name: str) -> None:
+        try:
+            self.bucket.blob(blob_name).delete()
+        except NotFound:
+            pass
+
+    def _on_done(self, seq: int, blob_name: str, future: Future) -> None:
+        self._release_slot()
+        error = future.exception()
+        with self._lock:
+            if error is not None:
+                self.failed += 1
+                self.failed_blobs.add(blob_name)
+                logger.error(
+                    "Error uploading chunk to GCS",
+                    file=self._file_names.get(seq),
+                    gcs_path=f"gs://{self.bucket.name}/{blob_name}",
+                    error=str(error),
+                )
+            else:
+                self.uploaded += 1
+                self.uploaded_blobs.add(blob_name)
+                if self.uploaded % 50 == 0:
+                    logger.debug("Uploaded chunks so far", uploaded=self.uploaded)
+            self._pending[seq] -= 1
+            self._report_progress()
+
+    def _on_deleted(self, blob_name: str, future: Future) -> None:
+        self._release_slot()
+        error = future.exception()
+        with self._lock:
+            if error is not None:
+                self.failed += 1
+                self.failed_blobs.add(blob_name)
+                logger.error(
+                    "Error deleting stale chunk from GCS",
+                    gcs_path=f"gs://{self.bucket.name}/{blob_name}",
+                    error=str(error),
+                )
+            else:
+                self.deleted += 1
+
+    def _report_progress(self) -> None:
+        # Must be called with self._lock held.
+        while self._pending.get(self._reported) == 0:
+            del self._pending[self._reported]
+            rel_path = self._file_names.pop(self._reported)
+            self._reported += 1
+            if self.total_files:
+                progress = f"{self._reported / self.total_files * 100:.2f}%"
+                logger.debug(
+                    f"Uploaded file {self._reported}/{self.total_files}",
+                    file=rel_path,
+                    progress=progress,
+                )
+                if (
+                    self._reported % PROGRESS_LOG_EVERY == 0
+                    or self._reported == self.total_files
+                ):
+                    logger.info(
+                        "Upload progress",
+                        files=f"{self._reported}/{self.total_files}",
+                        progress=progress,
+                    )
+            else:
+                logger.debug(f"Uploaded file {self._reported}", file=rel_path)
+                if self._reported % PROGRESS_LOG_EVERY == 0:
+                    logger.info("Upload progress", files=self._reported)
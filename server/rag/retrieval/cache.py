@@ -0,0 +1,130 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from rag.chunk_index import get_chunk_index
+from rag.config import config
+from logger import structlog
+
+logger = structlog.get_logger()
+
+
+def normalize_query(query: str) -> str:
+    """Collapses whitespace; case is kept since it matters for code identifiers."""
+    return " ".join(query.split())
+
+
+def corpus_version(corpus_name: str) -> Optional[str]:
+    """
+    Commit last ingested into a corpus, as recorded by ingestion in the local
+    chunk index. None when unknown, in which case only the TTL bounds how
+    stale cached results can get.
+    """
+    chunk_index = get_chunk_index(config.chunk_index_path, create=False)
+    return chunk_index.corpus_version(corpus_name) if chunk_index else None
+
+
+class RetrievalCache:
+    """
+    LRU cache of retrieval results with a TTL, shared by the retrieval paths
+    of the process.
+
+    Keys include the corpus version, so re-ingesting a corpus at a new commit
+    makes its cached results miss; `get` drops them when it sees the stale
+    version. `max_entries` of 0 disables caching.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = config.retrieval_cache_size,
+        ttl_s: float = config.retrieval_cache_ttl_s,
+    ):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        # key -> (version, expires_at, value)
+        self._entries: OrderedDict[Hashable, tuple[Optional[str], float, Any]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(
+        corpus_name: str, query: str, top_k: int, filters: Hashable = None
+    ) -> tuple:
+        return (corpus_name, normalize_query(query), top_k, filters)
+
+    def get(self, key: tuple, version: Optional[str]) -> Optional[Any]:
+        """A copy of the cached value, or None on a miss."""
+        if self.max_entries <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                cached_version, expires_at, value = entry
+                if cached_version != version:
+                    del self._entries[key]
+                    self.invalidations += 1
+                elif expires_at <= time.monotonic():
+                    del self._entries[key]
+                    self.expirations += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    logger.debug(
+                        "Retrieval cache hit", corpus_name=key[0], hits=self.hits
+                    )
+                    return copy.deepcopy(value)
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple, version: Optional[str], value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (
+                version,
+                time.monotonic() + self.ttl_s,
+                copy.deepcopy(value),
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_corpus(self, corpus_name: str) -> int:
+        """Drops every cached result of a corpus; returns how many."""
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == corpus_name]
+            for key in keys:
+                del self._entries[key]
+            self.invalidations += len(keys)
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+retrieval_cache = RetrievalCache()
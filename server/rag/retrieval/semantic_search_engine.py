@@ -1,16 +1,33 @@
 import argparse
-from typing import Any, Dict, List, Optional
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Literal, Optional
 
-import vertexai
 from google.cloud import aiplatform_v1beta1
 from vertexai.preview import rag
 from vertexai.preview.rag.utils import resources
 
+from rag.chunk_index import ChunkIndex, get_chunk_index
+from rag.clients import init_vertexai
 from rag.config import config
+from rag.retrieval.cache import corpus_version, normalize_query, retrieval_cache
 from logger import structlog
 
 logger = structlog.get_logger()
 
+# gs://bucket/prefix/path/to/file.py__lines_10-30.txt
+CHUNK_OBJECT_RE = re.compile(r"(.+?)(__lines_(\d+)-(\d+))?\.txt$")
+# Start of a record in a JSONL chunk shard, see rag.ingestion.shards
+SHARD_RECORD_RE = re.compile(
+    r'"path": "((?:[^"\\]|\\.)*)", "start_line": (\d+), "end_line": (\d+)'
+)
+# Queries that are code rather than prose: a single token with code syntax in
+# it, such as `trackEvent`, `track_event`, `analytics.track(` or `$emit`.
+CODE_QUERY_RE = re.compile(r"^\s*(?=\S*(?:[._$(:\[]|[a-z][A-Z]))\S+\s*$")
+
 
 def retrieve_contexts_from_corpus(
     rag_corpus_name: str,
@@ -22,7 +39,14 @@ def retrieve_contexts_from_corpus(
 ) -> Optional[List[dict[str, Any]]]:
     """
     Retrieves relevant contexts (chunks) from a specified RAG corpus based on a query.
+    Results are served from `retrieval_cache` while the corpus is not re-ingested.
     """
+    cache_key = retrieval_cache.key(rag_corpus_name, query_text, top_k_results)
+    version = corpus_version(rag_corpus_name)
+    cached = retrieval_cache.get(cache_key, version)
+    if cached is not None:
+        return cached
+
     logger.info(
         "Retrieving contexts from RAG corpus",
         rag_corpus_name=rag_corpus_name,
@@ -30,7 +54,7 @@ def retrieve_contexts_from_corpus(
         project_id=project_id,
         location=location,
     )
-    vertexai.init(project=project_id, location=location)
+    init_vertexai(project_id, location)
 
     try:
         if vector_distance_threshold_val is not None:
@@ -64,6 +88,7 @@ def retrieve_contexts_from_corpus(
                     }
                 )
         logger.info(f"Retrieved {len(contexts)} contexts for query.")
+        retrieval_cache.put(cache_key, version, contexts)
         return contexts
     except Exception as e:
         logger.error(
@@ -77,47 +102,194 @@ class VertexAISemanticSearch:
     Semantic code search using Vertex AI RAG service.
     Ingestion and chunking are handled by the pipeline in rag_corpus.py.
     This class provides a search interface over an existing RAG corpus.
+
+    `backend` "lexical" searches the chunk index built by ingestion instead
+    (identifier terms and substrings, no embedding calls). "auto" does so for
+    queries that are a single code token, such as `analytics.track(`, and
+    falls back to Vertex AI when the index has no match.
     """
 
-    def __init__(self, rag_corpus_name: str, project_id: str, location: str):
+    def __init__(
+        self,
+        rag_corpus_name: str,
+        project_id: str,
+        location: str,
+        chunk_index: Optional[ChunkIndex] = None,
+        backend: Literal["vertex", "lexical", "auto"] = config.search_backend,
+    ):
         self.rag_corpus_name = rag_corpus_name
         self.project_id = project_id
         self.location = location
+        self.backend = backend
+        # Written by ingestion; results it does not know are parsed instead.
+        self.chunk_index = chunk_index or get_chunk_index(
+            config.chunk_index_path, create=False
+        )
 
     def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
         """
         Search the RAG corpus for code chunks semantically similar to the query.
-        Returns a list of dicts with 'source_uri' and 'text'.
-        If you encoded metadata (e.g., file path, start/end lines) in the GCS file name or chunk text,
-        you can parse it here.
+        Returns a list of dicts with 'source_uri' and 'text', plus the file path,
+        line range and (when known) symbol and commit of each chunk. These are
+        looked up in the chunk index in one batch; results missing from it fall
+        back to parsing the source URI.
+        """
+        results = self._retrieve(query, top_k)
+        self._hydrate(results)
+        return results
+
+    def search_many(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        max_concurrency: int = config.multi_query_max_concurrency,
+    ) -> List[Dict[str, Any]]:
+        """
+        Runs several searches at once, at most `max_concurrency` in flight, so
+        a batch of related lookups takes about as long as the slowest one.
+
+        Returns one `{"query", "results"}` group per distinct query, in order.
+        A chunk found by several queries is returned once, in the group of the
+        query it is closest to, and its `queries` lists every query that found
+        it. All results are hydrated with a single chunk index lookup.
         """
-        results = retrieve_contexts_from_corpus(
+        by_normalized: Dict[str, str] = {}
+        for query in queries:
+            by_normalized.setdefault(normalize_query(query), query)
+        distinct = [query for key, query in by_normalized.items() if key]
+        if not distinct:
+            return []
+        with ThreadPoolExecutor(
+            max_workers=max(1, min(max_concurrency, len(distinct))),
+            thread_name_prefix="multi-query",
+        ) as executor:
+            per_query = list(
+                executor.map(lambda query: self._retrieve(query, top_k), distinct)
+            )
+        self._hydrate([r for results in per_query for r in results])
+
+        best: Dict[tuple, tuple[int, Dict[str, Any]]] = {}
+        for i, results in enumerate(per_query):
+            for r in results:
+                key = self._chunk_key(r)
+                if key not in best:
+                    best[key] = (i, r)
+                    r["queries"] = []
+                elif self._closer(r, best[key][1]):
+                    r["queries"] = best[key][1]["queries"]
+                    best[key] = (i, r)
+                best[key][1]["queries"].append(distinct[i])
+        groups = [{"query": query, "results": []} for query in distinct]
+        for i, results in enumerate(per_query):
+            for r in results:
+                j, chosen = best[self._chunk_key(r)]
+                if j == i and chosen is r:
+                    groups[i]["results"].append(r)
+        logger.info(
+            "Multi-query search",
+            queries=len(distinct),
+            results=sum(len(results) for results in per_query),
+            distinct_chunks=len(best),
+        )
+        return groups
+
+    def _retrieve(self, query: str, top_k: int) -> List[Dict[str, Any]]:
+        if self.backend == "lexical" or (
+            self.backend == "auto" and CODE_QUERY_RE.match(query)
+        ):
+            results = self._lexical_search(query, top_k)
+            if results or self.backend == "lexical":
+                return results
+        return (
+            retrieve_contexts_from_corpus(
+                rag_corpus_name=self.rag_corpus_name,
+                query_text=query,
+                project_id=self.project_id,
+                location=self.location,
+                top_k_results=top_k,
+            )
+            or []
+        )
+
+    def _lexical_search(self, query: str, top_k: int) -> List[Dict[str, Any]]:
+        if self.chunk_index is None:
+            return []
+        gcs_folder_prefix = self.chunk_index.corpus_prefix(self.rag_corpus_name)
+        if gcs_folder_prefix is None:
+            return []
+        started = time.perf_counter()
+        results = self.chunk_index.lexical_search(gcs_folder_prefix, query, top_k)
+        logger.info(
+            "Lexical search",
             rag_corpus_name=self.rag_corpus_name,
-            query_text=query,
-            project_id=self.project_id,
-            location=self.location,
-            top_k_results=top_k,
+            query=query,
+            results=len(results),
+            elapsed_ms=round((time.perf_counter() - started) * 1000, 1),
         )
-        # Optionally parse metadata from source_uri or text
-        if results:
-            for r in results:
-                r.update(self._parse_metadata_from_source_uri(r["source_uri"]))
-        return results or []
+        return results
+
+    def _hydrate(self, results: List[Dict[str, Any]]) -> None:
+        # Lexical results come with their metadata.
+        results = [r for r in results if "file_path" not in r]
+        if not results:
+            return
+        indexed = (
+            self.chunk_index.lookup(r["source_uri"] for r in results)
+            if self.chunk_index is not None
+            else {}
+        )
+        for r in results:
+            metadata = indexed.get(r["source_uri"])
+            r.update(
+                metadata
+                or self._parse_metadata_from_source_uri(r["source_uri"], r["text"])
+            )
 
     @staticmethod
-    def _parse_metadata_from_source_uri(source_uri: str) -> Dict[str, Any]:
-        """
-        Example: Parse file path and (optionally) line numbers from the GCS source_uri.
-        You must encode this info during ingestion (e.g., in the file name or folder structure).
+    def _chunk_key(result: Dict[str, Any]) -> tuple:
+        # Shards hold several chunks under one URI, told apart by line range.
+        return (
+            result["source_uri"],
+            result.get("file_path"),
+            result.get("start_line"),
+            result.get("end_line"),
+        )
+
+    @staticmethod
+    def _closer(result: Dict[str, Any], other: Dict[str, Any]) -> bool:
+        distance = result.get("distance")
+        other_distance = other.get("distance")
+        if distance is None or other_distance is None:
+            return False
+        return distance < other_distance
+
+    @staticmethod
+    def _parse_metadata_from_source_uri(
+        source_uri: str, text: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
-        # Example: gs://bucket/prefix/path/to/file.py__lines_10-30.txt
-        import os
-        import re
+        Parses file path and line numbers of a result.
 
+        Chunks uploaded as one object each encode them in the object name,
+        e.g. gs://bucket/prefix/path/to/file.py__lines_10-30.txt. Chunks packed
+        into JSONL shards (gs://bucket/prefix/shards/07-000.jsonl) carry them in
+        each record, so they are read from the first record start in the
+        retrieved text.
+        """
         uri_path = source_uri.split("/", 3)[-1]  # Remove gs://bucket/
         file_info = os.path.basename(uri_path)
+        if file_info.endswith(".jsonl"):
+            m = SHARD_RECORD_RE.search(text or "")
+            if m:
+                return {
+                    "file_path": json.loads(f'"{m.group(1)}"'),
+                    "start_line": int(m.group(2)),
+                    "end_line": int(m.group(3)),
+                }
+            return {"file_path": file_info}
+
         # Try to extract lines info if present
-        m = re.match(r"(.+?)(__lines_(\d+)-(\d+))?\.txt$", file_info)
+        m = CHUNK_OBJECT_RE.match(file_info)
         if m:
             file_path = m.group(1)
             start_line = int(m.group(3)) if m.group(3) else None
@@ -1,5 +1,14 @@
-from rag.tools.add_corpus import add_corpus_from_github, add_corpus_from_local_repo  # noqa: F401
+from rag.tools.add_corpus import (  # noqa: F401
+    add_corpora_from_github,
+    add_corpus_from_github,
+    add_corpus_from_local_repo,
+)
 from rag.tools.define_pattern import define_pattern  # noqa: F401
+from rag.tools.ingestion_status import get_ingestion_status  # noqa: F401
 from rag.tools.list_corpora import list_corpora  # noqa: F401
 from rag.tools.list_files import list_files  # noqa: F401
-from rag.tools.rag_query import rag_query, rag_query_with_semantic_search  # noqa: F401
+from rag.tools.rag_query import (  # noqa: F401
+    rag_multi_query,
+    rag_query,
+    rag_query_with_semantic_search,
+)
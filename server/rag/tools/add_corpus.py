@@ -4,12 +4,23 @@ import structlog
 from typing import Optional
 
 from rag.ingestion.rag_corpus import (
+    get_gcs_bucket,
+    github_registry_key,
     ingest_local_repo_to_rag_corpus,
     ingest_repository_to_rag_corpus,
 )
 from rag.ingestion.config import (
     RAGIngestConfig,
 )  # For default project/location
+from rag.ingestion.batch import (
+    BatchProgress,
+    RepoSpec,
+    ingest_repositories,
+    parse_repo_spec,
+)
+from rag.ingestion.operations import ingestion_operations
+from rag.ingestion.registry import CorpusRegistry
+from rag.tools.utils import corpus_catalog
 
 logger = structlog.get_logger(__name__)
 config = RAGIngestConfig()  # Load config for default project_id and location if needed
@@ -20,18 +31,31 @@ def add_corpus_from_github(
     corpus_display_name: Optional[str] = None,
     project_id: Optional[str] = None,
     location: Optional[str] = None,
+    incremental: bool = False,
+    branch: Optional[str] = None,
+    wait: bool = False,
 ) -> dict:
     """
     CLI tool to add a RAG corpus from a GitHub repository using the ingestion pipeline.
 
+    Ingestion takes minutes, so by default it runs in the background and a
+    `pending` result with an `operation_id` is returned right away; poll it
+    with `get_ingestion_status`.
+
     Args:
         github_url (str): The URL of the GitHub repository.
         corpus_display_name (Optional[str]): Optional display name for the RAG corpus.
         project_id (Optional[str]): Google Cloud Project ID. Defaults to config.
         location (Optional[str]): Google Cloud Location. Defaults to config.
+        incremental (bool): Only re-ingest files changed since the last ingestion
+            of this repository, reusing its corpus.
+        branch (Optional[str]): Branch to ingest instead of the default branch.
+            Each branch gets its own corpus.
+        wait (bool): Run the ingestion to completion before returning.
 
     Returns:
-        dict: A dictionary containing the status, message, and corpus details if successful.
+        dict: A dictionary containing the status, message, and corpus details if successful,
+            or the `operation_id` of the background ingestion.
     """
     logger.info(
         "Adding corpus from GitHub via tool",
@@ -39,6 +63,8 @@ def add_corpus_from_github(
         corpus_display_name=corpus_display_name,
         project_id=project_id,
         location=location,
+        incremental=incremental,
+        branch=branch,
     )
 
     # Use provided project_id/location or fallback to config defaults
@@ -52,17 +78,64 @@ def add_corpus_from_github(
             "message": "Invalid GitHub URL. Must start with https://github.com/",
         }
 
+    if not wait:
+        operation = ingestion_operations.submit(
+            f"{github_url}@{branch}" if branch else github_url,
+            _ingest_from_github,
+            github_url,
+            corpus_display_name,
+            effective_project_id,
+            effective_location,
+            incremental,
+            branch,
+        )
+        return _pending_result(operation)
+    return _ingest_from_github(
+        github_url,
+        corpus_display_name,
+        effective_project_id,
+        effective_location,
+        incremental,
+        branch,
+    )
+
+
+def _pending_result(operation) -> dict:
+    return {
+        "status": "pending",
+        "message": "Ingestion is running in the background. Poll get_ingestion_status with the operation_id.",
+        "operation_id": operation.operation_id,
+        "state": operation.state,
+    }
+
+
+def _ingest_from_github(
+    github_url: str,
+    corpus_display_name: Optional[str],
+    effective_project_id: str,
+    effective_location: str,
+    incremental: bool,
+    branch: Optional[str],
+) -> dict:
     try:
+        # Only a corpus that existed before this ingestion can be up to date.
+        previous_entry = CorpusRegistry(
+            get_gcs_bucket(project_id=effective_project_id)
+        ).get(github_registry_key(github_url, branch))
         corpus_object, import_response = ingest_repository_to_rag_corpus(
             github_url=github_url,
             rag_corpus_display_name=corpus_display_name,
             project_id=effective_project_id,
             location=effective_location,
+            incremental=incremental,
+            branch=branch,
         )
+        # The corpus may be new; list corpora again on the next lookup.
+        corpus_catalog.invalidate()
 
         if (
             corpus_object
-            and import_response
+            and import_response is not None
             and hasattr(corpus_object, "name")
             and import_response.imported_rag_files_count > 0
         ):
@@ -81,9 +154,31 @@ def add_corpus_from_github(
                 "imported_files_count": import_response.imported_rag_files_count,
                 "failed_files_count": import_response.failed_rag_files_count,
             }
+        elif (
+            previous_entry is not None
+            and corpus_object
+            and previous_entry.corpus_name == getattr(corpus_object, "name", None)
+            and import_response is not None
+            and hasattr(corpus_object, "name")
+            and import_response.imported_rag_files_count == 0
+            and import_response.failed_rag_files_count == 0
+        ):
+            logger.info(
+                "RAG corpus is up to date; no new or changed files needed importing.",
+                corpus_name=corpus_object.name,
+                corpus_display_name=corpus_object.display_name,
+            )
+            return {
+                "status": "up_to_date",
+                "message": "RAG corpus is up to date. No new or changed files needed importing.",
+                "corpus_name": corpus_object.name,
+                "corpus_display_name": corpus_object.display_name,
+                "imported_files_count": 0,
+                "failed_files_count": 0,
+            }
         elif (
             corpus_object
-            and import_response
+            and import_response is not None
             and hasattr(corpus_object, "name")
             and import_response.imported_rag_files_count == 0
             and import_response.failed_rag_files_count == 0
@@ -122,14 +217,86 @@ def add_corpus_from_github(
         }
 
 
+def add_corpora_from_github(
+    github_urls: list[str],
+    incremental: bool = False,
+    wait: bool = False,
+) -> dict:
+    """
+    CLI tool to add one RAG corpus per repository for a list of GitHub repositories.
+
+    The repositories are ingested in parallel, sharing global limits on clones,
+    chunking CPU and Vertex AI API calls. By default the batch runs in the
+    background and a `pending` result with an `operation_id` is returned right
+    away; `get_ingestion_status` reports progress per repository.
+
+    Args:
+        github_urls (list[str]): Repository URLs (or owner/name), optionally
+            with @branch appended.
+        incremental (bool): Only re-ingest files changed since each repository's
+            last ingestion.
+        wait (bool): Run the whole batch before returning.
+
+    Returns:
+        dict: The status and the `operation_id` of the batch, or its summary with
+            the outcome of each repository when `wait` is set.
+    """
+    logger.info(
+        "Adding corpora from GitHub via tool",
+        repos=len(github_urls),
+        incremental=incremental,
+    )
+    try:
+        specs = list(
+            {spec.label: spec for spec in map(parse_repo_spec, github_urls)}.values()
+        )
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    if not specs:
+        return {"status": "error", "message": "No repositories given."}
+
+    progress = BatchProgress(specs)
+    if not wait:
+        operation = ingestion_operations.submit(
+            "batch:" + ",".join(sorted(spec.label for spec in specs)),
+            _ingest_batch,
+            specs,
+            incremental,
+            progress,
+            progress=progress.snapshot,
+        )
+        return _pending_result(operation)
+    return _ingest_batch(specs, incremental, progress)
+
+
+def _ingest_batch(
+    specs: list[RepoSpec], incremental: bool, progress: BatchProgress
+) -> dict:
+    summary = ingest_repositories(specs, incremental=incremental, progress=progress)
+    corpus_catalog.invalidate()
+    if summary["failed"] == summary["total"]:
+        status = "error"
+    elif summary["failed"]:
+        status = "warning"
+    else:
+        status = "success"
+    return {
+        "status": status,
+        "message": f"Ingested {summary['succeeded']} of {summary['total']} repositories.",
+        **summary,
+    }
+
+
 def add_corpus_from_local_repo(
     local_repo_path: str,
     corpus_display_name: Optional[str] = None,
     project_id: Optional[str] = None,
     location: Optional[str] = None,
+    wait: bool = False,
 ) -> dict:
     """
     CLI tool to add a RAG corpus from a local repository using the ingestion pipeline.
+    Like `add_corpus_from_github`, runs in the background unless `wait` is set.
     """
     logger.info(
         "Adding corpus from local repository via tool",
@@ -138,12 +305,34 @@ def add_corpus_from_local_repo(
     if isinstance(local_repo_path, str):
         local_repo_path = Path(local_repo_path)
 
+    if not wait:
+        operation = ingestion_operations.submit(
+            str(local_repo_path.resolve()),
+            _ingest_from_local_repo,
+            local_repo_path,
+            corpus_display_name,
+            project_id,
+            location,
+        )
+        return _pending_result(operation)
+    return _ingest_from_local_repo(
+        local_repo_path, corpus_display_name, project_id, location
+    )
+
+
+def _ingest_from_local_repo(
+    local_repo_path: Path,
+    corpus_display_name: Optional[str],
+    project_id: Optional[str],
+    location: Optional[str],
+) -> dict:
     corpus_object, import_response = ingest_local_repo_to_rag_corpus(
         local_repo_path=local_repo_path,
         rag_corpus_display_name=corpus_display_name,
         project_id=project_id,
         location=location,
     )
+    corpus_catalog.invalidate()
 
     if (
         corpus_object
@@ -165,6 +354,25 @@ def add_corpus_from_local_repo(
             "corpus_name": corpus_object.name,
             "corpus_display_name": corpus_object.display_name,
         }
+    elif (
+        config.reuse_corpora
+        and corpus_object
+        and import_response is not None
+        and hasattr(corpus_object, "name")
+        and import_response.imported_rag_files_count == 0
+        and import_response.failed_rag_files_count == 0
+    ):
+        logger.info(
+            "RAG corpus is up to date; no new or changed files needed importing.",
+            corpus_name=corpus_object.name,
+            corpus_display_name=corpus_object.display_name,
+        )
+        return {
+            "status": "up_to_date",
+            "message": "RAG corpus is up to date. No new or changed files needed importing.",
+            "corpus_name": corpus_object.name,
+            "corpus_display_name": corpus_object.display_name,
+        }
     else:
         logger.error(
             "Failed to create RAG corpus or import files.",
@@ -201,6 +409,16 @@ if __name__ == "__main__":
         type=str,
         help=f"Google Cloud Location for Vertex AI. (default: {config.google_config.location})",
     )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only re-ingest files changed since the last ingestion of this repository.",
+    )
+    parser.add_argument(
+        "--branch",
+        type=str,
+        help="Branch to ingest instead of the default branch.",
+    )
 
     args = parser.parse_args()
 
@@ -209,6 +427,9 @@ if __name__ == "__main__":
         corpus_display_name=args.name,
         project_id=args.project_id,
         location=args.location,
+        incremental=args.incremental,
+        branch=args.branch,
+        wait=True,
     )
 
     print("Operation Result:")
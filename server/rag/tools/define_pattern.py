@@ -1,7 +1,7 @@
 from google.adk.tools.tool_context import ToolContext
-from google.genai import Client
 from pydantic import BaseModel
 
+from rag.clients import genai_client
 from rag.config import config
 
 
@@ -16,10 +16,8 @@ def define_pattern(
     """
     Define a pattern for tracking.
     """
-    client = Client(
-        vertexai=True,
-        project=config.google_config.project_id,
-        location=config.google_config.location,
+    client = genai_client(
+        config.google_config.project_id, config.google_config.location
     )
     response = client.models.generate_content(
         model="gemini-2.0-flash-001",
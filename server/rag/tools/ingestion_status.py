@@ -0,0 +1,53 @@
+"""
+Tool for polling background ingestions started by the add_corpus tools.
+"""
+
+from typing import Optional
+
+from pydantic import BaseModel
+
+from rag.ingestion.operations import IngestionOperation, ingestion_operations
+
+
+class IngestionStatusOut(BaseModel):
+    status: str
+    message: str
+    operations: list[IngestionOperation]
+
+
+def get_ingestion_status(operation_id: Optional[str] = None) -> dict:
+    """
+    Get the status of a background ingestion, or of all recent ingestions.
+
+    Args:
+        operation_id (Optional[str]): The operation_id returned by add_corpus_from_github
+            or add_corpus_from_local_repo. Omit it to list all recent ingestions.
+
+    Returns:
+        dict: The status and the matching operations, each containing:
+            - operation_id: The handle of the ingestion
+            - source: The repository being ingested
+            - state: pending, running, succeeded or failed
+            - result: The result of the ingestion (corpus name, imported files) once finished
+            - error: The error, if the ingestion failed unexpectedly
+    """
+    if operation_id is None:
+        operations = ingestion_operations.list()
+        return IngestionStatusOut(
+            status="success",
+            message=f"Found {len(operations)} recent ingestions",
+            operations=operations,
+        ).model_dump(mode="json")
+
+    operation = ingestion_operations.get(operation_id)
+    if operation is None:
+        return IngestionStatusOut(
+            status="error",
+            message=f"Unknown or expired ingestion operation: {operation_id}",
+            operations=[],
+        ).model_dump(mode="json")
+    return IngestionStatusOut(
+        status="success",
+        message=f"Ingestion is {operation.state}",
+        operations=[operation],
+    ).model_dump(mode="json")
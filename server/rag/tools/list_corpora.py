@@ -5,7 +5,8 @@ Tool for listing all available Vertex AI RAG corpora.
 from datetime import datetime
 
 from pydantic import BaseModel
-from vertexai import rag
+
+from rag.tools.utils import corpus_catalog
 
 
 class Corpus(BaseModel):
@@ -33,8 +34,8 @@ def list_corpora() -> dict:
             - update_time: When the corpus was last updated
     """
     try:
-        # Get the list of corpora
-        corpora = rag.list_corpora()
+        # Served from the shared catalog, refreshed in the background
+        corpora = corpus_catalog.corpora()
 
         # Process corpus information into a more usable format
         corpus_info = []
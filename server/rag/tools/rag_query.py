@@ -9,6 +9,7 @@ from vertexai import rag
 
 from rag.config import config
 from logger import structlog
+from rag.retrieval.cache import corpus_version, retrieval_cache
 from rag.retrieval.semantic_search_engine import VertexAISemanticSearch
 
 from .utils import check_corpus_exists, get_corpus_resource_name
@@ -32,6 +33,31 @@ class RagQueryOut(BaseModel):
     results_count: int
 
 
+class RagChunkResult(BaseModel):
+    source_uri: str
+    file_path: str
+    start_line: Optional[int] = None
+    end_line: Optional[int] = None
+    symbol: Optional[str] = None
+    text: str
+    distance: Optional[float] = None
+    # Every query of the batch that found this chunk.
+    queries: list[str]
+
+
+class RagQueryGroup(BaseModel):
+    query: str
+    results: list[RagChunkResult]
+
+
+class RagMultiQueryOut(BaseModel):
+    status: str
+    message: str
+    corpus_name: str
+    groups: list[RagQueryGroup]
+    results_count: int
+
+
 def rag_query(
     corpus_name: str,
     query: str,
@@ -63,41 +89,17 @@ def rag_query(
         # Get the corpus resource name
         corpus_resource_name = get_corpus_resource_name(corpus_name)
 
-        # Configure retrieval parameters
-        rag_retrieval_config = rag.RagRetrievalConfig(
-            top_k=config.top_k,
-            filter=rag.Filter(vector_distance_threshold=config.distance_threshold),
-        )
-
-        logger.info("Performing retrieval query...")
-        response = rag.retrieval_query(
-            rag_resources=[
-                rag.RagResource(
-                    rag_corpus=corpus_resource_name,
-                    rag_file_ids=file_names,
-                )
-            ],
-            text=query,
-            rag_retrieval_config=rag_retrieval_config,
+        cache_key = retrieval_cache.key(
+            corpus_resource_name,
+            query,
+            config.top_k,
+            (tuple(sorted(file_names or ())), config.distance_threshold),
         )
-
-        # Process the response into a more usable format
-        results = []
-        if hasattr(response, "contexts") and response.contexts:
-            for ctx_group in response.contexts.contexts:
-                result = RagQueryResult(
-                    source_uri=(
-                        ctx_group.source_uri if hasattr(ctx_group, "source_uri") else ""
-                    ),
-                    source_name=(
-                        ctx_group.source_display_name
-                        if hasattr(ctx_group, "source_display_name")
-                        else ""
-                    ),
-                    text=(ctx_group.text if hasattr(ctx_group, "text") else ""),
-                    score=(ctx_group.score if hasattr(ctx_group, "score") else 0.0),
-                )
-                results.append(result)
+        version = corpus_version(corpus_resource_name)
+        results = retrieval_cache.get(cache_key, version)
+        if results is None:
+            results = _retrieve(corpus_resource_name, query, file_names)
+            retrieval_cache.put(cache_key, version, results)
 
         # If we didn't find any results
         if not results:
@@ -132,6 +134,47 @@ def rag_query(
         ).model_dump(mode="json")
 
 
+def _retrieve(
+    corpus_resource_name: str, query: str, file_names: Optional[list[str]]
+) -> list[RagQueryResult]:
+    # Configure retrieval parameters
+    rag_retrieval_config = rag.RagRetrievalConfig(
+        top_k=config.top_k,
+        filter=rag.Filter(vector_distance_threshold=config.distance_threshold),
+    )
+
+    logger.info("Performing retrieval query...")
+    response = rag.retrieval_query(
+        rag_resources=[
+            rag.RagResource(
+                rag_corpus=corpus_resource_name,
+                rag_file_ids=file_names,
+            )
+        ],
+        text=query,
+        rag_retrieval_config=rag_retrieval_config,
+    )
+
+    # Process the response into a more usable format
+    results = []
+    if hasattr(response, "contexts") and response.contexts:
+        for ctx_group in response.contexts.contexts:
+            result = RagQueryResult(
+                source_uri=(
+                    ctx_group.source_uri if hasattr(ctx_group, "source_uri") else ""
+                ),
+                source_name=(
+                    ctx_group.source_display_name
+                    if hasattr(ctx_group, "source_display_name")
+                    else ""
+                ),
+                text=(ctx_group.text if hasattr(ctx_group, "text") else ""),
+                score=(ctx_group.score if hasattr(ctx_group, "score") else 0.0),
+            )
+            results.append(result)
+    return results
+
+
 def rag_query_with_semantic_search(
     corpus_name: str,
     query: str,
@@ -167,3 +210,65 @@ def rag_query_with_semantic_search(
         error_msg = f"Error querying corpus: {str(e)}"
         logger.error(error_msg)
         return []
+
+
+def rag_multi_query(
+    corpus_name: str,
+    queries: list[str],
+    tool_context: ToolContext,
+) -> dict:
+    """
+    Query a Vertex AI RAG corpus with several related questions at once, e.g.
+    "where is mixpanel initialized" and "where are track calls". Prefer this
+    over several rag_query calls: the queries run concurrently.
+
+    Args:
+        corpus_name (str): The name of the corpus to query.
+                          Preferably use the resource_name from list_corpora results.
+        queries (list[str]): The text queries to search for in the corpus
+        tool_context (ToolContext): The tool context
+    Returns:
+        dict: The results grouped per query, and status. A chunk matching
+              several queries is listed once, with all of them in its `queries`.
+    """
+    try:
+        if not check_corpus_exists(corpus_name, tool_context):
+            return {
+                "status": "error",
+                "message": f"Corpus '{corpus_name}' does not exist. Please create it first using the create_corpus tool.",
+                "queries": queries,
+                "corpus_name": corpus_name,
+            }
+
+        corpus_resource_name = get_corpus_resource_name(corpus_name)
+
+        semantic_search_engine = VertexAISemanticSearch(
+            corpus_resource_name,
+            config.google_config.project_id,
+            config.google_config.location,
+        )
+        groups = semantic_search_engine.search_many(queries, top_k=config.top_k)
+        results_count = sum(len(group["results"]) for group in groups)
+
+        return RagMultiQueryOut(
+            status="success" if results_count else "warning",
+            message=(
+                f"Successfully queried corpus '{corpus_name}' with {len(groups)} queries"
+                if results_count
+                else f"No results found in corpus '{corpus_name}' for queries: {queries}"
+            ),
+            corpus_name=corpus_name,
+            groups=groups,
+            results_count=results_count,
+        ).model_dump(mode="json")
+
+    except Exception as e:
+        error_msg = f"Error querying corpus: {str(e)}"
+        logger.error(error_msg)
+        return RagMultiQueryOut(
+            status="error",
+            message=error_msg,
+            corpus_name=corpus_name,
+            groups=[],
+            results_count=0,
+        ).model_dump(mode="json")
@@ -3,6 +3,9 @@ Utility functions for the RAG tools.
 """
 
 import re
+import threading
+import time
+from typing import Any, Optional
 
 from google.adk.tools.tool_context import ToolContext
 from vertexai import rag
@@ -12,6 +15,117 @@ from logger import structlog
 
 logger = structlog.get_logger()
 
+CORPUS_RESOURCE_NAME_RE = re.compile(
+    r"^projects/[^/]+/locations/[^/]+/ragCorpora/[^/]+$"
+)
+
+
+class CorpusCatalog:
+    """
+    Process-wide view of the available corpora, shared by every session, so
+    resolving and checking a corpus does not list all corpora each time.
+
+    The listing is refreshed in the background once it is older than
+    `ttl_s` (callers keep getting the previous one meanwhile), and
+    synchronously when a name is not found, at most once every
+    `miss_refresh_interval_s`, so a corpus created since the last refresh is
+    still found.
+    """
+
+    def __init__(
+        self,
+        ttl_s: float = config.corpus_catalog_ttl_s,
+        miss_refresh_interval_s: float = config.corpus_catalog_miss_refresh_s,
+    ):
+        self.ttl_s = ttl_s
+        self.miss_refresh_interval_s = miss_refresh_interval_s
+        self._corpora: dict[str, Any] = {}
+        self._by_display_name: dict[str, str] = {}
+        self._refreshed_at: Optional[float] = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def refresh(self) -> None:
+        """Lists the corpora now."""
+        with self._refresh_lock:
+            corpora = list(rag.list_corpora())
+            with self._lock:
+                self._corpora = {corpus.name: corpus for corpus in corpora}
+                self._by_display_name = {
+                    corpus.display_name: corpus.name
+                    for corpus in reversed(corpora)
+                    if getattr(corpus, "display_name", None)
+                }
+                self._refreshed_at = time.monotonic()
+        logger.info("Refreshed corpus catalog", corpora=len(corpora))
+
+    def _refresh_in_background(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.warning(f"Error refreshing corpus catalog: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _ensure_fresh(self) -> None:
+        with self._lock:
+            refreshed_at = self._refreshed_at
+            stale = (
+                refreshed_at is not None
+                and time.monotonic() - refreshed_at > self.ttl_s
+                and not self._refreshing
+            )
+            if stale:
+                self._refreshing = True
+        if refreshed_at is None:
+            self.refresh()
+        elif stale:
+            threading.Thread(
+                target=self._refresh_in_background,
+                name="corpus-catalog-refresh",
+                daemon=True,
+            ).start()
+
+    def _refresh_on_miss(self) -> bool:
+        with self._lock:
+            recent = (
+                self._refreshed_at is not None
+                and time.monotonic() - self._refreshed_at < self.miss_refresh_interval_s
+            )
+        if recent:
+            return False
+        self.refresh()
+        return True
+
+    def corpora(self) -> list[Any]:
+        self._ensure_fresh()
+        with self._lock:
+            return list(self._corpora.values())
+
+    def _lookup(self, corpus_name: str) -> Optional[str]:
+        with self._lock:
+            if corpus_name in self._corpora:
+                return corpus_name
+            return self._by_display_name.get(corpus_name)
+
+    def resolve(self, corpus_name: str) -> Optional[str]:
+        """Resource name of an existing corpus, given its resource or display name."""
+        self._ensure_fresh()
+        resource_name = self._lookup(corpus_name)
+        if resource_name is None and self._refresh_on_miss():
+            resource_name = self._lookup(corpus_name)
+        return resource_name
+
+    def invalidate(self) -> None:
+        """Forces the next lookup to list the corpora again."""
+        with self._lock:
+            self._refreshed_at = None
+
+
+corpus_catalog = CorpusCatalog()
+
 
 def get_corpus_resource_name(corpus_name: str) -> str:
     """
@@ -27,16 +141,14 @@ def get_corpus_resource_name(corpus_name: str) -> str:
     logger.info(f"Getting resource name for corpus: {corpus_name}")
 
     # If it's already a full resource name with the projects/locations/ragCorpora format
-    if re.match(r"^projects/[^/]+/locations/[^/]+/ragCorpora/[^/]+$", corpus_name):
+    if CORPUS_RESOURCE_NAME_RE.match(corpus_name):
         return corpus_name
 
     # Check if this is a display name of an existing corpus
     try:
-        # List all corpora and check if there's a match with the display name
-        corpora = rag.list_corpora()
-        for corpus in corpora:
-            if hasattr(corpus, "display_name") and corpus.display_name == corpus_name:
-                return corpus.name
+        resource_name = corpus_catalog.resolve(corpus_name)
+        if resource_name is not None:
+            return resource_name
     except Exception as e:
         logger.warning(f"Error when checking for corpus display name: {str(e)}")
         # If we can't check, continue with the default behavior
@@ -67,29 +179,13 @@ def check_corpus_exists(corpus_name: str, tool_context: ToolContext) -> bool:
     Returns:
         bool: True if the corpus exists, False otherwise
     """
-    # Check state first if tool_context is provided
-    if tool_context.state.get(f"corpus_exists_{corpus_name}"):
-        return True
-
     try:
-        # Get full resource name
-        corpus_resource_name = get_corpus_resource_name(corpus_name)
-
-        # List all corpora and check if this one exists
-        corpora = rag.list_corpora()
-        for corpus in corpora:
-            if (
-                corpus.name == corpus_resource_name
-                or corpus.display_name == corpus_name
-            ):
-                # Update state
-                tool_context.state[f"corpus_exists_{corpus_name}"] = True
-                # Also set this as the current corpus if no current corpus is set
-                if not tool_context.state.get("current_corpus"):
-                    tool_context.state["current_corpus"] = corpus_name
-                return True
-
-        return False
+        if corpus_catalog.resolve(corpus_name) is None:
+            return False
+        # Also set this as the current corpus if no current corpus is set
+        if not tool_context.state.get("current_corpus"):
+            tool_context.state["current_corpus"] = corpus_name
+        return True
     except Exception as e:
         logger.error(f"Error checking if corpus exists: {str(e)}")
         # If we can't check, assume it doesn't exist
@@ -12,7 +12,7 @@ from gotrue.types import User
 from pydantic import BaseModel, Field
 from structlog import get_logger
 from utils.db_session import get_db
-from utils.github import aclone_repo
+from utils.github import aclone_repo, arelease_repo
 
 from .deps import get_current_user
 
@@ -136,6 +136,14 @@ async def run(
     )
 
 
+async def _execute_task(task_manager, repo_path: str, context: dict, session_id: str):
+    # The worktree is only needed while the task runs.
+    try:
+        await task_manager.execute(repo_path, context, session_id)
+    finally:
+        await arelease_repo(repo_path)
+
+
 @router.post("/create-task")
 async def create_task(
     body: AgentRequest,
@@ -177,7 +185,8 @@ async def create_task(
 
     try:
         asyncio.create_task(
-            agentic_analytics_task_manager.execute(
+            _execute_task(
+                agentic_analytics_task_manager,
                 repo_path,
                 context,
                 body.session_id or session.id,
@@ -192,6 +201,7 @@ async def create_task(
         }
     except Exception as e:
         logger.error("Error creating task", error=e)
+        await arelease_repo(repo_path)
         return AgentResponse(
             message="Error creating task",
             status="error",
@@ -0,0 +1,54 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from gotrue.types import User
+from pydantic import BaseModel
+
+from routers.deps import get_current_user
+
+router = APIRouter(tags=["ingestion"])
+
+
+class IngestionCreate(BaseModel):
+    github_url: str
+    corpus_display_name: Optional[str] = None
+    branch: Optional[str] = None
+    incremental: bool = False
+
+
+# The rag package is imported in the handlers so the server starts without
+# the Vertex AI configuration it requires. Responses are IngestionOperations.
+@router.post("/operations", status_code=status.HTTP_202_ACCEPTED)
+def create_ingestion(
+    body: IngestionCreate,
+    user: User = Depends(get_current_user),
+):
+    from rag.ingestion.operations import ingestion_operations
+    from rag.tools.add_corpus import add_corpus_from_github
+
+    result = add_corpus_from_github(
+        github_url=body.github_url,
+        corpus_display_name=body.corpus_display_name,
+        incremental=body.incremental,
+        branch=body.branch,
+    )
+    if result["status"] == "error":
+        raise HTTPException(status_code=400, detail=result["message"])
+    return ingestion_operations.get(result["operation_id"])
+
+
+@router.get("/operations")
+def list_ingestions(user: User = Depends(get_current_user)):
+    from rag.ingestion.operations import ingestion_operations
+
+    return ingestion_operations.list()
+
+
+@router.get("/operations/{operation_id}")
+def get_ingestion(operation_id: str, user: User = Depends(get_current_user)):
+    from rag.ingestion.operations import ingestion_operations
+
+    operation = ingestion_operations.get(operation_id)
+    if operation is None:
+        raise HTTPException(status_code=404, detail="Ingestion operation not found")
+    return operation
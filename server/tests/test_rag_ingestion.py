@@ -0,0 +1,1107 @@
+import gzip
+import threading
+import types
+
+import pytest
+from google.api_core.exceptions import NotFound
+
+from rag.ingestion.manifest import ChunkManifest, content_hash, manifest_blob_name
+from rag.ingestion.uploader import ChunkUploader
+
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.content_encoding = None
+
+    @property
+    def md5_hash(self):
+        return content_hash(self.bucket.objects[self.name])
+
+    def download_as_text(self):
+        if self.name not in self.bucket.objects:
+            raise NotFound(self.name)
+        return self.bucket.objects[self.name]
+
+    def delete(self):
+        if self.name not in self.bucket.objects:
+            raise NotFound(self.name)
+        del self.bucket.objects[self.name]
+
+    def upload_from_string(self, data, **kwargs):
+        if isinstance(data, bytes):
+            if self.content_encoding == "gzip":
+                data = gzip.decompress(data)
+                self.bucket.gzipped.add(self.name)
+            data = data.decode("utf-8")
+        with self.bucket.lock:
+            if self.bucket.failures.get(self.name, 0) > 0:
+                self.bucket.failures[self.name] -= 1
+                raise ConnectionError("transient")
+            self.bucket.objects[self.name] = data
+            self.bucket.uploads += 1
+            self.bucket.uploaded.append(self.name)
+
+
+class FakeBucket:
+    def __init__(self, name="test-bucket"):
+        self.name = name
+        self.objects = {}
+        self.failures = {}
+        self.uploads = 0
+        self.uploaded = []
+        self.gzipped = set()
+        self.lock = threading.Lock()
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+    def list_blobs(self, prefix=""):
+        listed = []
+        for name in list(self.objects):
+            if name.startswith(prefix):
+                blob = self.blob(name)
+                if name in self.gzipped:
+                    blob.content_encoding = "gzip"
+                listed.append(blob)
+        return listed
+
+
+@pytest.fixture(autouse=True)
+def chunk_index_path(tmp_path, monkeypatch):
+    from rag.ingestion.config import config
+
+    path = tmp_path / "chunk_index.sqlite"
+    monkeypatch.setattr(config, "chunk_index_path", str(path))
+    return path
+
+
+def test_chunk_uploader_uploads_all_chunks():
+    bucket = FakeBucket()
+    with ChunkUploader(bucket, workers=4, total_files=3) as uploader:
+        for i in range(3):
+            uploader.submit_file(
+                f"file_{i}.py",
+                [
+                    (f"codes-repo/file_{i}.py__lines_{j}-{j}.txt", f"{i}:{j}")
+                    for j in range(5)
+                ],
+            )
+    assert uploader.uploaded == 15
+    assert bucket.objects["codes-repo/file_2.py__lines_4-4.txt"] == "2:4"
+
+
+def test_chunk_uploader_gzip_chunks():
+    bucket = FakeBucket()
+    with ChunkUploader(bucket, workers=1, gzip_chunks=True) as uploader:
+        uploader.submit_file("a.py", [("codes-repo/a.py__lines_1-1.txt", "a")])
+    assert bucket.objects["codes-repo/a.py__lines_1-1.txt"] == "a"
+    assert bucket.gzipped == {"codes-repo/a.py__lines_1-1.txt"}
+
+
+def test_chunk_uploader_retries_transient_errors():
+    bucket = FakeBucket()
+    bucket.failures["codes-repo/a.py__lines_1-1.txt"] = 2
+    bucket.failures["codes-repo/b.py__lines_1-1.txt"] = 5
+    with ChunkUploader(bucket, workers=2, max_retries=2, retry_backoff_s=0) as uploader:
+        uploader.submit_file("a.py", [("codes-repo/a.py__lines_1-1.txt", "a")])
+        uploader.submit_file("b.py", [("codes-repo/b.py__lines_1-1.txt", "b")])
+    assert uploader.uploaded == 1
+    assert uploader.failed == 1
+    assert "codes-repo/a.py__lines_1-1.txt" in bucket.objects
+
+
+def test_chunk_manifest_round_trip_and_stale():
+    bucket = FakeBucket()
+    previous = ChunkManifest("codes-repo")
+    previous.add("codes-repo/a.py__lines_1-5.txt", content_hash("a"))
+    previous.add("codes-repo/b.py__lines_1-5.txt", content_hash("b"))
+    previous.save(bucket)
+
+    loaded = ChunkManifest.load(bucket, "codes-repo")
+    assert loaded.chunks == previous.chunks
+    assert manifest_blob_name("codes-repo") == "codes-repo.manifest.json"
+
+    current = ChunkManifest("codes-repo")
+    current.add("codes-repo/a.py__lines_1-5.txt", content_hash("a"))
+    assert loaded.is_unchanged("codes-repo/a.py__lines_1-5.txt", content_hash("a"))
+    assert not loaded.is_unchanged("codes-repo/a.py__lines_1-5.txt", content_hash("A"))
+    assert loaded.stale(current) == ["codes-repo/b.py__lines_1-5.txt"]
+
+
+def test_chunk_manifest_falls_back_to_listing():
+    bucket = FakeBucket()
+    bucket.objects["codes-repo/a.py__lines_1-5.txt"] = "a"
+    bucket.objects["codes-other/a.py__lines_1-5.txt"] = "x"
+
+    manifest = ChunkManifest.load(bucket, "codes-repo")
+    assert manifest.chunks == {"codes-repo/a.py__lines_1-5.txt": content_hash("a")}
+    assert manifest.from_listing
+
+
+def test_chunk_manifest_listing_never_matches_gzip_objects():
+    bucket = FakeBucket()
+    bucket.objects["codes-repo/a.py__lines_1-5.txt"] = "a"
+    bucket.gzipped.add("codes-repo/a.py__lines_1-5.txt")
+
+    manifest = ChunkManifest.load(bucket, "codes-repo")
+    assert "codes-repo/a.py__lines_1-5.txt" in manifest.chunks
+    assert not manifest.is_unchanged(
+        "codes-repo/a.py__lines_1-5.txt", content_hash("a")
+    )
+
+
+def test_upload_repo_to_gcs_saves_manifest_rebuilt_from_listing(tmp_path):
+    from rag.ingestion.rag_corpus import get_gcs_folder_prefix, upload_repo_to_gcs
+
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.py").write_text("print('a')\n")
+    prefix = get_gcs_folder_prefix(repo)
+    bucket = FakeBucket()
+    bucket.objects[f"{prefix}/a.py__lines_1-1.txt"] = "print('a')\n"
+
+    upload_repo_to_gcs(bucket, repo, chunking_strategy="lines")
+    assert bucket.uploads == 1  # only the manifest itself
+    assert manifest_blob_name(prefix) in bucket.objects
+
+
+def test_upload_repo_to_gcs_only_uploads_changed_chunks(tmp_path):
+    from rag.ingestion.rag_corpus import upload_repo_to_gcs
+
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "a.py").write_text("print('a')\n")
+    (repo / "b.py").write_text("print('b')\n")
+    bucket = FakeBucket()
+
+    prefix = upload_repo_to_gcs(bucket, repo, chunking_strategy="lines")
+    chunk_names = {name for name in bucket.objects if name.startswith(prefix + "/")}
+    assert chunk_names == {
+        f"{prefix}/a.py__lines_1-1.txt",
+        f"{prefix}/b.py__lines_1-1.txt",
+    }
+
+    uploads = bucket.uploads
+    upload_repo_to_gcs(bucket, repo, chunking_strategy="lines")
+    assert bucket.uploads == uploads
+
+    (repo / "a.py").write_text("print('A')\n")
+    (repo / "b.py").unlink()
+    upload_repo_to_gcs(bucket, repo, chunking_strategy="lines")
+    assert bucket.objects[f"{prefix}/a.py__lines_1-1.txt"] == "print('A')\n"
+    assert f"{prefix}/b.py__lines_1-1.txt" not in bucket.objects
+
+
+def test_diff_commits_and_partial_sync(tmp_path):
+    import git
+
+    from rag.ingestion.incremental import diff_commits
+    from rag.ingestion.rag_corpus import sync_repo_to_gcs
+
+    repo_path = tmp_path / "repo"
+    repo = git.Repo.init(repo_path)
+    with repo.config_writer() as writer:
+        writer.set_value("user", "name", "test")
+        writer.set_value("user", "email", "test@example.com")
+    for name in ("a.py", "b.py", "c.py"):
+        (repo_path / name).write_text(f"print('{name}')\n")
+    repo.index.add(["a.py", "b.py", "c.py"])
+    old_commit = repo.index.commit("initial").hexsha
+
+    bucket = FakeBucket()
+    first = sync_repo_to_gcs(bucket, repo_path, chunking_strategy="lines")
+    first.manifest.save(bucket)
+    for blob_name in first.uploaded_blobs:
+        assert blob_name in bucket.objects
+
+    (repo_path / "a.py").write_text("print('changed')\n")
+    repo.index.remove(["b.py"], working_tree=True)
+    repo.index.add(["a.py"])
+    new_commit = repo.index.commit("update").hexsha
+
+    changed, deleted = diff_commits(repo_path, old_commit, new_commit)
+    assert changed == {"a.py"}
+    assert deleted == {"b.py"}
+
+    second = sync_repo_to_gcs(
+        bucket,
+        repo_path,
+        chunking_strategy="lines",
+        previous_manifest=first.manifest,
+        changed_paths=changed,
+        deleted_paths=deleted,
+    )
+    prefix = second.gcs_folder_prefix
+    assert second.uploaded_blobs == [f"{prefix}/a.py__lines_1-1.txt"]
+    assert second.deleted_blobs == [f"{prefix}/b.py__lines_1-1.txt"]
+    assert set(second.manifest.chunks) == {
+        f"{prefix}/a.py__lines_1-1.txt",
+        f"{prefix}/c.py__lines_1-1.txt",
+    }
+
+
+def test_parser_registry_reuses_parsers_and_counts_parses(tmp_path):
+    from rag.ingestion.parsers import ParserRegistry, dialect_for
+
+    registry = ParserRegistry()
+    assert registry.parser("python") is registry.parser("python")
+    assert dialect_for("typescript", tmp_path / "App.tsx") == "tsx"
+    assert dialect_for("typescript", tmp_path / "api.ts") == "typescript"
+
+    registry.parse("python", b"def f():\n    return 1\n")
+    registry.parse("python", b"class A:\n    pass\n")
+    stats = registry.stats()["python"]
+    assert stats["files"] == 2
+    assert stats["bytes"] > 0
+
+    snapshot = registry.stats()
+    registry.parse("python", b"x = 1\n")
+    assert registry.stats_since(snapshot)["python"]["files"] == 1
+
+
+def test_chunk_files_in_worker_processes_keeps_file_order(tmp_path):
+    from rag.ingestion.chunking import chunk_files
+
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    file_paths = []
+    for i in range(6):
+        file_path = repo / f"m{i}.py"
+        file_path.write_text("".join(f"x{i} = {n}\n" for n in range(30)))
+        file_paths.append(file_path)
+
+    inline = list(chunk_files(repo, file_paths, "lines", chunk_size=10, workers=1))
+    pooled = list(
+        chunk_files(repo, file_paths, "lines", chunk_size=10, workers=2, batch_size=1)
+    )
+    assert pooled == inline
+    assert [rel_path for rel_path, _ in pooled] == [f"m{i}.py" for i in range(6)]
+    assert [(start, end) for start, end, _ in pooled[0][1]] == [
+        (1, 10),
+        (11, 20),
+        (21, 30),
+    ]
+
+
+def test_sync_repo_to_gcs_records_stage_metrics(tmp_path):
+    from rag.ingestion.pipeline import PipelineMetrics, prefetch
+    from rag.ingestion.rag_corpus import sync_repo_to_gcs
+
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    for i in range(5):
+        (repo / f"m{i}.py").write_text(f"x = {i}\n")
+    metrics = PipelineMetrics()
+    sync_repo_to_gcs(FakeBucket(), repo, chunking_strategy="lines", metrics=metrics)
+
+    summary = metrics.summary()
+    assert summary["discover"]["items"] == 5
+    assert summary["chunk"]["items"] == 5
+    assert summary["upload"]["items"] == 5
+    assert summary["upload"]["queue_depth_max"] >= 1
+    assert summary["chunk"]["p50_ms"] >= 0
+
+    def failing():
+        yield 1
+        raise OSError("disk gone")
+
+    with pytest.raises(OSError):
+        list(prefetch(failing(), maxsize=1))
+
+
+def test_sharded_layout_uploads_only_changed_shards(tmp_path, monkeypatch):
+    import json
+
+    from rag.ingestion.config import config
+    from rag.ingestion.rag_corpus import sync_repo_to_gcs
+    from rag.ingestion.shards import ShardWriter
+
+    monkeypatch.setattr(config, "chunk_layout", "shards")
+    monkeypatch.setattr(config, "chunk_shard_buckets", 4)
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    for i in range(8):
+        (repo / f"m{i}.py").write_text(f"x = {i}\n")
+    bucket = FakeBucket()
+
+    first = sync_repo_to_gcs(bucket, repo, chunking_strategy="lines")
+    assert first.uploaded_blobs
+    assert all(name.endswith(".jsonl") for name in first.uploaded_blobs)
+    records = [
+        json.loads(line)
+        for name in first.uploaded_blobs
+        for line in bucket.objects[name].splitlines()
+    ]
+    assert sorted(record["path"] for record in records) == [
+        f"m{i}.py" for i in range(8)
+    ]
+    assert records[0]["start_line"] == 1 and records[0]["end_line"] == 1
+
+    (repo / "m3.py").write_text("x = 33\n")
+    second = sync_repo_to_gcs(
+        bucket, repo, chunking_strategy="lines", previous_manifest=first.manifest
+    )
+    assert len(second.uploaded_blobs) == 1
+    assert '"m3.py"' in bucket.objects[second.uploaded_blobs[0]]
+    assert not second.deleted_blobs
+
+    # A full part is handed out right away instead of being held until close.
+    writer = ShardWriter("prefix", buckets=1, max_bytes=250)
+    assert writer.add("a.py", [(1, 1, "a" * 80)]) == []
+    (full,) = writer.add("b.py", [(1, 1, "b" * 80)])
+    assert full.blob_name == "prefix/shards/0-000.jsonl" and full.rel_paths == ["a.py"]
+    assert [shard.rel_paths for shard in writer.close()] == [["b.py"]]
+
+
+def test_tree_sitter_chunker_splits_large_and_merges_small_nodes(tmp_path):
+    from rag.ingestion.chunking import chunk_file_by_tree_sitter
+
+    source = tmp_path / "big.py"
+    source.write_text(
+        "import os\n"
+        "import re\n"
+        "\n"
+        "\n"
+        "class Big:\n"
+        "    def a(self):\n"
+        "        return os.path.join('a', 'b')\n"
+        "\n"
+        "    def b(self):\n"
+        "        return re.compile('x')\n"
+    )
+    chunks = chunk_file_by_tree_sitter(source, "python", max_bytes=80, min_bytes=40)
+    assert [(start, end) for start, end, _ in chunks] == [(1, 2), (6, 7), (9, 10)]
+    assert chunks[1][2].startswith("class Big:\n    def a(self):")
+    assert chunks[2][2].startswith("class Big:\n    def b(self):")
+
+
+def test_chunk_files_skips_binary_generated_and_minified_files(tmp_path, monkeypatch):
+    from rag.ingestion import classify
+    from rag.ingestion.chunking import chunk_files
+
+    monkeypatch.setattr(classify.config, "large_data_file_bytes", 2000)
+    monkeypatch.setattr(classify.config, "large_data_truncate_bytes", 500)
+    files = {
+        "app.py": b"print('app')\n",
+        "logo.py": b"\x89PNG\r\n\x1a\n\0\0\0\rIHDR",
+        "latin1.py": "x = 'caf\u00e9'\n".encode("latin-1"),
+        "api_pb2.py": b"DESCRIPTOR = None\n",
+        "schema.py": b"# Code generated by sqlc. DO NOT EDIT.\nx = 1\n",
+        "bundle.js": b"var a=1;" * 500,
+        "package-lock.json": b"{}\n",
+        "data.json": b"".join(b'  "key_%d": %d,\n' % (i, i) for i in range(400)),
+    }
+    for name, data in files.items():
+        (tmp_path / name).write_bytes(data)
+
+    # Deleted after discovery.
+    results = dict(
+        chunk_files(
+            tmp_path,
+            [tmp_path / name for name in sorted(files)] + [tmp_path / "gone.py"],
+            chunking_strategy="lines",
+            workers=1,
+        )
+    )
+
+    assert {name for name, chunks in results.items() if chunks is not None} == {
+        "app.py",
+        "data.json",
+    }
+    assert "gone.py" in results
+    assert sum(len(text) for _, _, text in results["data.json"]) <= 500
+    assert classify.classify_sample("a.js", b"var a = 1;\n" * 10, 110).kind == "text"
+
+
+def test_repo_walker_prunes_ignored_directories(tmp_path):
+    from rag.ingestion.discovery import RepoWalker
+
+    repo = tmp_path / "repo"
+    for rel_path in [
+        "app.py",
+        "README.md",
+        "logo.png",
+        "generated/api.py",
+        "lib/keep.log.py",
+        "lib/tmp_cache.py",
+        "lib/important_cache.py",
+        "node_modules/pkg/index.js",
+        ".github/workflow.yml",
+        "web/src/index.ts",
+        "web/out/bundle.js",
+    ]:
+        (repo / rel_path).parent.mkdir(parents=True, exist_ok=True)
+        (repo / rel_path).write_text("x\n")
+    (repo / ".gitignore").write_text("# generated code\n/generated/\n*_cache.py\n")
+    (repo / "lib" / ".gitignore").write_text("!important_cache.py\n")
+    (repo / "web" / ".gitignore").write_text("out/\n")
+
+    walker = RepoWalker(repo)
+    files = [str(path.relative_to(repo)) for path in walker.iter_files()]
+    assert files == [
+        "README.md",
+        "app.py",
+        "lib/important_cache.py",
+        "lib/keep.log.py",
+        "web/src/index.ts",
+    ]
+    assert walker.includes("web/src/index.ts")
+    assert not walker.includes("web/out/bundle.js")
+    assert not walker.includes("node_modules/pkg/index.js")
+    assert not walker.includes("lib/tmp_cache.py")
+
+
+class FakeRagFile:
+    def __init__(self, name, uri, create_time):
+        self.name = name
+        self.gcs_source = types.SimpleNamespace(uris=[uri])
+        self.create_time = create_time
+
+
+class FakeRag:
+    """Stands in for `vertexai.preview.rag` in both rag_corpus and incremental."""
+
+    def __init__(self, corpus_names=()):
+        self.corpora = {name: types.SimpleNamespace(name=name) for name in corpus_names}
+        self.files = []
+        self.imports = []
+        self.fail_imports = False
+        self._clock = 0
+
+    def get_corpus(self, name):
+        if name not in self.corpora:
+            raise NotFound(name)
+        return self.corpora[name]
+
+    def list_files(self, corpus_name):
+        return list(self.files)
+
+    def delete_file(self, name):
+        self.files = [rag_file for rag_file in self.files if rag_file.name != name]
+
+    def import_files(self, corpus_name, paths, transformation_config=None):
+        from google.cloud.aiplatform_v1.types.vertex_rag_data_service import (
+            ImportRagFilesResponse,
+        )
+
+        self.imports.append(list(paths))
+        if self.fail_imports:
+            return ImportRagFilesResponse(failed_rag_files_count=len(paths))
+        for uri in paths:
+            self._clock += 1
+            self.files.append(FakeRagFile(f"file-{self._clock}", uri, self._clock))
+        return ImportRagFilesResponse(imported_rag_files_count=len(paths))
+
+
+def _init_repo(repo_path, files):
+    import git
+
+    repo = git.Repo.init(repo_path)
+    with repo.config_writer() as writer:
+        writer.set_value("user", "name", "test")
+        writer.set_value("user", "email", "test@example.com")
+    for name, text in files.items():
+        (repo_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (repo_path / name).write_text(text)
+    repo.index.add(list(files))
+    return repo, repo.index.commit("initial").hexsha
+
+
+@pytest.fixture
+def delta_env(tmp_path, monkeypatch):
+    from rag.ingestion import backends, incremental, rag_corpus
+
+    fake_rag = FakeRag(corpus_names=["corpora/1"])
+    monkeypatch.setattr(rag_corpus, "rag", fake_rag)
+    monkeypatch.setattr(incremental, "rag", fake_rag)
+    monkeypatch.setattr(backends.VertexBackend, "init", lambda *args: None)
+
+    repo_path = tmp_path / "repo"
+    repo, commit = _init_repo(
+        repo_path, {"a.py": "print('a')\n", "b.py": "print('b')\n"}
+    )
+    bucket = FakeBucket()
+    first = rag_corpus.sync_repo_to_gcs(bucket, repo_path, chunking_strategy="lines")
+    for blob_name in first.uploaded_blobs:
+        fake_rag.import_files("corpora/1", [f"gs://{bucket.name}/{blob_name}"])
+    first.manifest.commit_hash = commit
+    first.manifest.corpus_name = "corpora/1"
+    first.manifest.save(bucket)
+    return types.SimpleNamespace(
+        rag=fake_rag,
+        repo=repo,
+        repo_path=repo_path,
+        bucket=bucket,
+        prefix=first.gcs_folder_prefix,
+        commit=commit,
+    )
+
+
+def _load_manifest(env):
+    return ChunkManifest.load(env.bucket, env.prefix)
+
+
+def test_ingest_repository_delta_imports_only_changes(delta_env):
+    from rag.ingestion.rag_corpus import ingest_repository_delta
+
+    env = delta_env
+    (env.repo_path / "a.py").write_text("print('A')\n")
+    env.repo.index.remove(["b.py"], working_tree=True)
+    env.repo.index.add(["a.py"])
+    new_commit = env.repo.index.commit("update").hexsha
+
+    corpus, response = ingest_repository_delta(
+        env.repo_path, new_commit, env.bucket, _load_manifest(env)
+    )
+    a_uri = f"gs://{env.bucket.name}/{env.prefix}/a.py__lines_1-1.txt"
+    assert corpus.name == "corpora/1"
+    assert response.imported_rag_files_count == 1
+    assert env.rag.imports[-1] == [a_uri]
+    # the stale copy of a.py and the RagFile of the deleted b.py are gone
+    assert [rag_file.gcs_source.uris for rag_file in env.rag.files] == [[a_uri]]
+
+    manifest = _load_manifest(env)
+    assert manifest.commit_hash == new_commit
+    assert manifest.pending_paths == set()
+    assert set(manifest.chunks) == {f"{env.prefix}/a.py__lines_1-1.txt"}
+
+
+def test_ingest_repository_delta_up_to_date(delta_env):
+    from rag.ingestion.rag_corpus import ingest_repository_delta
+
+    env = delta_env
+    corpus, response = ingest_repository_delta(
+        env.repo_path, env.commit, env.bucket, _load_manifest(env)
+    )
+    assert corpus.name == "corpora/1"
+    assert response.imported_rag_files_count == 0
+    assert len(env.rag.imports) == 2  # only the setup imports
+
+
+def test_ingest_repository_delta_fallbacks(delta_env):
+    from rag.ingestion.rag_corpus import ingest_repository_delta
+
+    env = delta_env
+    assert (
+        ingest_repository_delta(
+            env.repo_path, env.commit, env.bucket, ChunkManifest(env.prefix)
+        )
+        is None
+    )
+
+    missing_corpus = _load_manifest(env)
+    missing_corpus.corpus_name = "corpora/missing"
+    assert (
+        ingest_repository_delta(env.repo_path, "HEAD", env.bucket, missing_corpus)
+        is None
+    )
+
+    unknown_commit = _load_manifest(env)
+    unknown_commit.commit_hash = "0" * 40
+    assert (
+        ingest_repository_delta(env.repo_path, env.commit, env.bucket, unknown_commit)
+        is None
+    )
+
+
+def test_ingest_repository_delta_retries_failures(delta_env):
+    from rag.ingestion.rag_corpus import ingest_repository_delta
+
+    env = delta_env
+    (env.repo_path / "a.py").write_text("print('A')\n")
+    env.repo.index.add(["a.py"])
+    new_commit = env.repo.index.commit("update").hexsha
+
+    env.bucket.failures[f"{env.prefix}/a.py__lines_1-1.txt"] = 100
+    ingest_repository_delta(env.repo_path, new_commit, env.bucket, _load_manifest(env))
+    manifest = _load_manifest(env)
+    assert manifest.commit_hash == new_commit
+    assert manifest.pending_paths == {"a.py"}
+
+    env.bucket.failures.clear()
+    env.rag.fail_imports = True
+    ingest_repository_delta(env.repo_path, new_commit, env.bucket, _load_manifest(env))
+    assert _load_manifest(env).pending_paths == {"a.py"}
+
+    env.rag.fail_imports = False
+    _, response = ingest_repository_delta(
+        env.repo_path, new_commit, env.bucket, _load_manifest(env)
+    )
+    assert response.imported_rag_files_count == 1
+    assert _load_manifest(env).pending_paths == set()
+
+
+def test_interrupted_ingestion_job_resumes_from_checkpoint(delta_env, monkeypatch):
+    from rag.ingestion import rag_corpus
+    from rag.ingestion.checkpoint import IngestionCheckpoint, checkpoint_blob_name
+
+    env = delta_env
+    env.rag.corpora["corpora/9"] = types.SimpleNamespace(name="corpora/9")
+    monkeypatch.setattr(
+        rag_corpus,
+        "clone_github_repo",
+        lambda url, branch=None: (env.repo_path, env.commit),
+    )
+    monkeypatch.setattr(rag_corpus, "get_gcs_bucket", lambda **kwargs: env.bucket)
+
+    def create_rag_corpus(**kwargs):
+        raise AssertionError("the corpus of the interrupted job must be reused")
+
+    monkeypatch.setattr(rag_corpus, "create_rag_corpus", create_rag_corpus)
+
+    # A job that uploaded a.py's chunk and created corpora/9, then died.
+    env.bucket.objects.clear()
+    checkpoint = IngestionCheckpoint(env.prefix, corpus_name="corpora/9")
+    rag_corpus.sync_repo_to_gcs(env.bucket, env.repo_path, checkpoint=checkpoint)
+    a_blob, b_blob = sorted(checkpoint.chunks)
+    del env.bucket.objects[b_blob]
+    del checkpoint.chunks[b_blob]
+    checkpoint.save(env.bucket)
+    env.bucket.uploaded.clear()
+
+    corpus, response = rag_corpus.ingest_repository_to_rag_corpus(
+        "https://github.com/org/repo", incremental=True
+    )
+
+    assert corpus.name == "corpora/9"
+    assert response.imported_rag_files_count == 1
+    assert [name for name in env.bucket.uploaded if name.endswith(".txt")] == [b_blob]
+    assert checkpoint_blob_name(env.prefix) not in env.bucket.objects
+    manifest = _load_manifest(env)
+    assert manifest.corpus_name == "corpora/9"
+    assert manifest.commit_hash == env.commit
+    assert set(manifest.chunks) == {a_blob, b_blob}
+
+
+def test_local_backend_runs_full_ingestion_offline(tmp_path, monkeypatch):
+    from rag.ingestion import backends, rag_corpus
+
+    backend = backends.LocalBackend(tmp_path / "store", latency_s=0.001)
+    monkeypatch.setattr(backends, "_backend", backend)
+    monkeypatch.setattr(rag_corpus.config, "upload_gzip", True)
+    repo_path = tmp_path / "repo"
+    repo, commit = _init_repo(
+        repo_path, {"a.py": "print('a')\n", "b.py": "print('b')\n"}
+    )
+    monkeypatch.setattr(
+        rag_corpus, "clone_github_repo", lambda url, branch=None: (repo_path, commit)
+    )
+
+    corpus, response = rag_corpus.ingest_repository_to_rag_corpus(
+        "https://github.com/org/repo"
+    )
+
+    assert response.imported_rag_files_count == 2
+    bucket = rag_corpus.get_gcs_bucket()
+    prefix = rag_corpus.get_gcs_folder_prefix(repo_path)
+    assert sorted(blob.name for blob in bucket.list_blobs(prefix=prefix + "/")) == [
+        f"{prefix}/a.py__lines_1-1.txt",
+        f"{prefix}/b.py__lines_1-1.txt",
+    ]
+    a_text = bucket.blob(f"{prefix}/a.py__lines_1-1.txt").download_as_text()
+    assert "print('a')" in a_text
+    rag_files = backend.rag.list_files(corpus_name=corpus.name)
+    assert {rag_file.gcs_source.uris[0] for rag_file in rag_files} == {
+        f"gs://{bucket.name}/{prefix}/a.py__lines_1-1.txt",
+        f"gs://{bucket.name}/{prefix}/b.py__lines_1-1.txt",
+    }
+    assert ChunkManifest.load(bucket, prefix).commit_hash == commit
+
+
+def test_reingestion_upserts_into_registered_corpus(tmp_path, monkeypatch):
+    from rag.ingestion import backends, rag_corpus
+    from rag.ingestion.registry import CorpusRegistry, collect_garbage
+
+    backend = backends.LocalBackend(tmp_path / "store")
+    monkeypatch.setattr(backends, "_backend", backend)
+    repo_path = tmp_path / "repo"
+    repo, commit = _init_repo(
+        repo_path, {"a.py": "print('a')\n", "b.py": "print('b')\n"}
+    )
+    clone = {"commit": commit}
+    monkeypatch.setattr(
+        rag_corpus,
+        "clone_github_repo",
+        lambda url, branch=None: (repo_path, clone["commit"]),
+    )
+    corpus, _ = rag_corpus.ingest_repository_to_rag_corpus(
+        "https://github.com/org/repo"
+    )
+
+    (repo_path / "a.py").write_text("print('a2')\n")
+    repo.index.add(["a.py"])
+    repo.index.remove(["b.py"], working_tree=True)
+    clone["commit"] = repo.index.commit("update").hexsha
+    again, response = rag_corpus.ingest_repository_to_rag_corpus(
+        "https://github.com/org/repo"
+    )
+
+    assert again.name == corpus.name
+    assert response.imported_rag_files_count == 1
+    rag_files = backend.rag.list_files(corpus_name=corpus.name)
+    assert [rag_file.display_name for rag_file in rag_files] == ["a.py__lines_1-1.txt"]
+    bucket = rag_corpus.get_gcs_bucket()
+    registry = CorpusRegistry(bucket)
+    entry = registry.get("org/repo")
+    assert entry.corpus_name == corpus.name
+    assert entry.commit_hash == clone["commit"]
+
+    stray = backend.rag.create_corpus(display_name="rag-corpus-repo-0123abcd")
+    backend.rag.create_corpus(display_name="hand-made corpus")
+    assert collect_garbage(bucket, dry_run=False)["corpora"] == [stray.name]
+    assert len(backend.rag.list_corpora()) == 2
+
+    registry.delete("org/repo")
+    assert registry.get("org/repo") is None
+    assert [c.display_name for c in backend.rag.list_corpora()] == ["hand-made corpus"]
+    assert not list(bucket.list_blobs(prefix=entry.gcs_folder_prefix))
+
+
+def test_add_corpus_reports_new_corpus_of_empty_repo_as_warning(tmp_path, monkeypatch):
+    from rag.ingestion import backends, rag_corpus
+    from rag.tools.add_corpus import add_corpus_from_github
+
+    monkeypatch.setattr(backends, "_backend", backends.LocalBackend(tmp_path / "store"))
+    repo_path = tmp_path / "repo"
+    _, commit = _init_repo(repo_path, {"logo.png": "not code\n"})
+    monkeypatch.setattr(
+        rag_corpus, "clone_github_repo", lambda url, branch=None: (repo_path, commit)
+    )
+
+    first = add_corpus_from_github("https://github.com/org/empty", wait=True)
+    again = add_corpus_from_github("https://github.com/org/empty", wait=True)
+
+    assert first["status"] == "warning"
+    assert again["status"] == "up_to_date"
+    assert again["corpus_name"] == first["corpus_name"]
+
+
+def test_benchmark_reports_chunking_and_upload_of_synthetic_repo(tmp_path):
+    from rag.ingestion.benchmark import generate_synthetic_repo, run_benchmark
+
+    repo_path = generate_synthetic_repo(
+        tmp_path / "repo", files=12, language_mix={".py": 1, ".md": 1}, seed=1
+    )
+    report = run_benchmark(
+        repo_path, "synthetic", strategies=("lines",), chunk_workers=1
+    )
+
+    assert report["discovery"]["files"] == 12
+    chunking = report["chunking"]["lines"]
+    assert chunking["chunks"] > 12
+    assert 0 < chunking["chunk_bytes"]["p50"] <= chunking["chunk_bytes"]["max"]
+    assert report["upload"]["lines"]["objects"] == chunking["chunks"]
+    assert report["upload"]["lines"]["stages"]["upload"]["items"] == chunking["chunks"]
+
+
+def test_diff_commits_handles_non_ascii_paths(tmp_path):
+    from rag.ingestion.incremental import diff_commits
+
+    repo_path = tmp_path / "repo"
+    repo, old_commit = _init_repo(repo_path, {"café.py": "x = 1\n"})
+    (repo_path / "café.py").write_text("x = 2\n")
+    repo.index.add(["café.py"])
+    new_commit = repo.index.commit("update").hexsha
+
+    assert diff_commits(repo_path, old_commit, new_commit) == ({"café.py"}, set())
+
+
+def test_shallow_clone_fetches_older_commit_on_demand(tmp_path):
+    from utils.git_clone import clone_repo, ensure_commit, has_commit
+
+    origin, first_commit = _init_repo(tmp_path / "origin", {"a.py": "x = 1\n"})
+    (tmp_path / "origin" / "a.py").write_text("x = 2\n")
+    origin.index.add(["a.py"])
+    origin.index.commit("second")
+
+    clone = clone_repo(f"file://{tmp_path / 'origin'}", tmp_path / "clone")
+    assert not has_commit(clone, first_commit)
+    assert ensure_commit(clone, first_commit)
+
+
+def test_sparse_clone_checks_out_matching_files_only(tmp_path):
+    from utils.git_clone import clone_repo, sparse_patterns_for_extensions
+
+    _init_repo(tmp_path / "origin", {"a.py": "x = 1\n", "logo.svg": "<svg/>\n"})
+    clone_repo(
+        f"file://{tmp_path / 'origin'}",
+        tmp_path / "clone",
+        strategy="sparse",
+        sparse_patterns=sparse_patterns_for_extensions([".py"]),
+    )
+    assert (tmp_path / "clone" / "a.py").exists()
+    assert not (tmp_path / "clone" / "logo.svg").exists()
+
+
+def test_repo_workspace_reuses_mirror_and_evicts_old_worktrees(tmp_path):
+    from utils.workspace import RepoWorkspace
+
+    origin, _ = _init_repo(tmp_path / "origin", {"a.py": "x = 1\n"})
+    url = f"file://{tmp_path / 'origin'}"
+    workspace = RepoWorkspace(tmp_path / "ws", max_bytes=10**9, worktree_ttl_s=0)
+
+    first = workspace.checkout("acme/app", url)
+    assert (first / "a.py").read_text() == "x = 1\n"
+
+    (tmp_path / "origin" / "a.py").write_text("x = 2\n")
+    origin.index.add(["a.py"])
+    origin.index.commit("second")
+    second = workspace.checkout("acme/app", url)
+    assert (second / "a.py").read_text() == "x = 2\n"
+    assert [path.name for path in workspace.mirrors_dir.glob("*/*.git")] == ["app.git"]
+
+    workspace.max_bytes = 1
+    assert workspace.evict() > 0
+    assert not first.exists() and not second.exists()
+
+    workspace.max_bytes = 10**9
+    third = workspace.checkout("acme/app", url)
+    workspace.release(third)
+    assert not third.exists()
+
+
+def test_repo_workspace_applies_sparse_clone_strategy(tmp_path):
+    import git
+
+    from utils.workspace import RepoWorkspace
+
+    origin, _ = _init_repo(
+        tmp_path / "origin", {"src/a.py": "x = 1\n", "docs/b.md": "# b\n"}
+    )
+    origin.git.config("uploadpack.allowFilter", "true")
+    workspace = RepoWorkspace(
+        tmp_path / "ws",
+        max_bytes=10**9,
+        strategy="sparse",
+        sparse_patterns=["*.py"],
+    )
+
+    worktree = workspace.checkout("acme/app", f"file://{tmp_path / 'origin'}")
+
+    assert (worktree / "src" / "a.py").read_text() == "x = 1\n"
+    assert not (worktree / "docs").exists()
+    mirror = workspace.mirror_path("acme/app")
+    config = git.Repo(mirror).config_reader()
+    assert config.get_value('remote "origin"', "promisor") is True
+    assert config.get_value("core", "bare") is True
+    workspace.release(worktree)
+    assert not worktree.exists()
+
+
+def test_ingestion_operations_run_in_background_with_bounded_concurrency():
+    from rag.ingestion.operations import IngestionOperations
+
+    operations = IngestionOperations(max_workers=2, max_finished=3)
+    release = threading.Event()
+    running, peak = [], []
+    lock = threading.Lock()
+
+    def ingest(name):
+        with lock:
+            running.append(name)
+            peak.append(len(running))
+        release.wait(5)
+        with lock:
+            running.remove(name)
+        if name == "broken":
+            raise RuntimeError("clone failed")
+        return {"status": "error" if name == "empty" else "success", "name": name}
+
+    submitted = [operations.submit(name, ingest, name) for name in ("a", "b", "empty")]
+    assert operations.submit("a", ingest, "a").operation_id == submitted[0].operation_id
+    assert operations.get(submitted[2].operation_id).state == "pending"
+    release.set()
+    finished = [operations.wait(op.operation_id, timeout=5) for op in submitted]
+
+    assert max(peak) == 2
+    assert [op.state for op in finished] == ["succeeded", "succeeded", "failed"]
+    assert finished[0].result == {"status": "success", "name": "a"}
+    broken = operations.wait(
+        operations.submit("broken", ingest, "broken").operation_id, 5
+    )
+    assert broken.state == "failed" and broken.error == "clone failed"
+    # Only the last three finished operations are kept.
+    assert [op.source for op in operations.list()] == ["broken", "empty", "b"]
+
+
+def test_batch_ingestion_reports_progress_per_repository(tmp_path, monkeypatch):
+    from rag.ingestion import backends, rag_corpus
+    from rag.ingestion.batch import ingest_repositories, parse_repo_spec
+    from rag.ingestion.registry import CorpusRegistry
+
+    monkeypatch.setattr(backends, "_backend", backends.LocalBackend(tmp_path / "store"))
+    repos = {}
+    for name in ("one", "two"):
+        repos[name] = _init_repo(tmp_path / name, {f"{name}.py": f"{name} = 1\n"})
+
+    def clone_github_repo(url, branch=None):
+        name = url.rsplit("/", 1)[-1]
+        if name not in repos:
+            raise RuntimeError("repository not found")
+        return tmp_path / name, repos[name][1]
+
+    monkeypatch.setattr(rag_corpus, "clone_github_repo", clone_github_repo)
+
+    specs = [parse_repo_spec(spec) for spec in ("org/one", "org/two", "org/gone@dev")]
+    assert specs[2].github_url == "https://github.com/org/gone"
+    assert specs[2].branch == "dev"
+    summary = ingest_repositories(specs, max_parallel=2)
+
+    assert (summary["total"], summary["succeeded"], summary["failed"]) == (3, 2, 1)
+    states = {repo["repo"]: repo["state"] for repo in summary["repos"]}
+    assert states == {
+        "https://github.com/org/one": "succeeded",
+        "https://github.com/org/two": "succeeded",
+        "https://github.com/org/gone@dev": "failed",
+    }
+    assert summary["imported_files_count"] == 2
+    registry = CorpusRegistry(rag_corpus.get_gcs_bucket())
+    assert {entry.key for entry in registry.entries()} == {"org/one", "org/two"}
+
+
+def test_batch_ingestion_keeps_same_named_repos_of_different_orgs_apart(
+    tmp_path, monkeypatch
+):
+    from rag.ingestion import backends, rag_corpus
+    from rag.ingestion.batch import ingest_repositories, parse_repo_spec
+    from rag.ingestion.limits import repo_locks
+    from rag.ingestion.registry import CorpusRegistry
+
+    monkeypatch.setattr(backends, "_backend", backends.LocalBackend(tmp_path / "store"))
+    monkeypatch.setattr(rag_corpus.config, "local_repo_path", str(tmp_path / "repos"))
+    monkeypatch.setattr(
+        rag_corpus,
+        "clone_repo",
+        lambda url, path, **kwargs: _init_repo(path, {"app.py": f"# {url}\n"}),
+    )
+
+    specs = [parse_repo_spec(spec) for spec in ("org1/app", "org2/app")]
+    # An ingestion of org1/app already running holds the batch's org1/app back.
+    with repo_locks.hold("org1/app"):
+        batch = threading.Thread(
+            target=ingest_repositories, args=(specs,), kwargs={"max_parallel": 2}
+        )
+        batch.start()
+        batch.join(timeout=2)
+        assert batch.is_alive()
+    batch.join()
+
+    assert (tmp_path / "repos" / "org1" / "app").is_dir()
+    assert (tmp_path / "repos" / "org2" / "app").is_dir()
+    registry = CorpusRegistry(rag_corpus.get_gcs_bucket())
+    prefixes = {entry.key: entry.gcs_folder_prefix for entry in registry.entries()}
+    assert set(prefixes) == {"org1/app", "org2/app"}
+    assert prefixes["org1/app"].endswith("org1--app")
+    assert prefixes["org2/app"].endswith("org2--app")
+
+
+def test_ingestion_indexes_chunk_metadata(tmp_path, monkeypatch, chunk_index_path):
+    from rag.chunk_index import get_chunk_index
+    from rag.ingestion import backends, rag_corpus
+
+    monkeypatch.setattr(backends, "_backend", backends.LocalBackend(tmp_path / "store"))
+    repo_path = tmp_path / "repo"
+    repo, commit = _init_repo(
+        repo_path,
+        {"pkg/util.py": "def helper():\n    return 1\n", "b.py": "x = 1\n"},
+    )
+    monkeypatch.setattr(
+        rag_corpus, "clone_github_repo", lambda url, branch=None: (repo_path, commit)
+    )
+    rag_corpus.ingest_repository_to_rag_corpus("https://github.com/org/repo")
+
+    prefix = rag_corpus.get_gcs_folder_prefix(repo_path)
+    bucket_uri = f"gs://{rag_corpus.config.bucket_name}/{prefix}"
+    util_uri = f"{bucket_uri}/pkg/util.py__lines_1-2.txt"
+    b_uri = f"{bucket_uri}/b.py__lines_1-1.txt"
+    chunk_index = get_chunk_index(chunk_index_path)
+    assert chunk_index.lookup([util_uri, b_uri, "gs://other/x.txt"]) == {
+        util_uri: {
+            "file_path": "pkg/util.py",
+            "start_line": 1,
+            "end_line": 2,
+            "symbol": "helper",
+            "commit_hash": commit,
+            "gcs_folder_prefix": prefix,
+        },
+        b_uri: {
+            "file_path": "b.py",
+            "start_line": 1,
+            "end_line": 1,
+            "symbol": None,
+            "commit_hash": commit,
+            "gcs_folder_prefix": prefix,
+        },
+    }
+
+    repo.index.remove(["b.py"], working_tree=True)
+    commit = repo.index.commit("remove b").hexsha
+    rag_corpus.ingest_repository_to_rag_corpus(
+        "https://github.com/org/repo", incremental=True
+    )
+    indexed = chunk_index.lookup([util_uri, b_uri])
+    assert list(indexed) == [util_uri]
+    assert indexed[util_uri]["commit_hash"] == commit
+
+
+def test_lexical_search_backend_answers_code_queries_locally(
+    tmp_path, monkeypatch, chunk_index_path
+):
+    from rag.chunk_index import get_chunk_index
+    from rag.ingestion import backends, rag_corpus
+    from rag.retrieval import semantic_search_engine
+    from rag.retrieval.semantic_search_engine import VertexAISemanticSearch
+
+    monkeypatch.setattr(backends, "_backend", backends.LocalBackend(tmp_path / "store"))
+    repo_path = tmp_path / "repo"
+    repo, commit = _init_repo(
+        repo_path,
+        {
+            "signup.js": 'function onSignup() {\n  analytics.track("Signed Up");\n}\n',
+            "events.py": "def send_event(name):\n    tracker.trackEvent(name)\n",
+        },
+    )
+    monkeypatch.setattr(
+        rag_corpus, "clone_github_repo", lambda url, branch=None: (repo_path, commit)
+    )
+    corpus, _ = rag_corpus.ingest_repository_to_rag_corpus(
+        "https://github.com/org/repo"
+    )
+    vertex_queries = []
+    monkeypatch.setattr(
+        semantic_search_engine,
+        "retrieve_contexts_from_corpus",
+        lambda **kwargs: vertex_queries.append(kwargs["query_text"]) or [],
+    )
+    searcher = VertexAISemanticSearch(
+        corpus.name,
+        "project",
+        "location",
+        chunk_index=get_chunk_index(chunk_index_path),
+        backend="auto",
+    )
+
+    (hit,) = searcher.search("analytics.track(")
+    assert (hit["file_path"], hit["match"]) == ("signup.js", "substring")
+    assert hit["start_line"] == 1 and "Signed Up" in hit["text"]
+    # By all the words of the identifier, ranked with BM25.
+    (hit,) = searcher.search("track_event")
+    assert (hit["file_path"], hit["match"]) == ("events.py", "bm25")
+    # Prose, even with code in it, is left to semantic search.
+    assert searcher.search("where do users sign up") == []
+    assert searcher.search("where is analytics.track( called") == []
+    assert vertex_queries == [
+        "where do users sign up",
+        "where is analytics.track( called",
+    ]
+
+    (repo_path / "signup.js").write_text("function onSignup() {}\n")
+    repo.index.add(["signup.js"])
+    commit = repo.index.commit("stop tracking").hexsha
+    rag_corpus.ingest_repository_to_rag_corpus(
+        "https://github.com/org/repo", incremental=True
+    )
+    searcher.backend = "lexical"
+    assert searcher.search("analytics.track(") == []
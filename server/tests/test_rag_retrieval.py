@@ -0,0 +1,218 @@
+import types
+
+from rag.chunk_index import ChunkIndex, ChunkRecord
+from rag.ingestion.shards import shard_record
+from rag.retrieval import semantic_search_engine
+from rag.retrieval.semantic_search_engine import VertexAISemanticSearch
+
+
+def test_parse_metadata_from_chunk_object_uri():
+    metadata = VertexAISemanticSearch._parse_metadata_from_source_uri(
+        "gs://bucket/codes-repo/app.py__lines_10-30.txt"
+    )
+    assert metadata == {"file_path": "app.py", "start_line": 10, "end_line": 30}
+
+
+def test_parse_metadata_from_shard_record():
+    text = shard_record('src/"quoted" é.py', 5, 9, "def f():\n    pass\n")
+    metadata = VertexAISemanticSearch._parse_metadata_from_source_uri(
+        "gs://bucket/codes-repo/shards/07-000.jsonl", text[10:] + "\n" + text
+    )
+    assert metadata == {
+        "file_path": 'src/"quoted" é.py',
+        "start_line": 5,
+        "end_line": 9,
+    }
+
+
+def test_search_hydrates_results_from_chunk_index(tmp_path, monkeypatch):
+    chunk_index = ChunkIndex(tmp_path / "chunk_index.sqlite")
+    chunk_index.replace(
+        "codes-repo",
+        "abc123",
+        [
+            ChunkRecord(
+                "gs://bucket/codes-repo/src/app.py__lines_10-30.txt",
+                "src/app.py",
+                10,
+                30,
+                "handler",
+                0,
+                200,
+            )
+        ],
+    )
+    results = [
+        {
+            "source_uri": "gs://bucket/codes-repo/src/app.py__lines_10-30.txt",
+            "text": "",
+        },
+        {"source_uri": "gs://bucket/codes-repo/new.py__lines_1-5.txt", "text": ""},
+    ]
+    monkeypatch.setattr(
+        semantic_search_engine,
+        "retrieve_contexts_from_corpus",
+        lambda **kwargs: [dict(r) for r in results],
+    )
+    searcher = VertexAISemanticSearch(
+        "corpora/1", "project", "location", chunk_index=chunk_index
+    )
+
+    indexed, unindexed = searcher.search("query")
+
+    assert indexed["file_path"] == "src/app.py"
+    assert indexed["symbol"] == "handler"
+    assert indexed["commit_hash"] == "abc123"
+    # Not ingested with the index: parsed from the URI.
+    assert unindexed["file_path"] == "new.py"
+    assert unindexed["start_line"] == 1
+
+
+def test_retrieval_cache_serves_repeated_queries_until_reingested(
+    tmp_path, monkeypatch
+):
+    from rag.chunk_index import get_chunk_index
+    from rag.retrieval.cache import RetrievalCache
+
+    monkeypatch.setattr(
+        semantic_search_engine.config,
+        "chunk_index_path",
+        str(tmp_path / "chunk_index.sqlite"),
+    )
+    chunk_index = get_chunk_index(tmp_path / "chunk_index.sqlite")
+    chunk_index.set_corpus_version("corpora/1", "codes-repo", "commit-1")
+    cache = RetrievalCache(max_entries=2, ttl_s=60)
+    monkeypatch.setattr(semantic_search_engine, "retrieval_cache", cache)
+    monkeypatch.setattr(semantic_search_engine, "init_vertexai", lambda *args: None)
+    queries = []
+
+    def retrieval_query(text, **kwargs):
+        queries.append(text)
+        context = types.SimpleNamespace(
+            source_uri="gs://bucket/codes-repo/a.py__lines_1-2.txt",
+            source_display_name="a.py__lines_1-2.txt",
+            text=f"answer {len(queries)}",
+            distance=0.1,
+            score=0.9,
+            sparse_distance=0.0,
+            chunk=types.SimpleNamespace(text=""),
+        )
+        return types.SimpleNamespace(contexts=types.SimpleNamespace(contexts=[context]))
+
+    monkeypatch.setattr(semantic_search_engine.rag, "retrieval_query", retrieval_query)
+
+    def retrieve(query, corpus="corpora/1"):
+        return semantic_search_engine.retrieve_contexts_from_corpus(
+            corpus, query, project_id="p", location="l", top_k_results=5
+        )
+
+    first = retrieve("where is  auth?")
+    first[0]["text"] = "mutated by the caller"
+    assert retrieve(" where is auth? ")[0]["text"] == "answer 1"
+    assert queries == ["where is  auth?"]
+
+    chunk_index.set_corpus_version("corpora/1", "codes-repo", "commit-2")
+    assert retrieve("where is auth?")[0]["text"] == "answer 2"
+    retrieve("other", corpus="corpora/2")
+    retrieve("third", corpus="corpora/3")
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 4)
+    assert stats["invalidations"] == 1
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 2
+
+
+def test_corpus_catalog_lists_corpora_once_across_lookups(monkeypatch):
+    from rag.tools import utils
+
+    corpora = [
+        types.SimpleNamespace(
+            name="projects/p/locations/l/ragCorpora/1", display_name="a"
+        )
+    ]
+    calls = []
+
+    def list_corpora():
+        calls.append(1)
+        return list(corpora)
+
+    monkeypatch.setattr(utils.rag, "list_corpora", list_corpora)
+    catalog = utils.CorpusCatalog(ttl_s=60, miss_refresh_interval_s=60)
+    monkeypatch.setattr(utils, "corpus_catalog", catalog)
+    context = types.SimpleNamespace(state={})
+
+    assert utils.get_corpus_resource_name("a") == corpora[0].name
+    assert utils.check_corpus_exists("a", context)
+    assert context.state["current_corpus"] == "a"
+    assert utils.check_corpus_exists(corpora[0].name, context)
+    assert len(calls) == 1
+
+    # A miss right after a refresh does not list again...
+    corpora.append(
+        types.SimpleNamespace(
+            name="projects/p/locations/l/ragCorpora/2", display_name="b"
+        )
+    )
+    assert not utils.check_corpus_exists("b", context)
+    assert len(calls) == 1
+    # ...but one after an invalidation (e.g. an ingestion) does.
+    catalog.invalidate()
+    assert utils.check_corpus_exists("b", context)
+    assert len(calls) == 2
+
+
+def test_vertexai_is_initialized_once_per_target(monkeypatch):
+    from rag import clients
+
+    calls = []
+    monkeypatch.setattr(clients.vertexai, "init", lambda **kwargs: calls.append(kwargs))
+    monkeypatch.setattr(clients, "_vertexai_target", None)
+
+    clients.init_vertexai("p", "us-central1")
+    clients.init_vertexai("p", "us-central1")
+    clients.init_vertexai("p", "europe-west1")
+
+    assert [call["location"] for call in calls] == ["us-central1", "europe-west1"]
+
+
+def test_search_many_runs_queries_concurrently_and_dedupes_chunks(
+    tmp_path, monkeypatch
+):
+    import threading
+
+    uris = {
+        "init": ["gs://b/r/init.py__lines_1-5.txt", "gs://b/r/track.py__lines_1-9.txt"],
+        "track": ["gs://b/r/track.py__lines_1-9.txt", "gs://b/r/ui.py__lines_3-4.txt"],
+    }
+    distances = {"init": 0.4, "track": 0.2}
+    barrier = threading.Barrier(2, timeout=5)
+    calls = []
+
+    def retrieve(**kwargs):
+        query = kwargs["query_text"].strip()
+        calls.append(query)
+        # Both queries must be in flight at once to get past the barrier.
+        barrier.wait()
+        return [
+            {"source_uri": uri, "text": "", "distance": distances[query]}
+            for uri in uris[query]
+        ]
+
+    monkeypatch.setattr(
+        semantic_search_engine, "retrieve_contexts_from_corpus", retrieve
+    )
+    searcher = VertexAISemanticSearch(
+        "corpora/1", "project", "location", chunk_index=ChunkIndex(tmp_path / "i")
+    )
+
+    groups = searcher.search_many(["init", "track", " init ", ""], max_concurrency=2)
+
+    assert sorted(calls) == ["init", "track"]
+    assert [group["query"] for group in groups] == ["init", "track"]
+    assert [r["file_path"] for r in groups[0]["results"]] == ["init.py"]
+    # Closer to "track", so listed there only, as found by both queries.
+    track, ui = groups[1]["results"]
+    assert track["file_path"] == "track.py"
+    assert track["queries"] == ["init", "track"]
+    assert ui["queries"] == ["track"]
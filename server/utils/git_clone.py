@@ -0,0 +1,98 @@
+from pathlib import Path
+from typing import Iterable, Literal, Optional
+
+import git
+from git import Repo
+from structlog import get_logger
+
+logger = get_logger()
+
+# full:     complete history and blobs (plain `git clone`)
+# shallow:  only the tip commit of a single branch (`--depth 1`)
+# blobless: every commit and tree, file contents fetched on demand
+#           (`--filter=blob:none`)
+# sparse:   blobless, and only paths matching the sparse patterns are checked out
+CloneStrategy = Literal["full", "shallow", "blobless", "sparse"]
+
+
+def sparse_patterns_for_extensions(extensions: Iterable[str]) -> list[str]:
+    """
+    Non-cone sparse-checkout patterns that check out files ending in any of
+    `extensions` (e.g. ".py" or "Dockerfile") at any depth.
+    """
+    return sorted({f"*{extension}" for extension in extensions})
+
+
+def clone_repo(
+    repo_url: str,
+    path: Path | str,
+    strategy: CloneStrategy = "shallow",
+    branch: Optional[str] = None,
+    sparse_patterns: Optional[list[str]] = None,
+) -> Repo:
+    """
+    Clones a repository into `path` using the given strategy.
+
+    Nothing downstream reads history past HEAD, so `shallow` is usually enough;
+    use `ensure_commit` when an older commit is needed later (e.g. to diff
+    against the previously ingested commit).
+
+    Raises:
+        git.GitCommandError: if the clone fails.
+    """
+    kwargs = {}
+    if branch:
+        kwargs["branch"] = branch
+    if strategy == "shallow":
+        kwargs.update(depth=1, single_branch=True)
+    elif strategy in ("blobless", "sparse"):
+        kwargs["filter"] = "blob:none"
+    if strategy == "sparse":
+        kwargs["no_checkout"] = True
+
+    logger.info("Cloning repository", path=str(path), strategy=strategy, branch=branch)
+    repo = Repo.clone_from(repo_url, path, **kwargs)
+
+    if strategy == "sparse":
+        patterns = sparse_patterns or []
+        repo.git.sparse_checkout("set", "--no-cone", *patterns)
+        repo.git.checkout(branch or repo.active_branch.name)
+        logger.info("Sparse checkout complete", path=str(path), patterns=len(patterns))
+    return repo
+
+
+def has_commit(repo: Repo, commit: str) -> bool:
+    try:
+        repo.git.cat_file("-e", f"{commit}^{{commit}}")
+        return True
+    except git.GitCommandError:
+        return False
+
+
+def ensure_commit(repo: Repo, commit: str) -> bool:
+    """
+    Makes `commit` available in a shallow or partial clone.
+
+    Fetches just that commit first (enough to diff its tree against HEAD; any
+    missing blobs are fetched lazily by git), and falls back to deepening the
+    clone to full history when the remote refuses fetching by commit id.
+
+    Returns:
+        bool: True if the commit is available locally afterwards.
+    """
+    if has_commit(repo, commit):
+        return True
+    if "origin" not in [remote.name for remote in repo.remotes]:
+        return False
+
+    logger.info("Fetching missing commit", path=repo.working_dir, commit=commit)
+    try:
+        repo.git.fetch("--depth=1", "origin", commit)
+    except git.GitCommandError as e:
+        logger.warning("Fetching commit by id failed", commit=commit, error=str(e))
+        if Path(repo.git_dir, "shallow").exists():
+            try:
+                repo.git.fetch("--unshallow", "origin")
+            except git.GitCommandError as e:
+                logger.warning("Deepening clone failed", error=str(e))
+    return has_commit(repo, commit)
@@ -0,0 +1,271 @@
+import os
+import shutil
+import threading
+import time
+import urllib.parse
+import uuid
+from pathlib import Path
+from typing import Optional
+
+import git
+from git import Repo
+from structlog import get_logger
+
+from utils.git_clone import CloneStrategy
+
+logger = get_logger()
+
+
+def _strip_credentials(repo_url: str) -> str:
+    parts = urllib.parse.urlsplit(repo_url)
+    return parts._replace(netloc=parts.netloc.rpartition("@")[2]).geturl()
+
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(Path(entry.path))
+                    elif entry.is_file(follow_symlinks=False):
+                        total += entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            continue
+    return total
+
+
+class RepoWorkspace:
+    """
+    On-disk cache of cloned repositories.
+
+    Each `owner/repo` gets one bare mirror under `<root>/mirrors`, refreshed
+    with `git fetch` on every checkout, so repeat scans only download new
+    commits. Jobs get a detached worktree of the mirror under
+    `<root>/worktrees`, which is cheap to create and shares the mirror's
+    objects. The mirror's `origin` remote has the repo URL without
+    credentials; the URL with them is passed to each git command in its
+    environment (see `_credentials_env`) and never stored.
+
+    `strategy` is applied to the fetch and the worktree like `clone_repo`
+    does: `shallow` fetches only the tip, `blobless` and `sparse` make the
+    mirror a partial clone whose blobs are fetched as worktrees need them,
+    and `sparse` only checks out paths matching `sparse_patterns`.
+
+    The total size of mirrors and worktrees is kept under `max_bytes` by
+    evicting the least recently used entries. Worktrees younger than
+    `worktree_ttl_s` are assumed to be in use and are never evicted, nor are
+    the mirrors they belong to.
+    """
+
+    def __init__(
+        self,
+        root: Path | str,
+        max_bytes: int,
+        worktree_ttl_s: int = 6 * 3600,
+        strategy: CloneStrategy = "shallow",
+        sparse_patterns: Optional[list[str]] = None,
+    ):
+        self.root = Path(root).resolve()
+        self.max_bytes = max_bytes
+        self.worktree_ttl_s = worktree_ttl_s
+        self.strategy = strategy
+        self.sparse_patterns = sparse_patterns or []
+        self.mirrors_dir = self.root / "mirrors"
+        self.worktrees_dir = self.root / "worktrees"
+        self._lock = threading.Lock()
+        self._repo_locks: dict[str, threading.Lock] = {}
+        self._sizes: dict[Path, int] = {}
+
+    def mirror_path(self, repo_name: str) -> Path:
+        owner, name = repo_name.split("/")
+        return self.mirrors_dir / owner / f"{name}.git"
+
+    def checkout(
+        self, repo_name: str, repo_url: str, branch: Optional[str] = None
+    ) -> Path:
+        """
+        Refreshes the mirror of `repo_name` and returns a new worktree of
+        `branch` (the remote's default branch if None).
+
+        Raises:
+            git.GitCommandError: if fetching or creating the worktree fails.
+        """
+        mirror_path = self.mirror_path(repo_name)
+        with self._repo_lock(repo_name):
+            started = time.perf_counter()
+            if mirror_path.exists():
+                mirror = Repo(mirror_path)
+            else:
+                mirror_path.parent.mkdir(parents=True, exist_ok=True)
+                mirror = Repo.init(mirror_path, bare=True)
+            remote_url = _strip_credentials(repo_url)
+            with mirror.config_writer() as writer:
+                writer.set_value('remote "origin"', "url", remote_url)
+                # Shared by all worktrees; `sparse-checkout set` would instead
+                # move the mirror to per-worktree config, unsetting core.bare.
+                writer.set_value("core", "sparseCheckout", self.strategy == "sparse")
+
+            # Fetch into a ref of our own so later fetches only download new objects.
+            ref = f"refs/workspace/{branch or 'HEAD'}"
+            fetch_args = ["--no-tags"]
+            if self.strategy == "shallow":
+                fetch_args.append("--depth=1")
+            elif self.strategy in ("blobless", "sparse"):
+                fetch_args.append("--filter=blob:none")
+            source = f"refs/heads/{branch}" if branch else "HEAD"
+            env = self._credentials_env(repo_url, remote_url)
+            with mirror.git.custom_environment(**env):
+                mirror.git.fetch(*fetch_args, "origin", f"+{source}:{ref}")
+            commit = mirror.git.rev_parse(ref)
+
+            worktree_path = (
+                self.worktrees_dir
+                / f"{repo_name.replace('/', '__')}-{uuid.uuid4().hex[:8]}"
+            )
+            worktree_path.parent.mkdir(parents=True, exist_ok=True)
+            sparse = self.strategy == "sparse"
+            add_args = ["--detach", "--no-checkout"] if sparse else ["--detach"]
+            with mirror.git.custom_environment(**env):
+                mirror.git.worktree("add", *add_args, str(worktree_path), commit)
+            if sparse:
+                worktree = Repo(worktree_path)
+                patterns_path = Path(worktree.git_dir) / "info" / "sparse-checkout"
+                patterns_path.parent.mkdir(parents=True, exist_ok=True)
+                patterns_path.write_text(
+                    "".join(f"{p}\n" for p in self.sparse_patterns)
+                )
+                with worktree.git.custom_environment(**env):
+                    worktree.git.reset("--hard", commit)
+            mirror_path.touch()
+            self._sizes[mirror_path] = _dir_size(mirror_path)
+            self._sizes[worktree_path] = _dir_size(worktree_path)
+
+        logger.info(
+            "Checked out repository worktree",
+            repo_name=repo_name,
+            branch=branch or "default",
+            commit=commit,
+            path=str(worktree_path),
+            duration_s=round(time.perf_counter() - started, 2),
+        )
+        self.evict()
+        return worktree_path
+
+    @staticmethod
+    def _credentials_env(repo_url: str, remote_url: str) -> dict[str, str]:
+        # Rewrites `origin` to the URL with credentials for this command and the
+        # git processes it starts, e.g. lazy blob fetches of partial clones.
+        if repo_url == remote_url:
+            return {}
+        return {
+            "GIT_CONFIG_COUNT": "1",
+            "GIT_CONFIG_KEY_0": f"url.{repo_url}.insteadOf",
+            "GIT_CONFIG_VALUE_0": remote_url,
+        }
+
+    def release(self, worktree_path: Path | str) -> None:
+        """Removes a worktree once the job using it is done."""
+        worktree_path = Path(worktree_path)
+        with self._lock:
+            self._sizes.pop(worktree_path, None)
+        mirror_path = self._mirror_of(worktree_path)
+        try:
+            if mirror_path is not None:
+                Repo(mirror_path).git.worktree("remove", "--force", str(worktree_path))
+        except git.GitCommandError as e:
+            logger.warning(
+                "Failed to remove worktree", path=str(worktree_path), error=str(e)
+            )
+        shutil.rmtree(worktree_path, ignore_errors=True)
+        if mirror_path is not None:
+            Repo(mirror_path).git.worktree("prune")
+
+    def evict(self) -> int:
+        """
+        Evicts least recently used worktrees and mirrors until the workspace
+        fits in `max_bytes`. Returns the number of bytes freed.
+        """
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _, _, size in entries)
+            if total <= self.max_bytes:
+                return 0
+
+            now = time.time()
+            worktrees = {
+                path: self._mirror_of(path)
+                for path, _, _ in entries
+                if path.parent == self.worktrees_dir
+            }
+            # Mirrors used by a worktree that may still be in use are kept.
+            live_mirrors = {
+                worktrees[path]
+                for path, last_used, _ in entries
+                if path in worktrees and now - last_used < self.worktree_ttl_s
+            }
+            sizes = {path: size for path, _, size in entries}
+            freed = 0
+            for path, last_used, _ in sorted(entries, key=lambda entry: entry[1]):
+                if total - freed <= self.max_bytes:
+                    break
+                if path in worktrees:
+                    evictable = now - last_used >= self.worktree_ttl_s
+                    doomed = [path]
+                else:
+                    # Skip mirrors with a checkout in progress.
+                    repo_lock = self._repo_locks.get(
+                        f"{path.parent.name}/{path.name.removesuffix('.git')}"
+                    )
+                    evictable = path not in live_mirrors and not (
+                        repo_lock and repo_lock.locked()
+                    )
+                    doomed = [
+                        worktree
+                        for worktree, mirror in worktrees.items()
+                        if mirror == path and worktree.exists()
+                    ] + [path]
+                if not evictable or not path.exists():
+                    continue
+                for doomed_path in doomed:
+                    logger.info(
+                        "Evicting workspace entry",
+                        path=str(doomed_path),
+                        size=sizes[doomed_path],
+                    )
+                    shutil.rmtree(doomed_path, ignore_errors=True)
+                    self._sizes.pop(doomed_path, None)
+                    freed += sizes[doomed_path]
+
+        for mirror_path in self.mirrors_dir.glob("*/*.git"):
+            try:
+                Repo(mirror_path).git.worktree("prune")
+            except git.GitCommandError:
+                pass
+        return freed
+
+    def _entries(self) -> list[tuple[Path, float, int]]:
+        # Must be called with self._lock held.
+        paths = list(self.mirrors_dir.glob("*/*.git"))
+        if self.worktrees_dir.exists():
+            paths.extend(path for path in self.worktrees_dir.iterdir() if path.is_dir())
+        entries = []
+        for path in paths:
+            if path not in self._sizes:
+                self._sizes[path] = _dir_size(path)
+            entries.append((path, path.stat().st_mtime, self._sizes[path]))
+        return entries
+
+    def _mirror_of(self, worktree_path: Path) -> Optional[Path]:
+        # A worktree's .git file points at <mirror>/worktrees/<name>.
+        try:
+            gitdir = (worktree_path / ".git").read_text().split("gitdir:", 1)[1].strip()
+        except (OSError, IndexError):
+            return None
+        return Path(gitdir).parent.parent
+
+    def _repo_lock(self, repo_name: str) -> threading.Lock:
+        with self._lock:
+            return self._repo_locks.setdefault(repo_name, threading.Lock())